@@ -14,6 +14,8 @@ from typing import Optional, Callable
 class BaseUIObject(GameObject):
     """La classe que tous les autres objets UI vont succéder(inherit)
     """
+    # la position dépend de l'ancre et de la taille de l'image du parent, qui peut changer sans translate
+    cache_transform = False
 
     def __init__(self, pos: Vector2,
                  rotation: float,
@@ -130,14 +132,60 @@ class FPS_Label(TextLabel):
         super().__init__(pos, 0, pygame.font.SysFont("Arial", 23, bold=True), "",
                          (255, 50, 100), "fps_display")
         self.tick_cnt = 0
-        self.sum = 0
 
     def update(self) -> None:
+        # l'FPS de l'affichage : avec des pas de simulation fixes, delta ne dépend plus du nombre de frames
         self.tick_cnt += 1
-        self.sum += sing.ROOT.delta
-        if sing.ROOT.delta != 0 and self.tick_cnt % 60 == 0:
-            self.set_text(f"{int(1 / (self.sum / 60))} FPS")
-            self.sum = 0
+        if self.tick_cnt % 60 == 0:
+            self.set_text(f"{int(sing.ROOT.clock.get_fps())} FPS")
+
+    def blit(self, screen: pygame.Surface, apply_alpha=False) -> None:
+        super().blit(screen, apply_alpha=apply_alpha)
+
+
+class ProfilerOverlay(BaseUIObject):
+    """
+    Affiche les mesures du profiler de GameRoot (sing.ROOT.profiler) : le temps moyen de chaque étape de la frame
+    et les classes d'objets les plus coûteuses, sur les dernières frames.
+    """
+    REFRESH = 30
+    LINE_HEIGHT = 15
+    TOP_CLASSES = 6
+
+    def __init__(self, margin: pygame.Vector2):
+        """
+        :param margin: La distance entre le coin en haut à droite de l'écran et celui de l'affichage
+        """
+        self.font = pygame.font.SysFont("Arial", 13)
+        self.margin = margin
+        super().__init__(pygame.Vector2(), 0, pygame.Surface((1, 1), pygame.SRCALPHA), "profiler_overlay", anchor=NE)
+        self.tick_cnt = 0
+
+    def update(self) -> None:
+        super().update()
+        self.tick_cnt += 1
+        if self.tick_cnt % self.REFRESH == 0:
+            self.image = self.render_stats()
+            # la taille de l'image change, on garde son coin en haut à droite au même endroit
+            w, h = self.image.get_size()
+            self.translate(pygame.Vector2(-self.margin.x - w / 2, self.margin.y + h / 2), False)
+
+    def render_stats(self) -> pygame.Surface:
+        """
+        :return: Une image avec une ligne par étape (moyenne et 95e centile en ms) puis une ligne par classe
+        """
+        profiler = sing.ROOT.profiler
+        lines = [f"{phase:<12} {stats['mean']:6.2f} {stats['p95']:6.2f}"
+                 for phase, stats in profiler.get_phase_stats(self.REFRESH * 4).items()]
+        lines += [f"{name[:14]:<14} {early + update:6.2f} {blit:6.2f}"
+                  for name, early, update, blit in profiler.get_object_stats(self.REFRESH * 4)[:self.TOP_CLASSES]]
+        texts = [self.font.render(line, True, (230, 230, 230)) for line in lines]
+        width = max(text.get_width() for text in texts) + 8
+        image = pygame.Surface((width, len(texts) * self.LINE_HEIGHT + 8), pygame.SRCALPHA)
+        image.fill((0, 0, 0, 160))
+        for i, text in enumerate(texts):
+            image.blit(text, (4, 4 + i * self.LINE_HEIGHT))
+        return image
 
     def blit(self, screen: pygame.Surface, apply_alpha=False) -> None:
         super().blit(screen, apply_alpha=apply_alpha)
@@ -185,6 +233,9 @@ class HPBar(BaseUIObject):
         self.children["red"].prop = self.prop
         super().blit(screen, apply_alpha)
 
+    def get_render_state(self) -> tuple:
+        return super().get_render_state() + (self.prop,)
+
 
 class Button(BaseUIObject):
     """
@@ -323,6 +374,12 @@ class MenuManager(GameObject):
     def blit(self, screen: pygame.Surface, apply_alpha=True) -> None:
         self.menus[self.current].blit(screen, apply_alpha)
 
+    def get_render_state(self) -> tuple:
+        return self.current, self.menus[self.current].get_render_state()
+
+    def get_render_rect(self) -> pygame.Rect:
+        return self.menus[self.current].get_render_rect()
+
 
 class Slider(BaseUIObject):
     def __init__(self, pos: Vector2,
@@ -346,7 +403,7 @@ class Slider(BaseUIObject):
 
     def button_unlock(self):
         self.button_locked = False
-        self.on_btn_press_mouse_pos = pygame.mouse.get_pos()
+        self.on_btn_press_mouse_pos = sing.ROOT.input.get_mouse_pos()
 
     def button_lock(self):
         self.button_locked = True
@@ -357,7 +414,7 @@ class Slider(BaseUIObject):
         super().early_update()
 
         if not self.button_locked:
-            btn_pos = tuple2Vec2(pygame.mouse.get_pos()) - self.get_real_pos()
+            btn_pos = tuple2Vec2(sing.ROOT.input.get_mouse_pos()) - self.get_real_pos()
             btn_pos.x = min(max(self.image.get_width() / 2 + btn_pos.x, 0), self.image.get_width() + 1)
             btn_pos.y = 0
             step_px = self.step * self.image.get_width() if 0 <= self.step <= 1 else 1
@@ -418,7 +475,8 @@ class TextBox(BaseUIObject):
     def early_update(self) -> None:
         super().early_update()
 
-        if not is_included(tuple2Vec2(pygame.mouse.get_pos()), self.image.get_rect(center=self.get_screen_pos())) \
+        mouse_pos = tuple2Vec2(sing.ROOT.input.get_mouse_pos())
+        if not is_included(mouse_pos, self.image.get_rect(center=self.get_screen_pos())) \
                 and sing.ROOT.mouse_downs[MOUSE_LEFT]:
             self.edit_mode = False
 
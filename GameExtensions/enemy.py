@@ -7,14 +7,13 @@ from GameExtensions.util import grid_pos2world_pos, get_path2target, get_next_ch
 from GameExtensions.locals import N, W, S, E, CHUNK_SIZE, DIRS, ENEMY
 from GameExtensions.resources import load_img
 from GameExtensions.field_objects import Placeable
+from GameExtensions.navigation import NavigationManager
 
 import pygame
 from pygame.math import Vector2
 
 from typing import Optional
 
-import time
-
 
 class Enemy(Entity):  # Every enemy related class must inherit this
     """
@@ -55,7 +54,8 @@ class TestEnemy(Enemy):
         self.objective_chunk = get_next_chunk(get_chunk_pos(self.get_real_pos()),
                                               get_chunk_pos(sing.ROOT.game_objects["player"].get_real_pos()))
         self.check_pos = self.get_real_pos().copy()
-        self.last_checked = time.time()
+        # temps simulé depuis la dernière vérification (pas le temps réel, pour que les replays soient identiques)
+        self.check_timer = 0.
         self.map = sing.ROOT.game_objects["terrain"].over_terrain
         self.speed = speed
         sing.ROOT.add_collidable_object(self)
@@ -64,17 +64,33 @@ class TestEnemy(Enemy):
         super().update()
         if self.hp <= 0:
             sing.ROOT.remove_object(self)
+            if "navigation" in sing.ROOT.game_objects:
+                sing.ROOT.game_objects["navigation"].cancel_route(self.name)
             return
         core_pos = sing.ROOT.game_objects["core"].get_real_pos()
         player_pos = sing.ROOT.game_objects["player"].get_real_pos()
+        target_name = "player"
         if core_pos.distance_squared_to(self.get_real_pos()) < player_pos.distance_squared_to(self.get_real_pos())\
                 or sing.ROOT.game_objects["player"].ghost_mode:
             player_pos = core_pos.copy()
+            target_name = "core"
         dist = (self.get_real_pos().x - player_pos.x) ** 2 + (self.get_real_pos().y - player_pos.y) ** 2
 
-        if get_chunk_pos(self.get_real_pos()) != self.cur_chunk or (len(self.objectives) == 0 and dist > 50):
+        # si on est assez proche de la cible, le champ de directions partagé donne directement la prochaine case
+        navigation: Optional[NavigationManager] = sing.ROOT.game_objects.get("navigation")
+        step = navigation.get_next_step(target_name, self.get_real_pos()) if navigation is not None else None
+        route = navigation.poll_route(self.name) if navigation is not None else None
+        if step is not None:
+            self.objectives = [step]
+            self.cur_chunk = None
+        elif route:
+            self.objectives = route
+        elif navigation is not None and navigation.is_pending(self.name):
+            pass  # le chemin demandé n'est pas encore calculé, on continue sur l'ancien
+        elif get_chunk_pos(self.get_real_pos()) != self.cur_chunk or (len(self.objectives) == 0 and dist > 50):
             self.calculate_path(player_pos)
-        if time.time() - self.last_checked > 1.5:
+        self.check_timer += sing.ROOT.delta
+        if self.check_timer > 1.5:
             if (self.get_real_pos() - self.check_pos).magnitude_squared() < 1:
                 grid_pos = get_grid_pos(self.get_real_pos())
                 for d in DIRS:
@@ -86,7 +102,7 @@ class TestEnemy(Enemy):
                 self.objectives.clear()
                 self.calculate_path(player_pos)
             self.check_pos = self.get_real_pos().copy()
-            self.last_checked = time.time()
+            self.check_timer = 0.
 
         if len(self.objectives) == 0:
             return
@@ -116,12 +132,18 @@ class TestEnemy(Enemy):
 
     def calculate_path(self, player_pos):
         """
-        Calcule un chemin qui permet de trouver un chemin qui va vers le joueur en utilisant l'algorithme A*
+        Calcule un chemin qui permet de trouver un chemin qui va vers le joueur : s'il y a un NavigationManager, le
+        chemin lui est demandé et sera récupéré dans update, sinon l'algorithme A* vers le chunk voisin le plus proche
+        du joueur est utilisé tout de suite
 
         :param player_pos: La position du joueur
 
         """
         self.cur_chunk = get_chunk_pos(self.get_real_pos())
+        navigation: Optional[NavigationManager] = sing.ROOT.game_objects.get("navigation")
+        if navigation is not None:
+            navigation.request_route(self.name, self.get_real_pos(), player_pos)
+            return
         self.objective_chunk = get_next_chunk(self.cur_chunk, get_chunk_pos(player_pos))
         chunk_diff = self.objective_chunk - self.cur_chunk
         if chunk_diff == Vector2(0, -1):
@@ -162,7 +184,7 @@ class Zombie(TestEnemy):
         super().__init__(pos, load_img("resources/enemy/test_zombie.png"), name, Zombie.MAX_HP, 0.5)
         self.timer = 0
         self.player = sing.ROOT.game_objects["player"]
-        self.mov_gen.exclude = "Zombie.*"
+        self.mov_gen.exclude = sing.ROOT.get_layer_mask(ENEMY)
 
     def update(self) -> None:
         super().update()
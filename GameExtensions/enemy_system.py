@@ -0,0 +1,476 @@
+from __future__ import annotations  # Avoid circular import
+
+import typing
+from typing import Optional
+
+import numpy as np
+import pygame
+from pygame.math import Vector2
+
+import GameManager.singleton as sing
+from GameManager.util import GameObject
+
+from GameExtensions.enemy import Enemy, Zombie
+from GameExtensions.field_objects import Placeable
+from GameExtensions.locals import DIRS, ENEMY, WATER_DECEL
+from GameExtensions.resources import load_img
+
+if typing.TYPE_CHECKING:
+    from GameExtensions.navigation import NavigationManager
+
+
+class SwarmEnemy(Enemy):
+    """
+    Un ennemi géré par EnemySystem. Sa position, sa vie et son knockback sont rangés dans les tableaux du système,
+    cet objet n'est là que pour les autres objets du jeu (collisions, dégâts, cible des boules magiques...).
+    Il n'est pas dans game_objects : c'est le système qui le met à jour et qui l'affiche.
+    """
+
+    def __init__(self, system: EnemySystem, index: int, pos: Vector2, image: pygame.Surface, name: str, hp: int):
+        """
+        :param system: Le système qui gère cet ennemi
+        :param index: L'indice de l'ennemi dans les tableaux du système
+        :param pos: La position initiale
+        :param image: L'image de l'ennemi
+        :param name: Le nom de l'ennemi
+        :param hp: La vie de l'ennemi
+        """
+        self.system = system
+        self.index = index
+        # position et vie gardées quand l'ennemi n'est plus dans le système (mort)
+        self.last_pos = pos.copy()
+        self.last_hp = hp
+        super().__init__(pos, 0, image, name, hp, hp)
+
+    @property
+    def pos(self) -> Vector2:
+        if self.index < 0:
+            return self.last_pos.copy()
+        return Vector2(*self.system.positions[self.index])
+
+    @pos.setter
+    def pos(self, value: Vector2) -> None:
+        if self.index < 0:
+            self.last_pos = Vector2(value)
+        else:
+            self.system.positions[self.index] = value.x, value.y
+            self.system.collision_index = None
+
+    @property
+    def hp(self) -> float:
+        if self.index < 0:
+            return self.last_hp
+        return float(self.system.hp[self.index])
+
+    @hp.setter
+    def hp(self, value: float) -> None:
+        if self.index < 0:
+            self.last_hp = value
+        else:
+            self.system.hp[self.index] = value
+
+    def get_damage(self, amount: int, knockback_force: Optional[Vector2] = None) -> None:
+        self.hp = max(min(self.hp - amount, self.max_hp), 0)
+        if knockback_force is not None and self.index >= 0:
+            self.system.knockback[self.index] += knockback_force.x, knockback_force.y
+
+
+class EnemySystem(GameObject):
+    """
+    Met à jour tous les zombies d'un coup. Les positions, le knockback, la vie et les temps de recharge des attaques
+    sont rangés dans des tableaux numpy : les distances aux cibles, les attaques, le knockback et la plupart des
+    déplacements sont calculés en une seule passe par frame. Seuls les zombies proches d'un obstacle ou du joueur
+    vérifient leurs collisions un par un.
+
+    Le système est aussi un fournisseur de collisions (voir GameRoot.add_collision_provider) : ses zombies ne sont
+    pas dans la grille de collision, c'est lui qui répond aux requêtes avec ses tableaux : les zombies sont rangés
+    par case (celle de leur centre) une fois par pas, une requête ne regarde que les cases autour du rect.
+    """
+    # distance (en cases) en dessous de laquelle un obstacle peut toucher un zombie
+    OBSTACLE_MARGIN = 2
+    CHECK_DELAY = 1.5
+    # les tableaux qui ont une ligne par zombie
+    ARRAYS = ("positions", "previous_positions", "knockback", "hp", "attack_timer", "facing", "handles", "check_pos",
+              "check_time")
+
+    def __init__(self, capacity: int = 256, speed: float = 0.5, knockback_decay: float = 0.1):
+        """
+        :param capacity: La taille initiale des tableaux (ils s'agrandissent si besoin)
+        :param speed: La vitesse des zombies (en pixels par frame)
+        :param knockback_decay: La proportion du knockback perdue à chaque frame
+        """
+        super().__init__(Vector2(0, 0), 0, pygame.Surface((0, 0)), "enemy_system")
+        self.speed = speed
+        self.knockback_decay = knockback_decay
+        self.base_image = load_img("resources/enemy/test_zombie.png")
+        # une image par direction (droite, haut, gauche, bas), comme la rotation de TestEnemy
+        self.images = [pygame.transform.rotate(self.base_image, angle) for angle in (0, 90, 180, 270)]
+        self.half_size = np.array(self.base_image.get_size()) // 2
+        # taille des cases de l'index des collisions : un zombie touche au plus 2x2 cases
+        self.cell_size = int(self.half_size.max()) * 2
+        # (cases triées, zombies triés par case), recalculé à la première requête après que les zombies ont
+        # bougé
+        self.collision_index: Optional[tuple[np.ndarray, np.ndarray]] = None
+
+        self.count = 0
+        self.positions = np.zeros((capacity, 2))
+        # positions avant la dernière mise à jour, pour l'interpolation de l'affichage (pas de simulation fixes)
+        self.previous_positions = np.zeros((capacity, 2))
+        self.knockback = np.zeros((capacity, 2))
+        self.hp = np.zeros(capacity)
+        self.attack_timer = np.zeros(capacity)
+        self.facing = np.zeros(capacity, dtype=np.int8)
+        self.handles = np.zeros(capacity, dtype=np.int64)
+        self.check_pos = np.zeros((capacity, 2))
+        self.check_time = np.zeros(capacity)
+        # temps simulé (somme des delta) : les vérifications ne dépendent pas de la vitesse réelle du jeu
+        self.clock = 0.
+        self.enemies: list[SwarmEnemy] = []
+        # chemins donnés par le NavigationManager, pour les zombies loin des champs de directions
+        self.objectives: list[list[Vector2]] = []
+
+        self.collision_mask = sing.ROOT.get_layer_mask(ENEMY)
+        sing.ROOT.add_collision_provider(self)
+
+    def spawn(self, pos: Vector2, name: str, hp: int = Zombie.MAX_HP) -> SwarmEnemy:
+        """
+        Ajoute un zombie
+
+        :param pos: Sa position
+        :param name: Son nom (unique)
+        :param hp: Sa vie
+        :return: L'objet qui le représente
+        """
+        if self.count == len(self.hp):
+            self.grow(len(self.hp) * 2)
+        i = self.count
+        self.count += 1
+        self.positions[i] = pos.x, pos.y
+        self.previous_positions[i] = pos.x, pos.y
+        self.knockback[i] = 0, 0
+        self.hp[i] = hp
+        self.attack_timer[i] = 0
+        self.facing[i] = 0
+        self.check_pos[i] = pos.x, pos.y
+        self.check_time[i] = self.clock
+        self.collision_index = None
+        enemy = SwarmEnemy(self, i, pos, self.base_image, name, hp)
+        self.handles[i] = sing.ROOT.add_collidable_object(enemy, indexed=False)
+        self.enemies.append(enemy)
+        self.objectives.append([])
+        return enemy
+
+    def grow(self, capacity: int) -> None:
+        for name in self.ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def kill(self, i: int) -> None:
+        """
+        Enlève un zombie (le dernier prend sa place dans les tableaux)
+
+        :param i: L'indice du zombie
+        """
+        enemy = self.enemies[i]
+        enemy.last_pos, enemy.last_hp = Vector2(*self.positions[i]), float(self.hp[i])
+        enemy.index = -1
+        sing.ROOT.remove_collidable_object(enemy)
+        if "navigation" in sing.ROOT.game_objects:
+            sing.ROOT.game_objects["navigation"].cancel_route(enemy.name)
+        last = self.count - 1
+        if i != last:
+            for name in self.ARRAYS:
+                array = getattr(self, name)
+                array[i] = array[last]
+            self.enemies[i] = self.enemies[last]
+            self.enemies[i].index = i
+            self.objectives[i] = self.objectives[last]
+        self.enemies.pop()
+        self.objectives.pop()
+        self.count -= 1
+        self.collision_index = None
+
+    def get_cells(self) -> np.ndarray:
+        """
+        :return: La case du terrain de chaque zombie (comme get_grid_pos), tableau (n, 2)
+        """
+        terrain = sing.ROOT.game_objects["terrain"]
+        bs = terrain.block_px_size
+        rel = (self.positions[:self.count] - np.array(terrain.get_real_pos()) + bs / 2) // bs
+        return rel.astype(np.int64) + np.array(terrain.size) // 2
+
+    def get_rects(self, pos: np.ndarray) -> np.ndarray:
+        """
+        :param pos: Des centres, tableau (n, 2)
+        :return: Les rects (gauche, haut, droite, bas) des hitboxes centrées sur ces positions, arrondies comme
+            pygame.Rect
+        """
+        center = np.sign(pos) * np.floor(np.abs(pos) + 0.5)
+        size = self.half_size * 2
+        topleft = center - self.half_size
+        return np.concatenate((topleft, topleft + size), axis=1)
+
+    @staticmethod
+    def get_cell_keys(cell_x, cell_y) -> np.ndarray:
+        """
+        :return: Un seul entier par case de l'index des collisions. Les cases d'une même colonne se suivent.
+        """
+        return np.asarray(cell_x, dtype=np.int64) * (1 << 32) + cell_y
+
+    def get_collision_index(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Range les zombies par case (celle de leur centre), une seule fois tant qu'ils ne bougent pas
+
+        :return: Les cases des zombies triées et les indices des zombies dans le même ordre
+        """
+        if self.collision_index is None:
+            cells = np.floor(self.positions[:self.count] / self.cell_size).astype(np.int64)
+            keys = self.get_cell_keys(cells[:, 0], cells[:, 1])
+            order = np.argsort(keys)
+            self.collision_index = keys[order], order
+        return self.collision_index
+
+    def query_collisions(self, rect: pygame.Rect) -> list[int]:
+        """
+        :param rect: Le rect qu'on veut vérifier
+        :return: Les handles des zombies en contact avec le rect
+        """
+        if self.count == 0:
+            return []
+        keys, order = self.get_collision_index()
+        # le centre d'un zombie qui touche le rect est à moins de half_size (+1 pour l'arrondi) du rect
+        cs = self.cell_size
+        mx, my = (self.half_size + 1).tolist()
+        columns = np.arange((rect.left - mx) // cs, (rect.right + mx) // cs + 1)
+        if len(columns) > len(keys):
+            # rect très grand : plus simple de tout vérifier
+            candidates = order
+        else:
+            # dans chaque colonne, les cases touchées forment un seul intervalle de keys
+            starts = np.searchsorted(keys, self.get_cell_keys(columns, (rect.top - my) // cs))
+            ends = np.searchsorted(keys, self.get_cell_keys(columns, (rect.bottom + my) // cs), side="right")
+            found = [order[start:end] for start, end in zip(starts.tolist(), ends.tolist()) if start < end]
+            if not found:
+                return []
+            candidates = np.concatenate(found)
+        rects = self.get_rects(self.positions[candidates])
+        hit = (rects[:, 0] < rect.right) & (rects[:, 2] > rect.left) & \
+              (rects[:, 1] < rect.bottom) & (rects[:, 3] > rect.top)
+        return self.handles[candidates[hit]].tolist()
+
+    def get_enemies_near(self, pos: Vector2, radius: float) -> list[SwarmEnemy]:
+        """
+        :return: Les zombies à moins de radius de pos
+        """
+        dist = ((self.positions[:self.count] - (pos.x, pos.y)) ** 2).sum(axis=1)
+        return [self.enemies[i] for i in np.nonzero(dist <= radius ** 2)[0]]
+
+    def get_goals(self, cells: np.ndarray, to_core: np.ndarray,
+                  target_pos: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Cherche le prochain point de chaque zombie : la case suivante du champ de directions de sa cible, sinon le
+        chemin demandé au NavigationManager
+
+        :return: Les points (n, 2) et un masque (n,) des zombies qui ont un point où aller
+        """
+        n = self.count
+        goals = np.zeros((n, 2))
+        has_goal = np.zeros(n, dtype=bool)
+        navigation: Optional[NavigationManager] = sing.ROOT.game_objects.get("navigation")
+        if navigation is not None:
+            for name, mask in (("player", ~to_core), ("core", to_core)):
+                steps, valid = navigation.get_next_steps(name, cells)
+                valid &= mask
+                goals[valid] = steps[valid]
+                has_goal |= valid
+
+        for i in np.nonzero(~has_goal)[0]:
+            objectives = self.objectives[i]
+            x, y = self.positions[i]
+            while objectives and abs(objectives[0].x - x) < 5 and abs(objectives[0].y - y) < 5:
+                objectives.pop(0)
+            name = self.enemies[i].name
+            if navigation is not None:
+                route = navigation.poll_route(name)
+                if route:
+                    objectives[:] = route
+                elif not objectives and not navigation.is_pending(name):
+                    navigation.request_route(name, Vector2(*self.positions[i]), Vector2(*target_pos[i]))
+            if objectives:
+                goals[i] = objectives[0].x, objectives[0].y
+                has_goal[i] = True
+        return goals, has_goal
+
+    def get_near_obstacles(self, cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param cells: Les cases des zombies
+        :return: Un masque des zombies qui ont un obstacle à moins de OBSTACLE_MARGIN cases et un masque de ceux qui
+            sont sur une case d'eau
+        """
+        terrain = sing.ROOT.game_objects["terrain"]
+        m = self.OBSTACLE_MARGIN
+        left, top = cells.min(axis=0) - m
+        right, bottom = cells.max(axis=0) + m + 1
+        # la zone est limitée à la carte, les cases en dehors comptent comme libres
+        l, t = max(0, left), max(0, top)
+        r, b = min(terrain.size[0], right), min(terrain.size[1], bottom)
+        obstacles = np.zeros((bottom - top, right - left), dtype=bool)
+        water = np.zeros_like(obstacles)
+        if l < r and t < b:
+            obstacles[t - top:b - top, l - left:r - left] = terrain.get_obstacle_mask(l, t, r, b)
+            water[t - top:b - top, l - left:r - left] = terrain.get_water_mask(l, t, r, b)
+        # somme sur un carré autour de chaque case avec une table des sommes cumulées
+        sums = np.zeros((obstacles.shape[0] + 1, obstacles.shape[1] + 1), dtype=np.int32)
+        sums[1:, 1:] = obstacles.cumsum(axis=0).cumsum(axis=1)
+        x0, y0 = cells[:, 0] - left - m, cells[:, 1] - top - m
+        x1, y1 = x0 + 2 * m + 1, y0 + 2 * m + 1
+        near = sums[y1, x1] - sums[y0, x1] - sums[y1, x0] + sums[y0, x0] > 0
+        return near, water[cells[:, 1] - top, cells[:, 0] - left]
+
+    def update(self) -> None:
+        super().update()
+        self.clock += sing.ROOT.delta
+        dead = np.nonzero(self.hp[:self.count] <= 0)[0]
+        for i in dead[::-1]:
+            self.kill(int(i))
+        n = self.count
+        if n == 0:
+            return
+        pos = self.positions[:n]
+        self.previous_positions[:n] = pos
+        player = sing.ROOT.game_objects["player"]
+        core = sing.ROOT.game_objects["core"]
+        player_pos = np.array(player.get_real_pos())
+        core_pos = np.array(core.get_real_pos())
+
+        dist_player = ((pos - player_pos) ** 2).sum(axis=1)
+        dist_core = ((pos - core_pos) ** 2).sum(axis=1)
+        to_core = (dist_core < dist_player) | player.ghost_mode
+        target_pos = np.where(to_core[:, None], core_pos, player_pos)
+
+        cells = self.get_cells()
+        goals, has_goal = self.get_goals(cells, to_core, target_pos)
+        mov = np.where(has_goal[:, None], goals - pos, 0.)
+        length = np.hypot(mov[:, 0], mov[:, 1])
+        moving = length > 0
+        mov[moving] *= (self.speed / length[moving])[:, None]
+        mov += self.knockback[:n] * sing.ROOT.delta
+
+        # seuls les zombies près d'un obstacle ou du joueur peuvent être bloqués, eux vérifient leurs collisions
+        near, in_water = self.get_near_obstacles(cells)
+        block_size = sing.ROOT.game_objects["terrain"].block_px_size
+        reach = (self.half_size.max() + self.OBSTACLE_MARGIN * block_size) ** 2
+        near |= dist_player < reach
+        check = np.nonzero(near & ((mov[:, 0] != 0) | (mov[:, 1] != 0)))[0]
+        if len(check):
+            # les zombies entassés au même endroit testent souvent le même rect : on ne le vérifie qu'une fois
+            rects = self.get_rects(np.concatenate((pos[check] + mov[check] * (1, 0), pos[check] + mov[check] * (0, 1))))
+            rects[:, 2:] -= rects[:, :2]
+            blocked = {}
+            for j, rect in enumerate(map(tuple, rects.astype(np.int64).tolist())):
+                if rect not in blocked:
+                    blocked[rect] = sing.ROOT.is_colliding(pygame.Rect(rect), exclude=self.collision_mask) != -1
+                if blocked[rect]:
+                    mov[check[j % len(check)], j // len(check)] = 0
+        mov[in_water] *= WATER_DECEL
+        pos += mov
+        self.collision_index = None
+
+        # même règle que TestEnemy pour l'orientation : 0 droite, 1 haut, 2 gauche, 3 bas
+        horizontal = np.abs(mov[:, 0]) > np.abs(mov[:, 1])
+        facing = self.facing[:n]
+        facing[(mov[:, 1] < 0) & ~horizontal] = 1
+        facing[(mov[:, 1] > 0) & ~horizontal] = 3
+        facing[(mov[:, 0] < 0) & horizontal] = 2
+        facing[(mov[:, 0] > 0) & horizontal] = 0
+
+        self.knockback[:n] -= self.knockback[:n] * self.knockback_decay
+        self.update_stuck(n)
+        self.update_attacks(n, player, core, player_pos, core_pos)
+
+    def update_stuck(self, n: int) -> None:
+        """
+        Un zombie qui n'a presque pas bougé depuis CHECK_DELAY secondes abîme les blocks autour de lui et recalcule
+        son chemin
+        """
+        now = self.clock
+        due = np.nonzero(now - self.check_time[:n] > self.CHECK_DELAY)[0]
+        if len(due) == 0:
+            return
+        moved = ((self.positions[due] - self.check_pos[due]) ** 2).sum(axis=1)
+        terrain = sing.ROOT.game_objects["terrain"]
+        cells = self.get_cells()
+        for i in due[moved < 1]:
+            x, y = cells[i]
+            for d in DIRS:
+                if 0 <= y + d[0] < terrain.size[1] and 0 <= x + d[1] < terrain.size[0]:
+                    obj = terrain.over_terrain[int(y + d[0])][int(x + d[1])]
+                    if isinstance(obj, Placeable):
+                        obj.damage(5)
+            self.objectives[i] = []
+        self.check_pos[due] = self.positions[due]
+        self.check_time[due] = now
+
+    def update_attacks(self, n: int, player, core, player_pos: np.ndarray, core_pos: np.ndarray) -> None:
+        """
+        Même règle que Zombie.update : chaque zombie attaque le joueur ou le core s'il est assez près et que son
+        attaque est rechargée
+        """
+        pos = self.positions[:n]
+        timer = self.attack_timer[:n]
+        ready = timer >= Zombie.ATK_COOLDOWN
+        dist_player = ((pos - player_pos) ** 2).sum(axis=1)
+        dist_core = ((pos - core_pos) ** 2).sum(axis=1)
+        hit_player = ready & (dist_player <= Zombie.ATK_RANGE ** 2) & (not player.ghost_mode)
+        hit_core = ready & ~hit_player & (dist_core <= (Zombie.ATK_RANGE + 20) ** 2)
+        for i in np.nonzero(hit_player)[0]:
+            direction = Vector2(*(player_pos - pos[i]))
+            if direction.length_squared() > 0:
+                direction.normalize_ip()
+            player.get_damage(Zombie.ATK, direction * Zombie.KNOCKBACK_FORCE)
+        for _ in range(int(hit_core.sum())):
+            core.damage(Zombie.ATK)
+        timer[hit_player | hit_core] = 0
+        timer += sing.ROOT.delta
+
+    def get_screen_rects(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :return: Les rects sur l'écran (gauche, haut, droite, bas) des zombies visibles et leurs indices
+        """
+        offset = np.array(sing.ROOT.screen_dim) / 2 - np.array(sing.ROOT.camera_pos)
+        positions = self.positions[:self.count]
+        if sing.ROOT.render_alpha is not None:
+            previous = self.previous_positions[:self.count]
+            positions = previous + (positions - previous) * sing.ROOT.render_alpha
+        rects = self.get_rects(positions + offset).astype(np.int64)
+        w, h = sing.ROOT.screen_dim
+        visible = np.nonzero((rects[:, 2] > 0) & (rects[:, 0] < w) & (rects[:, 3] > 0) & (rects[:, 1] < h))[0]
+        return rects[visible], visible
+
+    def blit(self, screen: pygame.Surface, apply_alpha=True) -> None:
+        if not self.enabled or self.count == 0:
+            return
+        rects, visible = self.get_screen_rects()
+        images = self.images
+        facing = self.facing[visible].tolist()
+        screen.blits([(images[f], (x, y)) for f, (x, y) in zip(facing, rects[:, :2].tolist())], False)
+
+    def get_trace_state(self) -> bytes:
+        n = self.count
+        return self.positions[:n].tobytes() + self.hp[:n].tobytes() + self.attack_timer[:n].tobytes()
+
+    def get_render_state(self) -> tuple:
+        if not self.enabled:
+            return False,
+        rects, visible = self.get_screen_rects()
+        return True, rects.tobytes(), self.facing[visible].tobytes()
+
+    def get_render_rect(self) -> pygame.Rect:
+        rects, _ = self.get_screen_rects()
+        if len(rects) == 0:
+            return pygame.Rect(0, 0, 0, 0)
+        left, top = rects[:, :2].min(axis=0)
+        right, bottom = rects[:, 2:].max(axis=0)
+        return pygame.Rect(int(left), int(top), int(right - left), int(bottom - top))
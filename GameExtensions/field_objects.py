@@ -4,6 +4,7 @@ import typing
 
 import GameExtensions.generate_terrain
 from GameExtensions.util import get_grid_pos, HPBar
+from GameExtensions.locals import PLACEABLE
 
 from GameManager.util import GameObject
 import GameManager.singleton as sing
@@ -23,6 +24,8 @@ class Placeable(GameObject, metaclass=ABCMeta):
     """
     Une classe qui généralise tous les objets qu'on peut placer sur le terrain
     """
+    static_collision = True
+
     def __init__(self, pos: Vector2, image: pygame.Surface, name: str, rotation=0, block_health=10):
         """
 
@@ -32,7 +35,7 @@ class Placeable(GameObject, metaclass=ABCMeta):
         :param name: Le nom de l'objet.
         :param rotation: La rotation initiale
         """
-        super().__init__(pos, rotation, image, name)
+        super().__init__(pos, rotation, image, name, tags=[PLACEABLE])
         self.terrain: Terrain = sing.ROOT.game_objects["terrain"]
         if not isinstance(self.terrain, GameExtensions.generate_terrain.Terrain):
             raise TypeError("terrain is not an instance of Terrain")
@@ -50,7 +53,7 @@ class Placeable(GameObject, metaclass=ABCMeta):
         """
         if self.terrain.over_terrain[int(self.grid_pos.y)][int(self.grid_pos.x)] is None and\
                 sing.ROOT.is_colliding(self.image.get_rect(center=self.get_real_pos())) == -1:
-            self.terrain.over_terrain[int(self.grid_pos.y)][int(self.grid_pos.x)] = self
+            self.terrain.set_over_ter((int(self.grid_pos.x), int(self.grid_pos.y)), self)
             sing.ROOT.add_collidable_object(self)
             return True
         return False
@@ -71,7 +74,7 @@ class Placeable(GameObject, metaclass=ABCMeta):
     def damage(self, amount: int):
         self.block_health -= amount
         if self.block_health <= 0:
-            self.terrain.over_terrain[int(self.grid_pos.y)][int(self.grid_pos.x)] = None
+            self.terrain.set_over_ter((int(self.grid_pos.x), int(self.grid_pos.y)), None)
             sing.ROOT.remove_collidable_object(self)
 
 
@@ -98,6 +101,9 @@ class Core(Placeable):
         """
         self.HP = max(self.HP - amount, 0)
 
+    def get_trace_state(self) -> bytes:
+        return repr(self.HP).encode()
+
 
 class WoodBlock(Placeable):
     """
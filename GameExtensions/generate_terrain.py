@@ -1,6 +1,11 @@
 import os
+import queue
 import random
+import threading
+from collections import OrderedDict
+from typing import Optional
 
+import numpy as np
 import opensimplex as op
 import pygame
 
@@ -13,6 +18,10 @@ from GameExtensions.field_objects import Placeable
 
 
 class Terrain(GameObject):
+    WATER_CODE = -1
+    SAND_CODE = -2
+    MAX_PENDING_CHUNKS = 2
+
     def __init__(self, seed: int,
                  size: tuple[int, int],
                  biome_types: list[pygame.Surface],
@@ -25,7 +34,14 @@ class Terrain(GameObject):
                  tree_lim: float = 0.3,
                  tree_dens_lim: float = 0.3,
                  biome_chunk_size: int = 20,
-                 minkowski_exponent: float = 2.
+                 minkowski_exponent: float = 2.,
+                 render_chunk_size: int = 8,
+                 max_render_chunks: int = 48,
+                 streamed: bool = False,
+                 stream_chunk_size: int = 32,
+                 stream_radius: int = 2,
+                 stream_look_ahead: float = 1.5,
+                 max_chunk_loads: int = 1
                  ) -> None:
         """
         :param seed: seed: graine du monde
@@ -42,6 +58,14 @@ class Terrain(GameObject):
                dans les forêts (si forest density scale est assez basse)
         :param biome_chunk_size: Taille des tronçons (modifie la taille des biomes
         :param minkowski_exponent: exponentiel pour calculer les distances de Minkowski pour le bruit de Veronoi
+        :param render_chunk_size: Taille (en blocks) des morceaux de terrain pré-rendus utilisés pour l'affichage
+        :param max_render_chunks: Nombre maximum de morceaux pré-rendus gardés en mémoire
+        :param streamed: Si True, la carte n'est pas générée d'un coup : les tronçons sont générés dans un thread quand
+               la caméra s'en approche et oubliés quand elle s'en éloigne (size peut alors être très grand)
+        :param stream_chunk_size: Taille (en blocks) des tronçons générés à la demande
+        :param stream_radius: Nombre de tronçons gardés chargés autour de la caméra
+        :param stream_look_ahead: Combien de secondes en avance on charge les tronçons dans la direction de la caméra
+        :param max_chunk_loads: Nombre maximum de tronçons ajoutés à la carte par frame
         """
         super().__init__(pygame.Vector2(0, 0), 0, pygame.Surface((0, 0)), "terrain")
 
@@ -52,6 +76,8 @@ class Terrain(GameObject):
         self.seed = seed
 
         self.per = op.OpenSimplex(seed)
+        # générateur propre au terrain pour que la taille des arbres et des roches ne dépende que de la graine
+        self.rng = random.Random(seed)
 
         self.block_px_size = block_pixel_size
 
@@ -81,15 +107,186 @@ class Terrain(GameObject):
         self.voronoi = Voronoi(seed=seed + 11, chunk_size=biome_chunk_size,
                                chunk_types=biome_types, minkowski_exponent=minkowski_exponent)
 
-        self.create_terrain(self.per, size)
+        self.render_chunk_size = render_chunk_size
+        self.max_render_chunks = max_render_chunks
+        self.render_chunks: OrderedDict[tuple[int, int], pygame.Surface] = OrderedDict()
+
+        self.streamed = streamed
+        self.stream_chunk_size = stream_chunk_size
+        self.stream_radius = stream_radius
+        self.stream_look_ahead = stream_look_ahead
+        self.max_chunk_loads = max_chunk_loads
+        self.stream_requests: queue.Queue[tuple[int, int]] = queue.Queue()
+        self.stream_results: queue.Queue[tuple[tuple[int, int], tuple[np.ndarray, ...]]] = queue.Queue()
+        self.pending_chunks: set[tuple[int, int]] = set()
+        # cases occupées par un objet (arbre, roche, block...), en tableau numpy pour la navigation des ennemis
+        self.obstacles = np.zeros((0, 0), dtype=bool)
+        self.chunk_obstacles: dict[tuple[int, int], np.ndarray] = {}
+        # cases d'eau (qui ralentissent les ennemis)
+        self.water = np.zeros((0, 0), dtype=bool)
+        self.chunk_water: dict[tuple[int, int], np.ndarray] = {}
+        # augmente à chaque fois qu'une case est occupée ou libérée
+        self.obstacle_version = 0
+        self.stream_worker: Optional[threading.Thread] = None
+        self.camera_velocity = pygame.Vector2()
+        self.last_camera_pos = sing.ROOT.camera_pos.copy()
+
+        if streamed:
+            self.terrain = ChunkedGrid(size, stream_chunk_size)
+            self.over_terrain = ChunkedGrid(size, stream_chunk_size)
+            # seuls les tronçons autour de la caméra sont générés tout de suite, le reste se fait pendant la partie
+            for key in self.get_chunks_around(sing.ROOT.camera_pos, 1):
+                self.load_chunk(key, self.generate_chunk(key))
+        else:
+            self.create_terrain(self.per, size)
 
     def set_over_ter(self, pos: tuple[int, int], obj):
-        self.over_terrain[pos[1]][pos[0]] = obj
+        """
+        Place un objet sur une case (ou la libère si obj vaut None). Toutes les modifications de over_terrain doivent
+        passer par ici pour que les obstacles restent à jour.
+
+        :param pos: La case (x, y)
+        :param obj: L'objet ou None
+        """
+        x, y = pos
+        self.over_terrain[y][x] = obj
+        if self.streamed:
+            n = self.stream_chunk_size
+            key = x // n, y // n
+            if key not in self.chunk_obstacles:
+                self.chunk_obstacles[key] = np.zeros((n, n), dtype=bool)
+            self.chunk_obstacles[key][y % n, x % n] = obj is not None
+        else:
+            self.obstacles[y, x] = obj is not None
+        self.obstacle_version += 1
+
+    def get_obstacle_mask(self, left: int, top: int, right: int, bottom: int) -> np.ndarray:
+        """
+        :return: Un tableau (y, x) qui vaut True pour les cases occupées de la zone (bornes droite et basse exclues).
+            Les cases qui ne sont pas chargées sont considérées libres.
+        """
+        return self.get_layer_mask(self.obstacles, self.chunk_obstacles, left, top, right, bottom)
+
+    def get_water_mask(self, left: int, top: int, right: int, bottom: int) -> np.ndarray:
+        """
+        :return: Un tableau (y, x) qui vaut True pour les cases d'eau de la zone (bornes droite et basse exclues).
+            Les cases qui ne sont pas chargées sont considérées sans eau.
+        """
+        return self.get_layer_mask(self.water, self.chunk_water, left, top, right, bottom)
+
+    def get_layer_mask(self, full: np.ndarray, chunks: dict[tuple[int, int], np.ndarray],
+                       left: int, top: int, right: int, bottom: int) -> np.ndarray:
+        """
+        :param full: Le masque de toute la carte (mode normal)
+        :param chunks: Les masques de chaque tronçon chargé (mode streamed)
+        :return: La zone demandée du masque
+        """
+        if not self.streamed:
+            return full[top:bottom, left:right]
+        mask = np.zeros((bottom - top, right - left), dtype=bool)
+        n = self.stream_chunk_size
+        for cy in range(top // n, (bottom - 1) // n + 1):
+            for cx in range(left // n, (right - 1) // n + 1):
+                chunk = chunks.get((cx, cy))
+                if chunk is None:
+                    continue
+                x0, y0 = max(left, cx * n), max(top, cy * n)
+                x1, y1 = min(right, (cx + 1) * n), min(bottom, (cy + 1) * n)
+                mask[y0 - top:y1 - top, x0 - left:x1 - left] = chunk[y0 - cy * n:y1 - cy * n, x0 - cx * n:x1 - cx * n]
+        return mask
 
     @staticmethod
     def get_distance_squared(pos1: tuple[int, int], pos2: tuple[int, int]) -> int:
         return (pos1[0] - pos2[0]) ** 2 + (pos1[1] - pos2[1]) ** 2
 
+    def generate_layers(self, per: op.OpenSimplex, size: tuple[int, int],
+                        origin: tuple[int, int] = (0, 0)) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Calcule d'un coup (avec numpy) le type de chaque case et l'emplacement des arbres et des roches d'une zone
+        de la carte. Les cases d'eau valent WATER_CODE, celles de sable SAND_CODE et les autres l'indice du biome
+        dans biome_types. N'utilise pas pygame, on peut donc l'appeler depuis un autre thread.
+
+        :param per: L'objet nous permettant d'avoir les valeurs de chaque case (module opensimplex)
+        :param size: taille de la zone (en blocks) en (x, y)
+        :param origin: position (en blocks) du coin en haut à gauche de la zone sur la carte
+        :return: Les cases, le masque des arbres et le masque des roches (tableaux de taille (y, x))
+        """
+        size = min(size[0], self.size[0] - origin[0]), min(size[1], self.size[1] - origin[1])
+        bw = self.beach_width
+        # le sable d'une case dépend de l'eau autour d'elle et le lissage de ses voisines, on calcule donc une zone
+        # un peu plus grande (sans sortir de la carte)
+        margin = bw + 1
+        left, top = max(0, origin[0] - margin), max(0, origin[1] - margin)
+        right = min(self.size[0], origin[0] + size[0] + margin)
+        bottom = min(self.size[1], origin[1] + size[1] + margin)
+        width, height = right - left, bottom - top
+        xs, ys = np.arange(left, right), np.arange(top, bottom)
+
+        # ici on utilise les plages de valeurs pour définir ce qu'il y a sur chaque case (basé sur le Simplex)
+        water = per.noise2array(xs * self.scale, ys * self.scale) < self.water_limit
+
+        # ici on rajoute les blocks de sable à la place des blocks d'herbe : une case devient du sable si une case
+        # d'eau est à une distance inférieure à random.uniform(0, beach_width) (avec random.seed(x * y))
+        water_dist = np.full((height, width), np.inf)
+        padded = np.pad(water, bw)
+        for dy in range(-bw, bw + 1):
+            for dx in range(-bw, bw + 1):
+                shifted = padded[bw + dy:bw + dy + height, bw + dx:bw + dx + width]
+                water_dist[shifted] = np.minimum(water_dist[shifted], dx * dx + dy * dy)
+        products = np.multiply.outer(ys, xs)
+        candidates = ~water & (water_dist <= bw * bw)
+        beach_lim = np.zeros((height, width))
+        lim_cache = {}
+        for y, x in zip(*np.nonzero(candidates)):
+            k = int(products[y, x])
+            if k not in lim_cache:
+                lim_cache[k] = random.Random(k).uniform(0, bw) ** 2
+            beach_lim[y, x] = lim_cache[k]
+        sand = candidates & (water_dist <= beach_lim)
+
+        # lissage des plages : le sable est gardé s'il a de l'eau ou du sable à sa gauche (sauf sur la première ligne)
+        # ou à sa droite (sauf sur la dernière ligne)
+        solid = water | sand
+        keep = np.zeros((height, width), dtype=bool)
+        keep[:, 1:] |= solid[:, :-1]
+        if top == 0:
+            keep[0] = False
+        keep[:, :-1] |= solid[:, 1:]
+        if bottom == self.size[1]:
+            # sur la dernière ligne, seul le voisin de gauche compte, une fois lui-même lissé. Pour une zone qui ne
+            # commence pas au bord gauche de la carte, la chaîne part du bord de la zone.
+            y = height - 1
+            keep[y] = False
+            if bottom > 1:
+                for x in range(1, width):
+                    keep[y, x] = water[y, x - 1] or (sand[y, x - 1] and keep[y, x - 1])
+        sand &= keep
+
+        # on enlève la marge
+        crop = (slice(origin[1] - top, origin[1] - top + size[1]), slice(origin[0] - left, origin[0] - left + size[0]))
+        water, sand = water[crop], sand[crop]
+        xs, ys = xs[crop[1]], ys[crop[0]]
+
+        grass = ~(water | sand)
+        tiles = np.where(water, self.WATER_CODE, np.where(grass, self.voronoi.noise2array(xs, ys), self.SAND_CODE))
+        tiles = tiles.astype(np.int8)
+
+        # on en profite pour générer des arbres sur une liste différente au terrain (mais en s'y ajustant)
+        tree_zones_noise = op.OpenSimplex(self.seed + 100)
+        rock_zones_noise = op.OpenSimplex(self.seed + 99)
+        trees = grass & \
+            (tree_zones_noise.noise2array(xs * self.forest_size_scale, ys * self.forest_size_scale) > self.tree_lim)
+        # le deuxième bruit ne concerne que peu de cases, on ne le calcule que pour celles-ci
+        for y, x in zip(*np.nonzero(trees)):
+            trees[y, x] = tree_zones_noise.noise2(xs[x] * self.forest_density_scale,
+                                                  ys[y] * self.forest_density_scale) > self.tree_dens_lim
+        rocks = grass & ~trees & \
+            (rock_zones_noise.noise2array(xs * self.rock_size_scale, ys * self.rock_size_scale) > self.rock_lim)
+        for y, x in zip(*np.nonzero(rocks)):
+            rocks[y, x] = rock_zones_noise.noise2(xs[x] * self.rock_density_scale,
+                                                  ys[y] * self.rock_density_scale) > self.rock_dens_lim
+        return tiles, trees, rocks
+
     def create_terrain(self, per: op.OpenSimplex, size: tuple[int, int]) -> None:
         """ Cree grace au bruit de Perlin (Prelin's noise), sa deuxième version donc le Simplex,
         une carte avec de l'herbe, du sable et de l'eau et des arbres
@@ -98,74 +295,255 @@ class Terrain(GameObject):
         """
         x_half = (self.size[0] * self.block_px_size) / 2
         y_half = (self.size[1] * self.block_px_size) / 2
+        self.render_chunks.clear()
 
-        for y in range(size[1]):
-            self.terrain.append([])
-            self.over_terrain.append([])
-            for x in range(size[0]):
-                # ici on utilise les plages de valeurs pour définir ce qu'il y a sur chaque case (basé sur le Simplex)
-                tmp = per.noise2(x * self.scale, y * self.scale)
-                if tmp < self.water_limit:
-                    self.terrain[y].append(self.WATER)
-                else:
-                    self.terrain[y].append(self.voronoi.noise2(x, y))
-                self.over_terrain[y].append(None)
-
-        # ici on rajouter les blocks de sable à la place des blocks d'herbe
-        for y, line in enumerate(self.terrain):
-            for x, el in enumerate(line):
-                # on remplace l'herbe dans un carré
-                if el == self.WATER:
-                    for x2 in range(x - self.beach_width, x + self.beach_width + 1):
-                        for y2 in range(y - self.beach_width, y + self.beach_width + 1):
-                            if 0 <= x2 < size[0] and 0 <= y2 < size[1]:
-                                random.seed(x2 * y2)
-                                # on enlève le sable qui n'est ni à côté de l'eau ou de plus de sable
-                                if self.terrain[y2][x2] in self.biome_types and \
-                                        self.get_distance_squared((x, y), (x2, y2)) \
-                                        <= random.uniform(0, self.beach_width) ** 2:
-                                    self.terrain[y2][x2] = self.SAND
-        # on en profite pour générer des arbres sur une liste différente au terrain (mais en s'y ajustant)
-        tree_zones_noise = op.OpenSimplex(self.seed + 100)
-        rock_zones_noise = op.OpenSimplex(self.seed + 99)
-        for y, line in enumerate(self.terrain):
-            for x, el in enumerate(line):
-                # lissage des plages
-                if el == self.SAND:
-                    tmp_change = True
-                    for p in range(0, 3, 2):
-                        tmp_x, tmp_y = x + p - 1, y + p - 1
-                        if 0 <= tmp_x < size[0] and 0 <= tmp_y < size[1]:
-                            tmp_elx, tmp_ely = self.terrain[y][tmp_x], self.terrain[tmp_y][x]
-                            if (tmp_elx == self.SAND or tmp_elx == self.WATER or
-                                    tmp_elx == self.SAND or tmp_elx == self.WATER):
-                                tmp_change = False
-                                break
-                    if tmp_change:
-                        self.terrain[y][x] = self.voronoi.noise2(x, y)
-                # arbres
-                if self.terrain[y][x] in self.biome_types:
-                    if tree_zones_noise.noise2(
-                            x * self.forest_size_scale, y * self.forest_size_scale
-                    ) > self.tree_lim and tree_zones_noise.noise2(
-                        x * self.forest_density_scale, y * self.forest_density_scale
-                    ) > self.tree_dens_lim:
-                        tr = Tree(pygame.Vector2(x * self.block_px_size - x_half,
-                                                 y * self.block_px_size - y_half),
-                                  f"TREE {x} {y}")
-                        self.over_terrain[y][x] = tr
-                        sing.ROOT.add_collidable_object(tr)
-
-                    if rock_zones_noise.noise2(
-                            x * self.rock_size_scale, y * self.rock_size_scale
-                    ) > self.rock_lim and rock_zones_noise.noise2(
-                        x * self.rock_density_scale, y * self.rock_density_scale
-                    ) > self.rock_dens_lim and self.over_terrain[y][x] is None:
-                        tr = Rock(pygame.Vector2(x * self.block_px_size - x_half,
-                                                                      y * self.block_px_size - y_half),
-                                                       f"Rock {x} {y}")
-                        self.over_terrain[y][x] = tr
-                        sing.ROOT.add_collidable_object(tr)
+        tiles, trees, rocks = self.generate_layers(per, size)
+        surfaces = self.get_tile_surfaces()
+        self.terrain = [[surfaces[c] for c in line] for line in tiles.tolist()]
+        self.over_terrain = [[None] * size[0] for _ in range(size[1])]
+
+        for y, x in zip(*np.nonzero(trees | rocks)):
+            y, x = int(y), int(x)
+            self.over_terrain[y][x] = self.create_resource(x, y, trees[y, x], self.rng)
+        self.obstacles = trees | rocks
+        self.water = tiles == self.WATER_CODE
+        self.obstacle_version += 1
+
+    def get_tile_surfaces(self) -> dict[int, pygame.Surface]:
+        """
+        :return: L'image correspondant à chaque code de case renvoyé par generate_layers
+        """
+        surfaces = {self.WATER_CODE: self.WATER, self.SAND_CODE: self.SAND}
+        surfaces.update(enumerate(self.biome_types))
+        return surfaces
+
+    def create_resource(self, x: int, y: int, tree: bool, rng: random.Random) -> Resource:
+        """
+        Crée un arbre ou une roche sur une case et l'ajoute aux objets avec lesquels on peut entrer en collision
+
+        :param x: L'abscisse de la case
+        :param y: L'ordonnée de la case
+        :param tree: True pour un arbre, False pour une roche
+        :param rng: Le générateur aléatoire utilisé pour la taille de l'objet
+        :return: L'objet créé
+        """
+        pos = pygame.Vector2(x * self.block_px_size - (self.size[0] * self.block_px_size) / 2,
+                             y * self.block_px_size - (self.size[1] * self.block_px_size) / 2)
+        if tree:
+            tr = Tree(pos, f"TREE {x} {y}", rng=rng)
+        else:
+            tr = Rock(pos, f"Rock {x} {y}", rng=rng)
+        tr.cell = x, y
+        sing.ROOT.add_collidable_object(tr)
+        return tr
+
+    def get_chunk_key(self, pos: pygame.Vector2) -> tuple[int, int]:
+        """
+        :param pos: Une position universelle
+        :return: Les indices du tronçon (mode streamed) qui contient cette position
+        """
+        half = self.block_px_size / 2
+        map_pos = self.get_real_pos()
+        grid_x = (pos.x - map_pos.x + half) // self.block_px_size + self.size[0] // 2
+        grid_y = (pos.y - map_pos.y + half) // self.block_px_size + self.size[1] // 2
+        return int(grid_x // self.stream_chunk_size), int(grid_y // self.stream_chunk_size)
+
+    def get_chunks_around(self, pos: pygame.Vector2, radius: int) -> list[tuple[int, int]]:
+        """
+        :param pos: Une position universelle
+        :param radius: Le nombre de tronçons autour de celui qui contient la position
+        :return: Les tronçons (qui existent sur la carte) dans ce carré
+        """
+        cx, cy = self.get_chunk_key(pos)
+        n = self.stream_chunk_size
+        max_x, max_y = (self.size[0] - 1) // n, (self.size[1] - 1) // n
+        return [(x, y) for y in range(max(0, cy - radius), min(max_y, cy + radius) + 1)
+                for x in range(max(0, cx - radius), min(max_x, cx + radius) + 1)]
+
+    def generate_chunk(self, key: tuple[int, int]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Génère les couches d'un tronçon (peut être appelée depuis le thread de génération)
+
+        :param key: Les indices du tronçon
+        :return: Le résultat de generate_layers pour ce tronçon
+        """
+        n = self.stream_chunk_size
+        return self.generate_layers(self.per, (n, n), (key[0] * n, key[1] * n))
+
+    def load_chunk(self, key: tuple[int, int], layers: tuple[np.ndarray, np.ndarray, np.ndarray]) -> None:
+        """
+        Ajoute à la carte un tronçon généré par generate_chunk, avec ses arbres et ses roches
+
+        :param key: Les indices du tronçon
+        :param layers: Les couches du tronçon
+        """
+        tiles, trees, rocks = layers
+        n = self.stream_chunk_size
+        surfaces = self.get_tile_surfaces()
+        self.terrain.set_chunk(key, [[surfaces[c] for c in line] for line in tiles.tolist()])
+
+        # un block a pu être posé avant que le tronçon soit chargé, on ne l'écrase pas
+        over = self.over_terrain.chunks.get(key)
+        if over is None:
+            over = [[None] * tiles.shape[1] for _ in range(tiles.shape[0])]
+        # chaque tronçon a son propre générateur pour ne pas dépendre de l'ordre de chargement
+        rng = random.Random(f"{self.seed} {key[0]} {key[1]}")
+        for y, x in zip(*np.nonzero(trees | rocks)):
+            y, x = int(y), int(x)
+            if over[y][x] is None:
+                over[y][x] = self.create_resource(key[0] * n + x, key[1] * n + y, trees[y, x], rng)
+        self.over_terrain.set_chunk(key, over)
+        obstacles = np.zeros((n, n), dtype=bool)
+        obstacles[:len(over), :len(over[0])] = [[obj is not None for obj in line] for line in over]
+        self.chunk_obstacles[key] = obstacles
+        water = np.zeros((n, n), dtype=bool)
+        water[:tiles.shape[0], :tiles.shape[1]] = tiles == self.WATER_CODE
+        self.chunk_water[key] = water
+        self.obstacle_version += 1
+        sing.ROOT.invalidate()
+
+    def mark_modified(self, pos: tuple[int, int]) -> None:
+        """
+        Indique qu'une case n'est plus celle que la génération donnerait (une ressource minée...) sans passer par
+        set_over_ter : son tronçon ne sera plus déchargé (mode streamed)
+
+        :param pos: La case (x, y)
+        """
+        if self.streamed:
+            self.over_terrain.modified.add((pos[0] // self.stream_chunk_size, pos[1] // self.stream_chunk_size))
+
+    def can_unload_chunk(self, key: tuple[int, int]) -> bool:
+        """
+        Un tronçon peut être oublié s'il est identique à celui qu'on obtiendrait en le générant à nouveau, c'est-à-dire
+        si aucune case n'a été changée (set_over_ter) et aucune ressource minée (mark_modified).
+        Les tronçons modifiés ne sont jamais enregistrés sur le disque : ils restent en mémoire jusqu'à la fin de la
+        partie.
+
+        :param key: Les indices du tronçon
+        :return: True si on peut le décharger sinon False
+        """
+        return key not in self.over_terrain.modified
+
+    def unload_chunk(self, key: tuple[int, int]) -> None:
+        """
+        Enlève un tronçon de la carte (et les hitboxes de ses arbres et roches)
+
+        :param key: Les indices du tronçon
+        """
+        for line in self.over_terrain.pop_chunk(key) or ():
+            for obj in line:
+                if obj is not None:
+                    sing.ROOT.remove_collidable_object(obj)
+        self.terrain.pop_chunk(key)
+        self.chunk_obstacles.pop(key, None)
+        self.chunk_water.pop(key, None)
+        self.obstacle_version += 1
+
+    def update_streaming(self) -> None:
+        """
+        Demande la génération des tronçons autour de la caméra (en priorité ceux vers lesquels elle se dirige), ajoute
+        ceux qui sont prêts et décharge ceux qui sont loin et n'ont pas été modifiés.
+        Pendant un enregistrement ou un replay (sing.ROOT.input.deterministic), les tronçons sont générés tout de suite
+        au lieu du thread, pour arriver au même pas dans les deux parties.
+        """
+        deterministic = sing.ROOT.input.deterministic
+        if self.stream_worker is None and not deterministic:
+            self.stream_worker = threading.Thread(target=self.run_stream_worker, daemon=True)
+            self.stream_worker.start()
+
+        cam = sing.ROOT.camera_pos
+        if sing.ROOT.delta > 0:
+            # vitesse (lissée) de la caméra en pixels par seconde
+            self.camera_velocity = self.camera_velocity.lerp((cam - self.last_camera_pos) / sing.ROOT.delta, 0.1)
+        self.last_camera_pos = cam.copy()
+        ahead = cam + self.camera_velocity * self.stream_look_ahead
+        ahead_x, ahead_y = self.get_chunk_key(ahead)
+
+        wanted = set(self.get_chunks_around(cam, self.stream_radius))
+        wanted.update(self.get_chunks_around(ahead, self.stream_radius))
+        missing = sorted((key for key in wanted if key not in self.terrain.chunks and key not in self.pending_chunks),
+                         key=lambda k: (k[0] - ahead_x) ** 2 + (k[1] - ahead_y) ** 2)
+        if deterministic:
+            for key in missing[:self.max_chunk_loads]:
+                self.load_chunk(key, self.generate_chunk(key))
+            missing = []
+        for key in missing[:max(0, self.MAX_PENDING_CHUNKS - len(self.pending_chunks))]:
+            self.pending_chunks.add(key)
+            self.stream_requests.put(key)
+
+        for _ in range(self.max_chunk_loads):
+            try:
+                key, layers = self.stream_results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending_chunks.discard(key)
+            self.load_chunk(key, layers)
+
+        cam_x, cam_y = self.get_chunk_key(cam)
+        limit = self.stream_radius + 2
+        for key in list(self.terrain.chunks):
+            if max(abs(key[0] - cam_x), abs(key[1] - cam_y)) > limit and \
+                    max(abs(key[0] - ahead_x), abs(key[1] - ahead_y)) > limit and self.can_unload_chunk(key):
+                self.unload_chunk(key)
+
+    def run_stream_worker(self) -> None:
+        """
+        Boucle du thread qui génère les tronçons demandés par update_streaming
+        """
+        while True:
+            try:
+                key = self.stream_requests.get(timeout=1)
+            except queue.Empty:
+                # le terrain n'est plus dans le jeu (partie terminée), on arrête le thread
+                if sing.ROOT.game_objects.get(self.name) is not self:
+                    return
+                continue
+            self.stream_results.put((key, self.generate_chunk(key)))
+
+    def is_area_loaded(self, left: int, top: int, right: int, bottom: int) -> bool:
+        """
+        :return: True si toutes les cases de la zone (bornes droite et basse exclues) sont chargées
+        """
+        if not self.streamed:
+            return True
+        n = self.stream_chunk_size
+        return all((x, y) in self.terrain.chunks for y in range(top // n, (bottom - 1) // n + 1)
+                   for x in range(left // n, (right - 1) // n + 1))
+
+    def early_update(self) -> None:
+        super().early_update()
+        if self.streamed:
+            self.update_streaming()
+
+    def get_render_chunk(self, chunk_x: int, chunk_y: int) -> Optional[pygame.Surface]:
+        """
+        Renvoie l'image pré-rendue d'un morceau du terrain. Elle est créée la première fois qu'on en a besoin et les
+        morceaux les moins récemment utilisés sont oubliés au-delà de max_render_chunks.
+
+        :param chunk_x: L'indice du morceau sur l'abscisse
+        :param chunk_y: L'indice du morceau sur l'ordonnée
+        :return: L'image du morceau, None si cette partie de la carte n'est pas encore chargée
+        """
+        key = chunk_x, chunk_y
+        surf = self.render_chunks.get(key)
+        if surf is not None:
+            self.render_chunks.move_to_end(key)
+            return surf
+
+        n, bs = self.render_chunk_size, self.block_px_size
+        left, top = chunk_x * n, chunk_y * n
+        right, bottom = min(left + n, self.size[0]), min(top + n, self.size[1])
+        if not self.is_area_loaded(left, top, right, bottom):
+            return None
+        surf = pygame.Surface(((right - left) * bs, (bottom - top) * bs)).convert()
+        surf.fill(sing.ROOT.background)
+        surf.blits([(self.terrain[y][x], ((x - left) * bs, (y - top) * bs))
+                    for y in range(top, bottom) for x in range(left, right)], False)
+
+        self.render_chunks[key] = surf
+        if len(self.render_chunks) > self.max_render_chunks:
+            self.render_chunks.popitem(last=False)
+        return surf
 
     def blit(self, scr: pygame.Surface, apply_alpha=False) -> None:
         """
@@ -180,16 +558,17 @@ class Terrain(GameObject):
         scr_width_half, scr_height_half = sing.ROOT.screen_dim[0] / 2, sing.ROOT.screen_dim[1] / 2
         top_start_index, bottom_index, left_start_index, right_index = self.get_render_index()
 
-        # print("aa", top_diff)
-        # print("VERTICAL", top_start_index, bottom_index)
-        # print("HORIZONTAL", left_start_index, right_index)
-        for i, t in enumerate(self.terrain[top_start_index:bottom_index]):
-            new_i = i + top_start_index
-            y = new_i * self.block_px_size + center_y - y_dim_half - sing.ROOT.camera_pos.y + scr_height_half
-            for j, c in enumerate(t[left_start_index:right_index]):
-                new_j = j + left_start_index
-                x = new_j * self.block_px_size + center_x - x_dim_half - sing.ROOT.camera_pos.x + scr_width_half
-                scr.blit(c, c.get_rect(center=(x, y)))
+        # le coin en haut à gauche du block (0, 0) sur l'écran
+        origin_x, origin_y = self.SAND.get_rect(center=(
+            center_x - x_dim_half - sing.ROOT.camera_pos.x + scr_width_half,
+            center_y - y_dim_half - sing.ROOT.camera_pos.y + scr_height_half)).topleft
+        n = self.render_chunk_size
+        chunk_px = n * self.block_px_size
+        for chunk_y in range(top_start_index // n, bottom_index // n + 1):
+            for chunk_x in range(left_start_index // n, right_index // n + 1):
+                surf = self.get_render_chunk(chunk_x, chunk_y)
+                if surf is not None:
+                    scr.blit(surf, (origin_x + chunk_x * chunk_px, origin_y + chunk_y * chunk_px))
 
     def blit_over_terrain(self, scr: pygame.Surface):
         """
@@ -214,7 +593,7 @@ class Terrain(GameObject):
                     if isinstance(obj, Resource):
                         if obj.size <= obj.destroy_threshold:
                             sing.ROOT.remove_collidable_object(obj)
-                            self.over_terrain[new_i][new_j] = None
+                            self.set_over_ter((new_j, new_i), None)
                             continue
                         obj.blit(scr)
                     elif isinstance(obj, Placeable):
@@ -222,6 +601,36 @@ class Terrain(GameObject):
                     else:
                         scr.blit(obj, obj.get_rect(center=(x, y)))
 
+    def get_render_state(self) -> tuple:
+        # Le terrain ne change que quand la caméra bouge, ce qui force déjà un rendu complet
+        return self.enabled,
+
+    def get_trace_state(self) -> bytes:
+        # chaque bloc posé ou détruit et chaque tronçon chargé change obstacle_version
+        return repr(self.obstacle_version).encode()
+
+    def get_render_rect(self) -> pygame.Rect:
+        return sing.ROOT.display.get_rect()
+
+    def get_over_terrain_render_state(self) -> tuple:
+        """
+        Résume ce qui est affiché par blit_over_terrain (pour le rendu partiel)
+
+        :return: Un tuple qui change dès qu'un objet visible sur la map change
+        """
+        top_start_index, bottom_index, left_start_index, right_index = self.get_render_index()
+        state = []
+        for line in self.over_terrain[top_start_index:bottom_index]:
+            for obj in line[left_start_index:right_index]:
+                if obj is None:
+                    continue
+                if isinstance(obj, Resource):
+                    # on ne passe pas par get_screen_pos() qui fait avancer le tremblement
+                    state.append((obj, obj.image, obj.shake.shaking, obj.shake.time))
+                else:
+                    state.append((obj, obj.image))
+        return tuple(state)
+
     def get_ter_index_to_pos(self, pos: tuple[int, int]) -> tuple[int, int]:
         center_x = self.get_real_pos().x
         center_y = self.get_real_pos().y
@@ -261,16 +670,100 @@ class Terrain(GameObject):
         return top_start_index, bottom_index, left_start_index, right_index
 
 
+class ChunkedGrid:
+    """
+    Grille découpée en tronçons qui ne sont en mémoire que s'ils sont chargés. Elle s'utilise comme une liste de listes
+    (grid[y][x], len(grid), grid[a:b]) et une case d'un tronçon non chargé vaut default.
+    """
+
+    def __init__(self, size: tuple[int, int], chunk_size: int, default=None):
+        """
+        :param size: taille de la grille (en cases) en (x, y)
+        :param chunk_size: taille d'un tronçon (en cases)
+        :param default: valeur des cases qui ne sont pas chargées
+        """
+        self.size = size
+        self.chunk_size = chunk_size
+        self.default = default
+        self.chunks: dict[tuple[int, int], list[list]] = {}
+        self.modified: set[tuple[int, int]] = set()
+
+    def get(self, x: int, y: int):
+        if not (0 <= x < self.size[0] and 0 <= y < self.size[1]):
+            return self.default
+        chunk = self.chunks.get((x // self.chunk_size, y // self.chunk_size))
+        if chunk is None:
+            return self.default
+        return chunk[y % self.chunk_size][x % self.chunk_size]
+
+    def set(self, x: int, y: int, value) -> None:
+        """
+        Modifie une case. Son tronçon est marqué comme modifié (et créé s'il n'était pas chargé).
+        """
+        if not (0 <= x < self.size[0] and 0 <= y < self.size[1]):
+            raise IndexError("La case n'est pas dans la grille")
+        n = self.chunk_size
+        key = x // n, y // n
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = [[self.default] * n for _ in range(n)]
+        chunk[y % n][x % n] = value
+        self.modified.add(key)
+
+    def set_chunk(self, key: tuple[int, int], rows: list[list]) -> None:
+        self.chunks[key] = rows
+
+    def pop_chunk(self, key: tuple[int, int]) -> Optional[list[list]]:
+        self.modified.discard(key)
+        return self.chunks.pop(key, None)
+
+    def __len__(self) -> int:
+        return self.size[1]
+
+    def __getitem__(self, y):
+        if isinstance(y, slice):
+            return [ChunkedRow(self, i) for i in range(*y.indices(self.size[1]))]
+        return ChunkedRow(self, y)
+
+    def __iter__(self):
+        return (ChunkedRow(self, y) for y in range(self.size[1]))
+
+
+class ChunkedRow:
+    """
+    Une ligne d'une ChunkedGrid (ce que renvoie grid[y])
+    """
+    __slots__ = "grid", "y"
+
+    def __init__(self, grid: ChunkedGrid, y: int):
+        self.grid = grid
+        self.y = y
+
+    def __len__(self) -> int:
+        return self.grid.size[0]
+
+    def __getitem__(self, x):
+        if isinstance(x, slice):
+            return [self.grid.get(i, self.y) for i in range(*x.indices(self.grid.size[0]))]
+        return self.grid.get(x, self.y)
+
+    def __setitem__(self, x: int, value) -> None:
+        self.grid.set(x, self.y, value)
+
+    def __iter__(self):
+        return (self.grid.get(x, self.y) for x in range(self.grid.size[0]))
+
+
 # Classe permettant de générer un bruit de Voronoi qu'on utilise pour délimiter des zones
 class Voronoi:
-    points = {}  # cette variable permet de rendre la génération de terrain plus rapide en sauvgardant les données
-
-    def __init__(self, seed: int, chunk_size: int, chunk_types: list, minkowski_exponent: float = 2):
+    def __init__(self, seed: int, chunk_size: int, chunk_types: list, minkowski_exponent: float = 2,
+                 max_cached_points: int = 4096):
         """
         :param seed: graine de la génération
         :param chunk_size: taille des tronçons (répartition des points
         :param chunk_types: différants types de points (zones ou biomes)
         :param minkowski_exponent: l'exponentiel pour le calcul des distances (2 == théorème de Pythagore)
+        :param max_cached_points: nombre maximum de points de tronçons gardés en mémoire
         """
         assert chunk_size > 0, "Les tronçons doivent éxister! (leur taille doit être superieure à 0)"
         assert len(chunk_types) > 0, "Il doit y avoir au mois un type de biome!"
@@ -281,6 +774,80 @@ class Voronoi:
         self.chunk_types = chunk_types
 
         self.minkowski_exponent = minkowski_exponent
+        # générateur propre pour ne pas toucher à l'état du module random (la génération peut se faire dans un thread)
+        self.random = random.Random()
+
+        # cette variable permet de rendre la génération de terrain plus rapide en sauvgardant les données
+        self.points: OrderedDict[tuple[int, int], tuple[int, int]] = OrderedDict()
+        self.max_cached_points = max_cached_points
+        # distance (à la puissance) sur un axe en fonction de l'écart, l'écart ne dépasse jamais 4 tronçons
+        self.axis_distances = np.array([d ** minkowski_exponent for d in range(4 * chunk_size + 1)])
+
+    def get_point(self, chunk_x: int, chunk_y: int) -> tuple[int, int]:
+        """
+        :param chunk_x: L'indice du tronçon sur l'abscisse
+        :param chunk_y: L'indice du tronçon sur l'ordonnée
+        :return: Les coordonées du point du tronçon dans le tronçon ((0;0) étant en haut à gauche)
+        """
+        c_pos = chunk_x, chunk_y
+        point = self.points.get(c_pos)
+        if point is not None:
+            self.points.move_to_end(c_pos)
+            return point
+        # les seed servent à avoir toujours la même chose même si on les répète plusieurs fois
+        self.random.seed(chunk_y * (chunk_x + 1) + self.seed + 20)
+        point = self.random.randint(0, self.chunk_size - 1), self.random.randint(0, self.chunk_size - 1)
+        self.points[c_pos] = point
+        if len(self.points) > self.max_cached_points:
+            self.points.popitem(last=False)
+        return point
+
+    def noise2array(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """ Calcule d'un coup le type de chaque point de la grille formée par xs et ys
+        :param xs: positions x des points (entiers)
+        :param ys: positions y des points (entiers)
+        :return: l'indice dans chunk_types du type de chaque point (tableau de taille (len(ys), len(xs)))
+        """
+        cs = self.chunk_size
+        xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+        chunk_x, chunk_y = np.meshgrid(xs // cs, ys // cs)
+        x, y = np.meshgrid(xs, ys)
+
+        # les points de tous les tronçons qui peuvent être regardés
+        left, top = int(chunk_x.min()) - 2, int(chunk_y.min()) - 2
+        right, bottom = int(chunk_x.max()) + 2, int(chunk_y.max()) + 2
+        table = np.array([[self.get_point(i, j) for i in range(left, right + 1)] for j in range(top, bottom + 1)])
+        table = table.reshape((bottom - top + 1, right - left + 1, 2))
+
+        def get_distances(pos_x: np.ndarray, pos_y: np.ndarray) -> np.ndarray:
+            return self.axis_distances[np.abs(x - pos_x)] + self.axis_distances[np.abs(y - pos_y)]
+
+        # le premier candidat est le point du tronçon (-2, -2), les 25 suivants sont les points des tronçons autour,
+        # décalés d'un tronçon (comme l'a toujours fait noise2)
+        first = table[chunk_y - 2 - top, chunk_x - 2 - left]
+        cand_x = [cs * (chunk_x - 2) + first[..., 0]]
+        cand_y = [cs * (chunk_y - 2) + first[..., 1]]
+        for j in range(5):
+            for i in range(5):
+                point = table[chunk_y - 2 + j - top, chunk_x - 2 + i - left]
+                cand_x.append(cs * (chunk_x + i - 1) + point[..., 0])
+                cand_y.append(cs * (chunk_y + j - 1) + point[..., 1])
+        cand_x, cand_y = np.array(cand_x), np.array(cand_y)
+        # argmin garde le premier des plus proches, comme la comparaison stricte de noise2
+        closest = np.argmin(np.array([get_distances(cx, cy) for cx, cy in zip(cand_x, cand_y)]), axis=0)
+        closest_x = np.take_along_axis(cand_x, closest[None], 0)[0]
+        closest_y = np.take_along_axis(cand_y, closest[None], 0)[0]
+        # si c'est le premier candidat, on utilise les indices du tronçon plutôt que la position du point
+        closest_x = np.where(closest == 0, chunk_x - 2, closest_x)
+        closest_y = np.where(closest == 0, chunk_y - 2, closest_y)
+
+        # finalement on utilise les seed pour que tous les points dans la zone du tronçon soient du même type
+        keys, inverse = np.unique(closest_x * (closest_y + 1) + self.seed, return_inverse=True)
+        indexes = []
+        for key in keys.tolist():
+            self.random.seed(key)
+            indexes.append(self.random.choice(range(len(self.chunk_types))))
+        return np.array(indexes)[inverse].reshape(x.shape)
 
     def noise2(self, x, y):
         """ Cette fonction nous permet d'avoir le type du point de coordonnées données
@@ -289,51 +856,7 @@ class Voronoi:
         :param y: position y du point
         :return: type du point (donné dans la création de l'objet)
         """
-
-        def minkowski_distance_exp(x2: int, y2: int):
-            """ Calcule la distance avec la formule de Minkowski à la puissance
-            :param x2: position x du point
-            :param y2: position y du point
-            :return: la distance de Minkowski entre le point donné et le point de coordonées (x, y)
-            """
-            return abs(x - x2) ** self.minkowski_exponent + abs(y - y2) ** self.minkowski_exponent
-
-        # On repère les coordonées du tronçon dans lequel le point se situe
-        chunk_x = x // self.chunk_size
-        chunk_y = y // self.chunk_size
-
-        # ici on définit les coordonées du point de chaque tronçon dans le tronçon ((0;0) étant en haut à gauche)
-        points = []
-        for j in range(chunk_y - 2, chunk_y + 3):
-            points.append([])
-            for i in range(chunk_x - 2, chunk_x + 3):
-                c_pos = (i, j)
-                # On utilise un diccionnaire pour accélérer la génération
-                if c_pos not in self.points:
-                    # les seed servent à avoir toujours la même chose même si on les répète plusieurs fois
-                    random.seed(c_pos[1] * (c_pos[0] + 1) + self.seed + 20)
-                    self.points[c_pos] = (
-                        random.randint(0, self.chunk_size - 1),
-                        random.randint(0, self.chunk_size - 1)
-                    )
-                points[-1].append(self.points[c_pos])
-
-        # à partir d'ici on cherche le tronçaon dont le point est le plus proche
-        closest_point_chunk = (chunk_x - 2, chunk_y - 2)
-        dist = minkowski_distance_exp(self.chunk_size * (chunk_x - 2) + points[0][0][0],
-                                      self.chunk_size * (chunk_y - 2) + points[0][0][1])
-        for i_y, line in enumerate(points):
-            for i_x, point in enumerate(line):
-                true_ix = self.chunk_size * (chunk_x + i_x - 1) + point[0]
-                true_iy = self.chunk_size * (chunk_y + i_y - 1) + point[1]
-                tmp_dist = minkowski_distance_exp(true_ix, true_iy)
-                if tmp_dist < dist:
-                    closest_point_chunk = (true_ix, true_iy)
-                    dist = tmp_dist
-
-        # finalement on utilise les seed pour que tous les points dans la zone du tronçon soient du même type
-        random.seed(closest_point_chunk[0] * (closest_point_chunk[1] + 1) + self.seed)
-        return random.choice(self.chunk_types)
+        return self.chunk_types[int(self.noise2array(np.array([x]), np.array([y]))[0, 0])]
 
 
 class RenderOverTerrain(GameObject):
@@ -342,3 +865,9 @@ class RenderOverTerrain(GameObject):
 
     def blit(self, screen: pygame.Surface, apply_alpha=False) -> None:
         sing.ROOT.game_objects["terrain"].blit_over_terrain(screen)
+
+    def get_render_state(self) -> tuple:
+        return self.enabled, sing.ROOT.game_objects["terrain"].get_over_terrain_render_state()
+
+    def get_render_rect(self) -> pygame.Rect:
+        return sing.ROOT.display.get_rect()
@@ -264,8 +264,8 @@ class Inventory(GameObject):
         """ Toutes les actions faites à chaque frame"""
 
         # Détéction de si on appuie sur la souris ou le clavier
-        pressed_keys = pygame.key.get_pressed()
-        all_mouse_but = pygame.mouse.get_pressed(5)
+        pressed_keys = sing.ROOT.input.get_pressed()
+        all_mouse_but = sing.ROOT.input.get_mouse_pressed(5)
         mouse_but = (all_mouse_but[0], all_mouse_but[2])
         if not self.was_open_inv_pressed and pressed_keys[self.open_inv_key]:
             self.is_shown = not self.is_shown
@@ -294,7 +294,7 @@ class Inventory(GameObject):
                 # de la souris transformées en coordonées d'"inventaire"
 
                 # On commence par donner les coordonnées de la souris dans chaque élément de l'inventaire
-                mouse_pos = pygame.Vector2(pygame.mouse.get_pos())
+                mouse_pos = pygame.Vector2(sing.ROOT.input.get_mouse_pos())
                 get_grid_mouse_co = mouse_pos - self.side_offset - self.pos
                 get_hotbar_mouse_co = get_grid_mouse_co - loc.HOTBAR_POS_OFFSET
                 get_craft_mouse_co = get_grid_mouse_co - loc.CRAFT_POS_OFFSET
@@ -366,7 +366,7 @@ class Inventory(GameObject):
 
         if not self.is_shown:
             if mouse_but[0]:
-                mouse_pos = pygame.Vector2(*pygame.mouse.get_pos())
+                mouse_pos = pygame.Vector2(*sing.ROOT.input.get_mouse_pos())
 
                 # on convertis les coordonnées de la souris en coordonnées de l'inventaire
                 get_hotbar_mouse_co = mouse_pos - self.side_offset - self.pos - loc.HOTBAR_POS_OFFSET
@@ -383,6 +383,22 @@ class Inventory(GameObject):
             elif self.is_pressed["bool"]:
                 self.is_pressed["bool"] = False
 
+    def get_render_state(self) -> tuple:
+        """ Résume ce qui est affiché par l'inventaire (pour le rendu partiel de GameRoot)"""
+        cells = tuple((el.get_img(), el.get_n_img()) for el in self.hotbar)
+        if not self.is_shown:
+            return False, self.selected, cells
+        for line in self.objects + self.crafting_station[0] + [self.crafting_station[1]]:
+            cells += tuple((el.get_img(), el.get_n_img()) for el in line)
+        carried = None
+        if (self.is_pressed["bool"] or self.is_pressed["bool_right"]) and not self.is_pressed["crafted"]:
+            el = self.is_pressed["cary"]
+            carried = el.get_img(), el.get_n_img(), sing.ROOT.input.get_mouse_pos()
+        return True, self.selected, cells, carried
+
+    def get_render_rect(self) -> pygame.Rect:
+        return sing.ROOT.display.get_rect()
+
     def blit_cell(self, screen: pygame.Surface, pos: tuple[int, int], el: items.InventoryObject) -> None:
         """ Faire afficher un objet à se place dans la grille
         :param screen: fenêtre du jeu
@@ -476,7 +492,7 @@ class Inventory(GameObject):
             # on affiche l'objet déplacé en dernier pour qu'il se retrouve devant
             if (self.is_pressed["bool"] or self.is_pressed["bool_right"]) and not self.is_pressed["crafted"]:
                 el = self.is_pressed["cary"]
-                pos = pygame.mouse.get_pos()
+                pos = sing.ROOT.input.get_mouse_pos()
                 screen.blit(el.get_img(), el.get_img().get_rect(center=pos))
                 screen.blit(
                     el.get_n_img(),
@@ -4,6 +4,7 @@ from GameManager.resources import load_img
 import GameManager.singleton as sing
 from GameManager.util import GameObject
 
+import itertools
 import pygame
 from pygame.math import Vector2
 
@@ -204,10 +205,12 @@ class MagicBullet(GameObject):
     TARGET_DETECT_DISTANCE = 140
     LIFE_DURATION = 5
     DAMAGE = 5
+    # numéros des noms des boules (pas l'heure : deux boules tirées la même milliseconde auraient le même nom)
+    ids = itertools.count()
 
     def __init__(self, pos: Vector2, direction: Vector2):
         super().__init__(pos, 0, load_img("resources/player/magic_bullet.png", (16, 16)),
-                         f"mb{pygame.time.get_ticks()}")
+                         f"mb{next(MagicBullet.ids)}")
         self.direction = direction
         self.target: Optional[GameObject] = None
         self.timer = 0
@@ -224,6 +227,12 @@ class MagicBullet(GameObject):
                         MagicBullet.TARGET_DETECT_DISTANCE ** 2:
                     self.target = gm
                     break
+            # les zombies du EnemySystem ne sont pas dans game_objects
+            enemy_system = sing.ROOT.game_objects.get("enemy_system")
+            if self.target is None and enemy_system is not None:
+                near = enemy_system.get_enemies_near(self.get_real_pos(), MagicBullet.TARGET_DETECT_DISTANCE)
+                if near:
+                    self.target = near[0]
 
         else:
             if self.image.get_rect(center=self.get_real_pos()).colliderect(
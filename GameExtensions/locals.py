@@ -62,12 +62,29 @@ SLASHABLE: Final = "sword"
 DONT_SLASH = "dont_slash"
 
 CHUNK_SIZE: Final = 40
+PATH_ITER_LIMIT: Final = 2000
+FLOW_FIELD_RADIUS: Final = 40
+# nombre de cases que la cible d'un champ de directions peut parcourir avant qu'il soit recalculé autour d'elle
+FLOW_FIELD_TRAIL: Final = 2
+# au-delà de ce nombre de cases changées d'un coup (un tronçon chargé...), le champ est recalculé en entier
+FLOW_FIELD_MAX_REPAIRS: Final = 64
+ROUTE_ITER_LIMIT: Final = 3000
+MAX_GRAPH_CHUNKS: Final = 256
+# nombre de balayages de get_grid_distances_many avant de finir avec un Dijkstra par départ (zones en labyrinthe)
+MAX_DISTANCE_SWEEPS: Final = 8
+PATH_BUDGET_MS: Final = 2
+# chemins calculés par frame pendant un enregistrement ou un replay, à la place de PATH_BUDGET_MS (qui dépend de la
+# vitesse de la machine)
+DETERMINISTIC_ROUTES: Final = 4
+PATH_CACHE_SIZE: Final = 512
 
 DIRS: Final = ((1, 0), (0, 1), (-1, 0), (0, -1))
 
 WATER_DECEL: Final = 0.45
+WATER_COST: Final = 1 / WATER_DECEL
 
 ENEMY = "enemy"
+RESOURCE = "resource"
 
 ITEM_SLOT_SIZE = (40, 40)
 ITEM_HOLD_SIZE = (16, 16)
@@ -75,6 +92,10 @@ WEAPON_HOLD_SIZE = (24, 24)
 
 CUST_SEED: Final = "custom_seed"
 RAND_SEED: Final = "randomize_seed"
+INF_WORLD: Final = "infinite_world"
+ENEMY_SYSTEM: Final = "enemy_system"
+
+INF_WORLD_SIZE: Final = 1 << 16, 1 << 16
 
 RECIPES: Final = (
     (((LOG, LOG, EMPTY),
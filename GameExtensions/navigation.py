@@ -0,0 +1,897 @@
+from __future__ import annotations  # Avoid circular import
+
+import heapq
+import time
+import typing
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import pygame
+from pygame.math import Vector2
+
+import GameManager.singleton as sing
+from GameManager.util import GameObject
+
+from GameExtensions.util import get_grid_pos, grid_pos2world_pos, get_path2target, PathCache, path_cache
+from GameExtensions.locals import FLOW_FIELD_RADIUS, CHUNK_SIZE, WATER_COST, ROUTE_ITER_LIMIT, MAX_GRAPH_CHUNKS
+from GameExtensions.locals import FLOW_FIELD_TRAIL, FLOW_FIELD_MAX_REPAIRS
+from GameExtensions.locals import PATH_BUDGET_MS, DETERMINISTIC_ROUTES, MAX_DISTANCE_SWEEPS
+
+if typing.TYPE_CHECKING:
+    from GameExtensions.generate_terrain import Terrain
+
+
+class FlowField:
+    """
+    Champ de directions vers une case (la cible) calculé par un parcours en largeur sur les cases libres autour d'elle.
+    Chaque case connait la case suivante à prendre pour rejoindre la cible, donc un ennemi n'a qu'une lecture à faire.
+
+    Le champ n'est pas recalculé en entier à chaque changement : quand des obstacles sont posés ou enlevés dans sa
+    zone, seules les cases dont la distance change sont reprises (les changements en dehors de la zone sont ignorés),
+    et quand la cible avance d'une case, l'ancienne cible mène simplement à la nouvelle. Après trail_length cases, ou
+    si la cible saute plus loin, le champ est recalculé autour d'elle.
+    """
+    # distance des cases qui ne mènent pas à la cible
+    UNREACHED = 1 << 30
+
+    def __init__(self, radius: int = FLOW_FIELD_RADIUS, trail_length: int = FLOW_FIELD_TRAIL,
+                 max_repairs: int = FLOW_FIELD_MAX_REPAIRS):
+        """
+        :param radius: Le nombre de cases autour de la cible couvertes par le champ
+        :param trail_length: Le nombre de cases que la cible peut parcourir avant que le champ soit recalculé (un
+            chemin fait alors au plus 2 * trail_length cases de trop)
+        :param max_repairs: Le nombre maximal de cases changées réparées une par une, au-delà le champ est recalculé
+        """
+        self.radius = radius
+        self.trail_length = trail_length
+        self.max_repairs = max_repairs
+        self.target: Optional[tuple[int, int]] = None
+        # la case d'où le parcours a été fait, None si le champ n'est pas utilisable
+        self.root: Optional[tuple[int, int]] = None
+        # les cases parcourues par la cible depuis root : (indice, case suivante avant que la cible y passe)
+        self.trail: list[tuple[int, int]] = []
+        self.obstacle_version = -1
+        self.left = self.top = 0
+        self.width = self.height = 0
+        # obstacles de la zone avec lesquels le champ a été calculé
+        self.blocked = np.zeros((0, 0), dtype=bool)
+        self.blocked_list: list[bool] = []
+        self.dist: list[int] = []
+        self.next_cell: list[int] = []
+        self.next_array = np.zeros(0, dtype=np.int32)
+        self.rebuild_count = 0
+
+    def needs_update(self, target: tuple[int, int], obstacle_version: int) -> bool:
+        return target != self.target or obstacle_version != self.obstacle_version
+
+    def update(self, terrain: Terrain, target: tuple[int, int]) -> None:
+        """
+        Met le champ à jour pour une cible et les obstacles actuels du terrain
+
+        :param terrain: Le terrain
+        :param target: La case de la cible
+        """
+        if self.root is None:
+            self.rebuild(terrain, target)
+            return
+        if terrain.obstacle_version != self.obstacle_version:
+            self.obstacle_version = terrain.obstacle_version
+            blocked = terrain.get_obstacle_mask(self.left, self.top, self.left + self.width, self.top + self.height)
+            changed = np.flatnonzero(blocked != self.blocked).tolist()
+            if changed:
+                if self.trail or len(changed) > self.max_repairs:
+                    self.rebuild(terrain, target)
+                    return
+                self.blocked = blocked.copy()
+                for i in changed:
+                    if self.blocked_list[i]:
+                        self.free_cell(i)
+                    else:
+                        self.block_cell(i)
+        if target != self.target:
+            self.move_target(terrain, target)
+
+    def rebuild(self, terrain: Terrain, target: tuple[int, int]) -> None:
+        """
+        Recalcule tout le champ autour d'une cible
+        """
+        self.rebuild_count += 1
+        self.target = target
+        self.root = None
+        self.trail = []
+        self.obstacle_version = terrain.obstacle_version
+        self.left, self.top = max(0, target[0] - self.radius), max(0, target[1] - self.radius)
+        right = min(terrain.size[0], target[0] + self.radius + 1)
+        bottom = min(terrain.size[1], target[1] + self.radius + 1)
+        self.width, self.height = w, h = right - self.left, bottom - self.top
+        if not (0 <= target[0] - self.left < w and 0 <= target[1] - self.top < h):
+            self.next_cell = [-1] * (w * h)
+            self.next_array = np.array(self.next_cell, dtype=np.int32)
+            return
+
+        self.blocked = terrain.get_obstacle_mask(self.left, self.top, right, bottom).copy()
+        self.blocked_list = blocked = self.blocked.ravel().tolist()
+        # -2 : pas encore atteinte, -1 : la cible elle-même, sinon l'indice de la case suivante
+        next_cell = [-2] * (w * h)
+        dist = [self.UNREACHED] * (w * h)
+        start = (target[1] - self.top) * w + target[0] - self.left
+        next_cell[start] = -1
+        dist[start] = 0
+        last_row = w * (h - 1)
+        queue = [start]
+        for i in queue:
+            x = i % w
+            d = dist[i] + 1
+            for j in (i - 1 if x > 0 else -1, i + 1 if x < w - 1 else -1,
+                      i - w if i >= w else -1, i + w if i < last_row else -1):
+                if j >= 0 and next_cell[j] == -2 and not blocked[j]:
+                    next_cell[j] = i
+                    dist[j] = d
+                    queue.append(j)
+        self.next_cell = next_cell
+        self.dist = dist
+        self.next_array = np.array(next_cell, dtype=np.int32)
+        self.root = target
+
+    def get_neighbours(self, i: int) -> list[int]:
+        """
+        :return: Les indices des cases voisines d'une case de la zone
+        """
+        w = self.width
+        x = i % w
+        return [j for j in (i - 1 if x > 0 else -1, i + 1 if x < w - 1 else -1, i - w, i + w)
+                if 0 <= j < len(self.next_cell)]
+
+    def set_next(self, i: int, nxt: int) -> None:
+        self.next_cell[i] = nxt
+        self.next_array[i] = nxt
+
+    def block_cell(self, i: int) -> None:
+        """
+        Un obstacle a été posé sur une case : les cases dont le chemin passait par elle cherchent un autre chemin
+        """
+        self.blocked_list[i] = True
+        if self.next_cell[i] < 0:
+            # personne ne passait par là, ou c'est la cible (qui peut être occupée, comme le core)
+            return
+        next_cell, dist = self.next_cell, self.dist
+        # les cases qui passaient par i
+        subtree = [i]
+        inside = {i}
+        for v in subtree:
+            for u in self.get_neighbours(v):
+                if next_cell[u] == v and u not in inside:
+                    inside.add(u)
+                    subtree.append(u)
+        for v in subtree:
+            dist[v] = self.UNREACHED
+            self.set_next(v, -2)
+        # chacune repart de sa meilleure voisine qui a gardé son chemin, puis Dijkstra (poids 1) entre elles
+        heap = []
+        for v in subtree[1:]:
+            best = None
+            for u in self.get_neighbours(v):
+                if u not in inside and next_cell[u] != -2 and (best is None or dist[u] < dist[best]):
+                    best = u
+            if best is not None:
+                dist[v] = dist[best] + 1
+                self.set_next(v, best)
+                heapq.heappush(heap, (dist[v], v))
+        while heap:
+            d, v = heapq.heappop(heap)
+            if d > dist[v]:
+                continue
+            for u in self.get_neighbours(v):
+                if u in inside and u != i and d + 1 < dist[u]:
+                    dist[u] = d + 1
+                    self.set_next(u, v)
+                    heapq.heappush(heap, (d + 1, u))
+
+    def free_cell(self, i: int) -> None:
+        """
+        Un obstacle a été enlevé : la case et celles pour qui elle est un raccourci prennent le chemin par elle
+        """
+        self.blocked_list[i] = False
+        next_cell, dist, blocked = self.next_cell, self.dist, self.blocked_list
+        if next_cell[i] == -1:
+            return
+        best = None
+        for u in self.get_neighbours(i):
+            if next_cell[u] != -2 and (best is None or dist[u] < dist[best]):
+                best = u
+        if best is None:
+            return
+        dist[i] = dist[best] + 1
+        self.set_next(i, best)
+        # une seule case de départ et des poids de 1 : un parcours en largeur suffit
+        queue = [i]
+        for v in queue:
+            d = dist[v] + 1
+            for u in self.get_neighbours(v):
+                if not blocked[u] and d < dist[u]:
+                    dist[u] = d
+                    self.set_next(u, v)
+                    queue.append(u)
+
+    def move_target(self, terrain: Terrain, target: tuple[int, int]) -> None:
+        """
+        La cible a changé de case : si elle est allée sur une case voisine, l'ancienne cible mène à la nouvelle,
+        sinon le champ est recalculé
+        """
+        x, y = target[0] - self.left, target[1] - self.top
+        if abs(target[0] - self.target[0]) + abs(target[1] - self.target[1]) != 1 \
+                or not (0 <= x < self.width and 0 <= y < self.height) or self.blocked_list[y * self.width + x]:
+            self.rebuild(terrain, target)
+            return
+        i = y * self.width + x
+        trail = [index for index, _ in self.trail]
+        if target == self.root:
+            # retour au départ : les cases de la traînée reprennent leur chemin
+            self.cut_trail(0)
+            self.set_next(i, -1)
+        elif i in trail:
+            self.cut_trail(trail.index(i) + 1)
+            self.set_next(i, -1)
+        elif len(self.trail) >= self.trail_length:
+            self.rebuild(terrain, target)
+            return
+        else:
+            self.set_next((self.target[1] - self.top) * self.width + self.target[0] - self.left, i)
+            self.trail.append((i, self.next_cell[i]))
+            self.set_next(i, -1)
+        self.target = target
+
+    def cut_trail(self, length: int) -> None:
+        """
+        Raccourcit la traînée de la cible : les cases enlevées reprennent leur case suivante d'avant
+        """
+        for i, nxt in reversed(self.trail[length:]):
+            self.set_next(i, nxt)
+        del self.trail[length:]
+
+    def get_next_cell(self, cell: tuple[int, int]) -> Optional[tuple[int, int]]:
+        """
+        :param cell: La case où on se trouve
+        :return: La case suivante vers la cible, la case elle-même si c'est la cible, None si la case n'est pas
+            couverte par le champ ou si la cible n'est pas atteignable
+        """
+        x, y = cell[0] - self.left, cell[1] - self.top
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        nxt = self.next_cell[y * self.width + x]
+        if nxt == -2:
+            return None
+        if nxt == -1:
+            return cell
+        return self.left + nxt % self.width, self.top + nxt // self.width
+
+    def get_next_cells(self, cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Pareil que get_next_cell pour plusieurs cases d'un coup
+
+        :param cells: Les cases, tableau d'entiers de taille (n, 2)
+        :return: Les cases suivantes (n, 2) et un masque (n,) qui vaut False pour les cases où get_next_cell
+            renverrait None
+        """
+        x, y = cells[:, 0] - self.left, cells[:, 1] - self.top
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        nxt = np.full(len(cells), -2, dtype=np.int32)
+        nxt[inside] = self.next_array[y[inside] * self.width + x[inside]]
+        result = cells.copy()
+        moving = nxt >= 0
+        result[moving, 0] = self.left + nxt[moving] % self.width
+        result[moving, 1] = self.top + nxt[moving] // self.width
+        return result, nxt != -2
+
+
+def get_grid_distances(blocked: list[bool], weights: list[float], width: int, start: int) -> list[float]:
+    """
+    Calcule (Dijkstra) le coût pour aller d'une case d'une zone à toutes les cases de cette zone. Passer d'une case à
+    sa voisine coûte la moyenne de leurs poids, le coût est donc le même dans les deux sens.
+
+    :param blocked: Les cases occupées de la zone, ligne par ligne
+    :param weights: Le poids de chaque case
+    :param width: La largeur de la zone
+    :param start: L'indice de la case de départ
+    :return: Le coût pour chaque case, inf pour celles qui ne sont pas atteignables
+    """
+    size = len(blocked)
+    dist = [float("inf")] * size
+    dist[start] = 0.
+    heap = [(0., start)]
+    while heap:
+        d, i = heapq.heappop(heap)
+        if d > dist[i]:
+            continue
+        x = i % width
+        w = weights[i]
+        for j in (i - 1 if x > 0 else -1, i + 1 if x < width - 1 else -1, i - width, i + width):
+            if 0 <= j < size and not blocked[j]:
+                nd = d + (w + weights[j]) / 2
+                if nd < dist[j]:
+                    dist[j] = nd
+                    heapq.heappush(heap, (nd, j))
+    return dist
+
+
+def get_grid_distances_many(blocked: list[bool], weights: list[float], width: int, starts: list[int],
+                            max_sweeps: int = MAX_DISTANCE_SWEEPS) -> np.ndarray:
+    """
+    Le résultat de get_grid_distances pour plusieurs départs d'un coup (les mêmes valeurs). Les coûts sont propagés
+    par balayages : une colonne (puis une ligne) à la fois, vers la droite, la gauche, le bas et le haut, pour tous
+    les départs et toutes les lignes en même temps avec numpy, jusqu'à ce que plus rien ne change. Un balayage suit
+    un chemin en ligne droite d'un bout à l'autre de la zone, il en faut donc quelques-uns seulement sauf dans un
+    labyrinthe : après max_sweeps, on finit avec get_grid_distances.
+
+    :param blocked: Les cases occupées de la zone, ligne par ligne
+    :param weights: Le poids de chaque case
+    :param width: La largeur de la zone
+    :param starts: Les indices des cases de départ
+    :param max_sweeps: Le nombre maximum de balayages
+    :return: Un tableau (départ, case) des coûts, inf pour les cases qui ne sont pas atteignables
+    """
+    height = len(blocked) // width
+    free = ~np.array(blocked, dtype=bool).reshape(height, width)
+    w = np.array(weights, dtype=np.float64).reshape(height, width)
+    dist = np.full((len(starts), height, width), np.inf)
+    for k, start in enumerate(starts):
+        dist[k, start // width, start % width] = 0.
+    # coût pour entrer dans une case depuis sa voisine de gauche ou de droite (inf si elle est occupée), puis du
+    # haut ou du bas
+    right = np.where(free[:, 1:], (w[:, :-1] + w[:, 1:]) / 2, np.inf).T
+    left = np.where(free[:, :-1], (w[:, :-1] + w[:, 1:]) / 2, np.inf).T
+    down = np.where(free[1:], (w[:-1] + w[1:]) / 2, np.inf)
+    up = np.where(free[:-1], (w[:-1] + w[1:]) / 2, np.inf)
+    columns, rows = dist.transpose(2, 0, 1), dist.transpose(1, 0, 2)
+    for _ in range(max_sweeps):
+        previous = dist.copy()
+        for x in range(1, width):
+            np.minimum(columns[x], columns[x - 1] + right[x - 1], out=columns[x])
+        for x in range(width - 2, -1, -1):
+            np.minimum(columns[x], columns[x + 1] + left[x], out=columns[x])
+        for y in range(1, height):
+            np.minimum(rows[y], rows[y - 1] + down[y - 1], out=rows[y])
+        for y in range(height - 2, -1, -1):
+            np.minimum(rows[y], rows[y + 1] + up[y], out=rows[y])
+        if np.array_equal(previous, dist):
+            return dist.reshape(len(starts), height * width)
+    return np.array([get_grid_distances(blocked, weights, width, start) for start in starts],
+                    dtype=np.float64).reshape(len(starts), height * width)
+
+
+def find_grid_path(blocked: list[bool], weights: list[float], width: int, start: int, goal: int) -> list[int]:
+    """
+    A* pondéré dans une zone (mêmes coûts que get_grid_distances). La case d'arrivée peut être occupée.
+
+    :return: Les indices des cases du chemin (départ et arrivée compris), une liste vide si l'arrivée n'est pas
+        atteignable
+    """
+    size = len(blocked)
+    gx, gy = goal % width, goal // width
+    dist = [float("inf")] * size
+    dist[start] = 0.
+    parent = {start: start}
+    heap = [(0., start)]
+    while heap:
+        _, i = heapq.heappop(heap)
+        if i == goal:
+            path = [i]
+            while i != start:
+                i = parent[i]
+                path.append(i)
+            return path[::-1]
+        d = dist[i]
+        x = i % width
+        for j in (i - 1 if x > 0 else -1, i + 1 if x < width - 1 else -1, i - width, i + width):
+            if 0 <= j < size and (not blocked[j] or j == goal):
+                nd = d + (weights[i] + weights[j]) / 2
+                if nd < dist[j]:
+                    dist[j] = nd
+                    parent[j] = i
+                    heapq.heappush(heap, (nd + abs(j % width - gx) + abs(j // width - gy), j))
+    return []
+
+
+class ChunkGraph:
+    """
+    Graphe abstrait pour une recherche de chemin hiérarchique (HPA*). La carte est découpée en chunks, chaque passage
+    libre entre deux chunks voisins donne une entrée (la case au milieu du passage) et les entrées d'un même chunk sont
+    reliées par le coût du chemin entre elles (l'eau coûte plus cher). Un long trajet se résume alors à une recherche
+    sur ce petit graphe puis à un A* local jusqu'à la première entrée.
+
+    Les chunks ne sont construits que quand une recherche passe par eux. Quand un obstacle change, seuls les chunks
+    dont les cases (ou celles de leur bord) ont changé sont reconstruits. À la construction, le coût depuis chaque
+    entrée est calculé pour toutes les cases du chunk : relier une case à ses entrées (connect) n'est plus qu'une
+    lecture.
+    """
+
+    def __init__(self, terrain: Terrain, chunk_size: int = CHUNK_SIZE, iter_limit: int = ROUTE_ITER_LIMIT,
+                 max_chunks: int = MAX_GRAPH_CHUNKS):
+        """
+        :param terrain: Le terrain
+        :param chunk_size: La taille (en cases) d'un chunk
+        :param iter_limit: Le nombre maximum d'entrées visitées par une recherche
+        :param max_chunks: Le nombre maximum de chunks gardés en mémoire
+        """
+        self.terrain = terrain
+        self.chunk_size = chunk_size
+        self.iter_limit = iter_limit
+        self.max_chunks = max_chunks
+        self.obstacle_version = terrain.obstacle_version
+        # masques (obstacles, eau) avec lesquels chaque chunk a été construit, bord d'une case compris
+        self.snapshots: OrderedDict[tuple[int, int], tuple[np.ndarray, np.ndarray]] = OrderedDict()
+        # (cases occupées, poids, largeur) de chaque chunk, en listes pour les recherches
+        self.windows: dict[tuple[int, int], tuple[list[bool], list[float], int]] = {}
+        self.nodes: dict[tuple[int, int], list[tuple[int, int]]] = {}
+        # coût depuis chaque entrée d'un chunk (une ligne par entrée, dans l'ordre de nodes) vers chacune de ses cases
+        self.node_distances: dict[tuple[int, int], np.ndarray] = {}
+        # coûts entre entrées d'un même chunk
+        self.intra: dict[tuple[int, int], dict[tuple[int, int], float]] = {}
+        # passages vers l'entrée correspondante du chunk voisin
+        self.crossings: dict[tuple[int, int], list[tuple[tuple[int, int], float]]] = {}
+        # liens des cases d'arrivée vers les entrées de leur chunk (les ennemis visent souvent la même case)
+        self.goal_edges: dict[tuple[int, int], dict[tuple[int, int], float]] = {}
+        self.route_cache = PathCache()
+        # nombre de chunks construits depuis la création du graphe
+        self.build_count = 0
+
+    def get_chunk(self, cell: tuple[int, int]) -> tuple[int, int]:
+        return cell[0] // self.chunk_size, cell[1] // self.chunk_size
+
+    def get_bounds(self, key: tuple[int, int]) -> tuple[int, int, int, int]:
+        """
+        :return: Les bornes (gauche, haut, droite, bas) d'un chunk, droite et bas exclues
+        """
+        left, top = key[0] * self.chunk_size, key[1] * self.chunk_size
+        return left, top, min(self.terrain.size[0], left + self.chunk_size), \
+            min(self.terrain.size[1], top + self.chunk_size)
+
+    def get_window(self, key: tuple[int, int]) -> tuple[list[bool], list[float], int]:
+        """
+        :return: Les cases occupées, les poids et la largeur d'un chunk (sans son bord), calculés une fois par
+            construction du chunk
+        """
+        window = self.windows.get(key)
+        if window is not None:
+            self.snapshots.move_to_end(key)
+            return window
+        blocked, water = self.ensure_chunk(key)
+        left, top, right, bottom = self.get_bounds(key)
+        inner = (slice(top - max(0, top - 1), None), slice(left - max(0, left - 1), None))
+        blocked, water = blocked[inner][:bottom - top, :right - left], water[inner][:bottom - top, :right - left]
+        weights = np.where(water, WATER_COST, 1.)
+        window = self.windows[key] = blocked.ravel().tolist(), weights.ravel().tolist(), right - left
+        return window
+
+    def check_version(self) -> None:
+        """
+        Oublie les chunks dont les obstacles ou l'eau ont changé depuis leur construction
+        """
+        if self.terrain.obstacle_version == self.obstacle_version:
+            return
+        self.obstacle_version = self.terrain.obstacle_version
+        for key, (blocked, water) in list(self.snapshots.items()):
+            bounds = self.get_ring_bounds(key)
+            if not (np.array_equal(blocked, self.terrain.get_obstacle_mask(*bounds))
+                    and np.array_equal(water, self.terrain.get_water_mask(*bounds))):
+                self.drop_chunk(key)
+
+    def get_ring_bounds(self, key: tuple[int, int]) -> tuple[int, int, int, int]:
+        """
+        :return: Les bornes d'un chunk avec une case de plus de chaque côté (sans sortir de la carte)
+        """
+        left, top, right, bottom = self.get_bounds(key)
+        return max(0, left - 1), max(0, top - 1), min(self.terrain.size[0], right + 1), \
+            min(self.terrain.size[1], bottom + 1)
+
+    def drop_chunk(self, key: tuple[int, int]) -> None:
+        self.goal_edges.clear()
+        self.snapshots.pop(key, None)
+        self.windows.pop(key, None)
+        self.node_distances.pop(key, None)
+        for node in self.nodes.pop(key, ()):
+            self.intra.pop(node, None)
+            self.crossings.pop(node, None)
+
+    def ensure_chunk(self, key: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Construit les entrées d'un chunk et les liens entre elles si ce n'est pas déjà fait
+
+        :param key: Les indices du chunk
+        :return: Les masques (obstacles, eau) du chunk avec son bord
+        """
+        snapshot = self.snapshots.get(key)
+        if snapshot is not None:
+            self.snapshots.move_to_end(key)
+            return snapshot
+
+        ring = self.get_ring_bounds(key)
+        blocked = self.terrain.get_obstacle_mask(*ring).copy()
+        water = self.terrain.get_water_mask(*ring).copy()
+        self.snapshots[key] = blocked, water
+        while len(self.snapshots) > self.max_chunks:
+            self.drop_chunk(next(iter(self.snapshots)))
+
+        left, top, right, bottom = self.get_bounds(key)
+        rl, rt = ring[0], ring[1]
+
+        def free(cell):
+            return not blocked[cell[1] - rt, cell[0] - rl]
+
+        def weight(cell):
+            return WATER_COST if water[cell[1] - rt, cell[0] - rl] else 1.
+
+        # pour chaque côté : les cases du bord du chunk et celles d'en face (dans le chunk voisin)
+        sides = []
+        if left > 0:
+            sides.append([((left, y), (left - 1, y)) for y in range(top, bottom)])
+        if right < self.terrain.size[0]:
+            sides.append([((right - 1, y), (right, y)) for y in range(top, bottom)])
+        if top > 0:
+            sides.append([((x, top), (x, top - 1)) for x in range(left, right)])
+        if bottom < self.terrain.size[1]:
+            sides.append([((x, bottom - 1), (x, bottom)) for x in range(left, right)])
+
+        nodes = []
+        for side in sides:
+            run = []
+            # une case vide à la fin ferme le dernier passage
+            for pair in side + [None]:
+                if pair is not None and free(pair[0]) and free(pair[1]):
+                    run.append(pair)
+                    continue
+                if run:
+                    inner, outer = run[(len(run) - 1) // 2]
+                    if inner not in self.crossings:
+                        self.crossings[inner] = []
+                        nodes.append(inner)
+                    self.crossings[inner].append((outer, (weight(inner) + weight(outer)) / 2))
+                    run = []
+        self.nodes[key] = nodes
+
+        blocked_list, weights, width = self.get_window(key)
+        indices = [(x - left) + (y - top) * width for x, y in nodes]
+        distances = get_grid_distances_many(blocked_list, weights, width, indices)
+        for node, dist in zip(nodes, distances[:, indices].tolist()):
+            self.intra[node] = {other: d for other, d in zip(nodes, dist) if other != node and d != float("inf")}
+        # float32 : un chunk de 40x40 avec 8 entrées prend 50 Ko
+        self.node_distances[key] = distances.astype(np.float32)
+        self.build_count += 1
+        return blocked, water
+
+    def connect(self, cell: tuple[int, int]) -> dict[tuple[int, int], float]:
+        """
+        :return: Le coût pour aller d'une case aux entrées de son chunk
+        """
+        key = self.get_chunk(cell)
+        blocked, weights, width = self.get_window(key)
+        left, top = key[0] * self.chunk_size, key[1] * self.chunk_size
+        distances = self.node_distances[key]
+        i = (cell[0] - left) + (cell[1] - top) * width
+        if blocked[i]:
+            # une case occupée (la cible peut l'être) : on passe par la meilleure de ses voisines libres
+            x, size = i % width, len(blocked)
+            costs = np.full(len(distances), np.inf)
+            for j in (i - 1 if x > 0 else -1, i + 1 if x < width - 1 else -1, i - width, i + width):
+                if 0 <= j < size and not blocked[j]:
+                    costs = np.minimum(costs, distances[:, j] + (weights[i] + weights[j]) / 2)
+        else:
+            costs = distances[:, i]
+        return {node: cost for node, cost in zip(self.nodes[key], costs.tolist()) if cost != float("inf")}
+
+    def refine(self, start: tuple[int, int], goal: tuple[int, int]) -> list[tuple[int, int]]:
+        """
+        :return: Le chemin entre deux cases d'un même chunk sans en sortir (départ et arrivée compris), une liste vide
+            s'il n'y en a pas
+        """
+        key = self.get_chunk(start)
+        blocked, weights, width = self.get_window(key)
+        left, top = key[0] * self.chunk_size, key[1] * self.chunk_size
+        path = find_grid_path(blocked, weights, width, (start[0] - left) + (start[1] - top) * width,
+                              (goal[0] - left) + (goal[1] - top) * width)
+        return [(left + i % width, top + i // width) for i in path]
+
+    def find_route(self, start: tuple[int, int], goal: tuple[int, int],
+                   max_builds: Optional[int] = None) -> Optional[tuple[tuple[int, int], ...]]:
+        """
+        Cherche le chemin entre deux cases sur le graphe abstrait et ne détaille que la première partie (jusqu'à la
+        sortie du chunk de départ). Les résultats sont gardés dans route_cache.
+
+        :param start: La case de départ
+        :param goal: La case d'arrivée (elle peut être occupée)
+        :param max_builds: Le nombre maximum de chunks construits pendant cette recherche (None pour aucune limite)
+        :return: Les cases à suivre (sans la case de départ), un tuple vide si aucun chemin n'a été trouvé, None si
+            la recherche a dû s'arrêter pour ne pas construire plus de max_builds chunks (les chunks construits sont
+            gardés, la recherche suivante ira donc plus loin)
+        """
+        w, h = self.terrain.size
+        if not (0 <= start[0] < w and 0 <= start[1] < h and 0 <= goal[0] < w and 0 <= goal[1] < h):
+            return ()
+        self.check_version()
+        key = start, goal, self.obstacle_version
+        route = self.route_cache.get(key)
+        if route is None:
+            route = self.search_route(start, goal, max_builds)
+            if route is not None:
+                route = self.route_cache.put(key, route)
+        return route
+
+    def search_route(self, start: tuple[int, int], goal: tuple[int, int],
+                     max_builds: Optional[int]) -> Optional[list[tuple[int, int]]]:
+        """
+        La recherche de find_route, sans le cache
+        """
+        builds = 0
+
+        def use_chunk(key):
+            # construit le chunk si besoin et si la limite le permet
+            nonlocal builds
+            if key not in self.snapshots:
+                if max_builds is not None and builds >= max_builds:
+                    return False
+                builds += 1
+                self.ensure_chunk(key)
+            return True
+
+        if not (use_chunk(self.get_chunk(start)) and use_chunk(self.get_chunk(goal))):
+            return None
+        if self.get_chunk(start) == self.get_chunk(goal):
+            path = self.refine(start, goal)
+            if path:
+                return path[1:]
+
+        start_edges = self.connect(start)
+        goal_edges = self.goal_edges.get(goal)
+        if goal_edges is None:
+            if len(self.goal_edges) >= self.max_chunks:
+                self.goal_edges.clear()
+            goal_edges = self.goal_edges[goal] = self.connect(goal)
+        if not start_edges or not goal_edges:
+            return []
+
+        dist = {start: 0.}
+        parent = {start: start}
+        heap = [(0., start)]
+        counter = 0
+        while heap and counter < self.iter_limit:
+            _, node = heapq.heappop(heap)
+            if node == goal:
+                break
+            counter += 1
+            d = dist[node]
+            if node == start:
+                edges = list(start_edges.items())
+            else:
+                if not use_chunk(self.get_chunk(node)):
+                    return None
+                edges = list(self.intra.get(node, {}).items())
+            edges += self.crossings.get(node, [])
+            if node in goal_edges:
+                edges.append((goal, goal_edges[node]))
+            for nxt, cost in edges:
+                nd = d + cost
+                if nd < dist.get(nxt, float("inf")):
+                    dist[nxt] = nd
+                    parent[nxt] = node
+                    heapq.heappush(heap, (nd + abs(nxt[0] - goal[0]) + abs(nxt[1] - goal[1]), nxt))
+        if goal not in parent:
+            return []
+
+        route = [goal]
+        while route[-1] != start:
+            route.append(parent[route[-1]])
+        route.reverse()
+
+        # seule la première étape est détaillée, la suite sera recalculée en changeant de chunk
+        first = route[1]
+        if self.get_chunk(first) != self.get_chunk(start):
+            return [first]
+        path = self.refine(start, first)[1:]
+        if len(route) > 2 and self.get_chunk(route[2]) != self.get_chunk(first):
+            path.append(route[2])
+        return path
+
+
+class NavigationManager(GameObject):
+    """
+    Garde un champ de directions par cible (par défaut le joueur et le core) que tous les ennemis partagent.
+    Un champ n'est recalculé que quand sa cible change de case ou qu'un obstacle est posé ou détruit.
+    Pour les ennemis trop loin des champs, il garde aussi le graphe des chunks (ChunkGraph) de la recherche
+    hiérarchique. Les ennemis ne calculent pas ces longs chemins eux-mêmes : ils déposent une demande (request_route)
+    et viennent chercher le résultat (poll_route) les frames suivantes. Les demandes sont traitées en commençant par
+    les ennemis les plus proches du joueur, sans dépasser budget_ms millisecondes par frame.
+    """
+
+    def __init__(self, targets: tuple[str, ...] = ("player", "core"), radius: int = FLOW_FIELD_RADIUS,
+                 budget_ms: float = PATH_BUDGET_MS, max_routes: Optional[int] = None):
+        """
+        :param targets: Les noms des objets vers lesquels les ennemis peuvent aller
+        :param radius: Le nombre de cases autour de chaque cible couvertes par son champ
+        :param budget_ms: Le temps (en millisecondes) consacré aux demandes de chemin à chaque frame
+        :param max_routes: Si donné, le nombre de chemins calculés par frame à la place de budget_ms : les ennemis
+            ne dépendent plus de la vitesse de la machine (benchmarks). Pendant un enregistrement ou un replay,
+            DETERMINISTIC_ROUTES est utilisé par défaut.
+        """
+        super().__init__(Vector2(0, 0), 0, pygame.Surface((0, 0)), "navigation")
+        self.fields: dict[str, FlowField] = {name: FlowField(radius) for name in targets}
+        self.graph: Optional[ChunkGraph] = None
+        self.budget_ms = budget_ms
+        self.max_routes = max_routes
+        # (priorité, numéro de la demande, nom du demandeur)
+        self.requests: list[tuple[float, int, str]] = []
+        # dernière demande de chaque demandeur : (numéro, départ, arrivée)
+        self.pending: dict[str, tuple[int, Vector2, Vector2]] = {}
+        self.results: dict[str, list[Vector2]] = {}
+        self.request_count = 0
+
+    def early_update(self) -> None:
+        super().early_update()
+        terrain = sing.ROOT.game_objects.get("terrain")
+        if terrain is None:
+            return
+        for name, field in self.fields.items():
+            target = sing.ROOT.game_objects.get(name)
+            if target is None:
+                continue
+            cell = get_grid_pos(target.get_real_pos())
+            cell = int(cell.x), int(cell.y)
+            if field.needs_update(cell, terrain.obstacle_version):
+                field.update(terrain, cell)
+        self.process_requests()
+
+    def request_route(self, name: str, start: Vector2, goal: Vector2) -> None:
+        """
+        Demande un chemin, il sera calculé pendant une des prochaines frames. Une nouvelle demande du même demandeur
+        remplace la précédente.
+
+        :param name: Le nom du demandeur
+        :param start: La position universelle de départ
+        :param goal: La position universelle d'arrivée
+        """
+        self.request_count += 1
+        self.pending[name] = self.request_count, start.copy(), goal.copy()
+        self.results.pop(name, None)
+        player = sing.ROOT.game_objects.get("player")
+        priority = start.distance_squared_to(player.get_real_pos()) if player is not None else 0
+        heapq.heappush(self.requests, (priority, self.request_count, name))
+
+    def poll_route(self, name: str) -> Optional[list[Vector2]]:
+        """
+        :param name: Le nom du demandeur
+        :return: Le chemin demandé (une liste vide si aucun n'a été trouvé), None s'il n'a pas encore été calculé
+        """
+        return self.results.pop(name, None)
+
+    def is_pending(self, name: str) -> bool:
+        return name in self.pending
+
+    def cancel_route(self, name: str) -> None:
+        """
+        Oublie la demande et le résultat d'un demandeur (par exemple un ennemi mort)
+
+        :param name: Le nom du demandeur
+        """
+        self.pending.pop(name, None)
+        self.results.pop(name, None)
+
+    def process_requests(self) -> None:
+        """
+        Calcule les chemins demandés tant que le budget de la frame n'est pas dépassé (au moins un par frame).
+        Pendant un enregistrement ou un replay (sing.ROOT.input.deterministic), le budget est un nombre de chemins.
+        Un seul chunk du graphe est construit par frame (c'est ce qui coûte le plus, au début de la partie surtout) :
+        une recherche qui en a besoin d'un autre est remise dans la file et continuera à la frame suivante.
+        """
+        start_time = time.perf_counter()
+        max_routes = self.max_routes
+        if max_routes is None and sing.ROOT.input.deterministic:
+            max_routes = DETERMINISTIC_ROUTES
+        computed = 0
+        builds = self.get_build_count()
+        while self.requests:
+            item = heapq.heappop(self.requests)
+            name = item[2]
+            request = self.pending.get(name)
+            if request is None or request[0] != item[1]:
+                continue  # remplacée par une demande plus récente ou annulée
+            route = self.compute_route(request[1], request[2], max_builds=1 if self.get_build_count() == builds else 0)
+            if route is None:
+                heapq.heappush(self.requests, item)
+                break
+            del self.pending[name]
+            self.results[name] = route
+            computed += 1
+            if max_routes is not None:
+                if computed >= max_routes:
+                    break
+            elif (time.perf_counter() - start_time) * 1000 >= self.budget_ms:
+                break
+
+    def get_build_count(self) -> int:
+        """
+        :return: Le nombre de chunks construits par le graphe (ChunkGraph.build_count)
+        """
+        return self.graph.build_count if self.graph is not None else 0
+
+    def compute_route(self, start: Vector2, goal: Vector2, max_builds: Optional[int] = None) -> Optional[list[Vector2]]:
+        """
+        :param max_builds: Voir ChunkGraph.find_route
+        :return: Le chemin de la recherche hiérarchique ou, si elle échoue, le début du chemin de l'A* simple qui
+            s'approche le plus de l'arrivée. None si la recherche hiérarchique n'est pas terminée.
+        """
+        route = self.find_route(start, goal, max_builds)
+        if route is None or route:
+            return route
+        if sing.ROOT.game_objects.get("terrain") is None:
+            return []
+        target = get_grid_pos(goal)
+        return [grid_pos2world_pos(pos) for pos in get_path2target(get_grid_pos(start), target.x, target.y)]
+
+    def get_next_steps(self, target_name: str, cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Pareil que get_next_step pour plusieurs ennemis d'un coup
+
+        :param target_name: Le nom de la cible
+        :param cells: Les cases des ennemis, tableau d'entiers de taille (n, 2)
+        :return: Les positions universelles des prochains points (n, 2) et un masque (n,) qui vaut False pour les
+            ennemis que le champ ne couvre pas
+        """
+        field = self.fields.get(target_name)
+        if field is None or field.target is None:
+            return np.zeros((len(cells), 2)), np.zeros(len(cells), dtype=bool)
+        terrain = sing.ROOT.game_objects["terrain"]
+        nxt, valid = field.get_next_cells(cells)
+        steps = nxt * terrain.block_px_size + np.array(terrain.get_real_pos()) \
+            - np.array(terrain.size) * terrain.block_px_size / 2
+        at_target = valid & (nxt[:, 0] == field.target[0]) & (nxt[:, 1] == field.target[1])
+        steps[at_target] = sing.ROOT.game_objects[target_name].get_real_pos()
+        return steps, valid
+
+    def get_cache_stats(self) -> dict[str, dict]:
+        """
+        :return: Les statistiques (voir PathCache.get_stats) du cache des chemins hiérarchiques et de celui des A*
+        """
+        return {"routes": self.graph.route_cache.get_stats() if self.graph is not None else PathCache().get_stats(),
+                "paths": path_cache.get_stats()}
+
+    def get_next_step(self, target_name: str, pos: Vector2) -> Optional[Vector2]:
+        """
+        Donne le prochain point où aller pour rejoindre une cible
+
+        :param target_name: Le nom de la cible
+        :param pos: La position universelle de l'ennemi
+        :return: La position universelle du centre de la case suivante (ou la position de la cible si on est déjà sur
+            sa case), None si le champ ne couvre pas cette position
+        """
+        field = self.fields.get(target_name)
+        if field is None or field.target is None:
+            return None
+        cell = get_grid_pos(pos)
+        nxt = field.get_next_cell((int(cell.x), int(cell.y)))
+        if nxt is None:
+            return None
+        if nxt == field.target:
+            return sing.ROOT.game_objects[target_name].get_real_pos().copy()
+        return grid_pos2world_pos(Vector2(nxt))
+
+    def find_route(self, start: Vector2, goal: Vector2, max_builds: Optional[int] = None) -> Optional[list[Vector2]]:
+        """
+        Cherche un long chemin avec le graphe des chunks
+
+        :param start: La position universelle de départ
+        :param goal: La position universelle d'arrivée
+        :param max_builds: Voir ChunkGraph.find_route
+        :return: Les positions universelles des prochaines cases à suivre (jusqu'au chunk suivant), une liste vide si
+            aucun chemin n'a été trouvé, None si la recherche n'est pas terminée
+        """
+        terrain = sing.ROOT.game_objects.get("terrain")
+        if terrain is None:
+            return []
+        if self.graph is None or self.graph.terrain is not terrain:
+            self.graph = ChunkGraph(terrain)
+        start_cell, goal_cell = get_grid_pos(start), get_grid_pos(goal)
+        route = self.graph.find_route((int(start_cell.x), int(start_cell.y)), (int(goal_cell.x), int(goal_cell.y)),
+                                      max_builds)
+        if route is None:
+            return None
+        return [grid_pos2world_pos(Vector2(cell)) for cell in route]
@@ -201,7 +201,7 @@ class Player(Entity):
             sing.ROOT.add_gameObject(dead_label, timer_label)
 
         # MOVEMENT
-        pressed = pygame.key.get_pressed()
+        pressed = sing.ROOT.input.get_pressed()
         dx, dy = 0, 0
         if pressed[K_w]:
             if self.facing != Player.UP:
@@ -268,9 +268,7 @@ class Player(Entity):
 
                 ph = self.generate_punch_hitbox()
                 if isinstance(selected, Weapon):
-                    hits = sing.ROOT.collide_all(ph)
-                    for i in hits:
-                        obj = sing.ROOT.collidable_objects[i]
+                    for obj in sing.ROOT.collide_objects(ph):
                         if isinstance(obj, Resource):
                             obj.on_mine()
                         elif isinstance(obj, Enemy):
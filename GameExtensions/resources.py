@@ -3,13 +3,15 @@ from GameManager.resources import load_sound
 
 from GameExtensions.util import ShakeGenerator
 from GameExtensions.items import *
-from GameExtensions.locals import ITEM_FONT_NAME
+from GameExtensions.locals import ITEM_FONT_NAME, RESOURCE
 
 from pygame.math import Vector2
 import pygame
 
-from random import randint, choice
+import random as rd
+from random import randint
 from random import random
+from typing import Optional
 
 from abc import ABCMeta, abstractmethod
 
@@ -18,6 +20,8 @@ class Resource(GameObject, metaclass=ABCMeta):
     """
     Classe qui représente tous les ressources dont on peut les miner.
     """
+    static_collision = True
+
     def __init__(self, pos: Vector2,
                  name: str,
                  original_img: pygame.Surface,
@@ -26,8 +30,9 @@ class Resource(GameObject, metaclass=ABCMeta):
                  shake_gen: ShakeGenerator,
                  size_decrease_rate=0.9,
                  destroy_threshold=0.25):
-        super().__init__(pos, 0, original_img, name)
-        self.clone_img = original_img.copy()
+        super().__init__(pos, 0, original_img, name, tags=[RESOURCE])
+        # image partagée avec load_img, elle n'est jamais modifiée (on_mine crée une nouvelle image)
+        self.clone_img = original_img
         self.rect_surf = hitbox_rect
         self.rect_surf_clone = hitbox_rect.copy()
         self.col_offset = hitbox_offset
@@ -35,6 +40,8 @@ class Resource(GameObject, metaclass=ABCMeta):
         self.decrease_rate = size_decrease_rate
         self.shake = shake_gen
         self.destroy_threshold = destroy_threshold
+        # la case (x, y) de la carte où se trouve la ressource, None si elle n'a pas été placée par le terrain
+        self.cell: Optional[tuple[int, int]] = None
 
     def get_collision_rect(self) -> pygame.Rect:
         """
@@ -57,6 +64,11 @@ class Resource(GameObject, metaclass=ABCMeta):
         self.size *= self.decrease_rate
         self.image = resize_surface(self.clone_img, self.size)
         self.rect_surf = resize_surface(self.rect_surf_clone, self.size)
+        sing.ROOT.update_collidable_object(self)
+        terrain = sing.ROOT.game_objects.get("terrain")
+        if self.cell is not None and terrain is not None:
+            # le terrain ne peut plus régénérer cette ressource telle quelle
+            terrain.mark_modified(self.cell)
 
 
 class Tree(Resource):
@@ -66,13 +78,16 @@ class Tree(Resource):
 
     APPLE_PROBABILITY = 0.4
 
-    def __init__(self, pos: Vector2, name: str, size_min=64, size_max=96, apple_probability=0.1):
+    def __init__(self, pos: Vector2, name: str, size_min=64, size_max=96, apple_probability=0.1,
+                 rng: Optional[rd.Random] = None):
         """
         :param pos: La position initiale de l'objet. La valeur par défaut est pygame.Vector2(0, 0).
         :param name: Le nom de l'objet.
+        :param rng: Le générateur aléatoire à utiliser (le module random par défaut)
         """
-        size = randint(size_min, size_max)
-        self.has_apple = random() <= apple_probability
+        rng = rd if rng is None else rng
+        size = rng.randint(size_min, size_max)
+        self.has_apple = rng.random() <= apple_probability
         if self.has_apple:
             img = load_img("resources/environment/tree_topdown_with_apple.png", (size, size))
         else:
@@ -97,14 +112,16 @@ class Rock(Resource):
     """
     Roche.
     """
-    def __init__(self, pos: Vector2, name: str, size_min=48, size_max=64):
+    def __init__(self, pos: Vector2, name: str, size_min=48, size_max=64, rng: Optional[rd.Random] = None):
         """
         :param pos: La position initiale de l'objet. La valeur par défaut est pygame.Vector2(0, 0).
         :param name: Le nom de l'objet.
+        :param rng: Le générateur aléatoire à utiliser (le module random par défaut)
         """
-        size = randint(size_min, size_max)
+        rng = rd if rng is None else rng
+        size = rng.randint(size_min, size_max)
         img = ["rock_topdown.png"]
-        super().__init__(pos, name, load_img(f"resources/environment/{choice(img)}", (size, size)),
+        super().__init__(pos, name, load_img(f"resources/environment/{rng.choice(img)}", (size, size)),
                          pygame.Surface((size * 0.6, size * 0.4)), Vector2(0, 15),
                          ShakeGenerator(11, 8, 13, 17, 0, 0, 0.9, 0.9))
         load_sound("resources/sounds/rock_farm.wav", "rock_farm")
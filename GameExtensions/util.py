@@ -1,8 +1,9 @@
 import typing
 from typing import Union, Optional
 
+import heapq
 import math
-from queue import PriorityQueue
+from collections import OrderedDict
 
 import pygame
 from pygame.math import Vector2
@@ -10,8 +11,10 @@ from pygame.math import Vector2
 import GameManager.singleton as sing
 from GameManager.resources import load_img
 from GameManager.util import tuple2Vec2, GameObject, rad2deg
+from GameManager.surface_cache import rotation_cache
 
-from GameExtensions.locals import N, S, W, E, CHUNK_SIZE, DIRS, WATER_DECEL
+from GameExtensions.locals import N, S, W, E, CHUNK_SIZE, DIRS, WATER_DECEL, PATH_ITER_LIMIT
+from GameExtensions.locals import PATH_CACHE_SIZE
 
 
 def get_grid_pos(coordinate: Vector2) -> Vector2:
@@ -203,7 +206,7 @@ class Animator:
         if rotation is None:
             return img
         else:
-            return pygame.transform.rotate(img, rad2deg(rotation))
+            return rotation_cache.rotate(img, rad2deg(rotation))
 
     @staticmethod
     def load_frames_by_pattern(base_file_name: str, suffix: str, start_i: int, end_i: int, conv=lambda s: s,
@@ -225,22 +228,6 @@ class Animator:
         return lst
 
 
-class Path:
-    """
-    Classe utilisée pour calculer un chemin avec l'algorithme A*. Represente un chemin
-    """
-
-    def __init__(self, coords: list[Vector2], cost=0):
-        self.coords: list[Vector2] = coords
-        self.cost = cost
-
-    def copy(self):
-        return Path(self.coords.copy(), self.cost)
-
-    def __lt__(self, other):
-        return self.cost < other.cost
-
-
 def get_next_chunk(current_pos: Vector2,
                    target_pos: Vector2) -> Vector2:
     """
@@ -261,11 +248,170 @@ def get_next_chunk(current_pos: Vector2,
         return current_pos + Vector2(0, 1 if diff_y < 0 else -1)
 
 
+def find_path(grid: typing.Sequence[typing.Sequence],
+              start: tuple[int, int],
+              target_x: Optional[int],
+              target_y: Optional[int],
+              bounds: Optional[tuple[int, int, int, int]] = None,
+              iter_limit: int = PATH_ITER_LIMIT) -> list[tuple[int, int]]:
+    """
+    Algorithme A* (A-Star) sur une grille où les cases qui ne valent pas None sont des obstacles. On ne se déplace
+    que dans les 4 directions, chaque pas coûte 1 et l'heuristique est la distance de Manhattan.
+
+    :param grid: La grille (grid[y][x])
+    :param start: La case de départ
+    :param target_x: L'abcisse de la case de goal (None pour n'importe quelle case de la ligne target_y)
+    :param target_y: L'ordonnée de la case de goal (None pour n'importe quelle case de la colonne target_x)
+    :param bounds: (gauche, haut, droite, bas), bornes incluses, dans lesquelles le chemin doit rester
+    :param iter_limit: Le nombre maximum de cases explorées. Si on l'atteint (ou s'il n'y a pas de chemin), on renvoie
+        le chemin vers la case explorée la plus proche du goal.
+    :return: Les cases du chemin, départ et arrivée compris
+    """
+    height = len(grid)
+    width = len(grid[0]) if height > 0 else 0
+    left, top, right, bottom = 0, 0, width - 1, height - 1
+    if bounds is not None:
+        left, top = max(left, bounds[0]), max(top, bounds[1])
+        right, bottom = min(right, bounds[2]), min(bottom, bounds[3])
+    # la case de goal peut être occupée (par exemple par le core), mais seulement si c'est une case précise
+    exact_goal = (target_x, target_y) if target_x is not None and target_y is not None else None
+
+    def heuristic(x: int, y: int) -> int:
+        return (abs(target_x - x) if target_x is not None else 0) + (abs(target_y - y) if target_y is not None else 0)
+
+    def is_goal(x: int, y: int) -> bool:
+        if exact_goal is None:
+            return x == target_x or y == target_y
+        return (x, y) == exact_goal
+
+    parents: dict[tuple[int, int], Optional[tuple[int, int]]] = {start: None}
+    costs = {start: 0}
+    closed = set()
+    best, best_h = start, heuristic(*start)
+    heap = [(best_h, best_h, start)]
+    while heap:
+        _, h, node = heapq.heappop(heap)
+        if node in closed:
+            continue
+        if is_goal(*node):
+            best = node
+            break
+        closed.add(node)
+        if h < best_h:
+            best, best_h = node, h
+        if len(closed) > iter_limit:
+            break
+
+        x, y = node
+        cost = costs[node] + 1
+        for dx, dy in DIRS:
+            nx, ny = x + dx, y + dy
+            nxt = nx, ny
+            if not (left <= nx <= right and top <= ny <= bottom) or nxt in closed:
+                continue
+            if grid[ny][nx] is not None and nxt != exact_goal:
+                continue
+            if cost < costs.get(nxt, cost + 1):
+                costs[nxt] = cost
+                parents[nxt] = node
+                nh = heuristic(nx, ny)
+                heapq.heappush(heap, (cost + nh, nh, nxt))
+
+    path = []
+    node = best
+    while node is not None:
+        path.append(node)
+        node = parents[node]
+    path.reverse()
+    return path
+
+
+class PathCache:
+    """
+    Cache LRU de chemins. Les chemins sont gardés en tuples (immuables) et partagés entre les ennemis qui demandent le
+    même trajet. La clé doit contenir la version des obstacles du terrain pour qu'un chemin ne serve plus dès qu'un
+    block est posé ou qu'un obstacle est détruit.
+    """
+
+    def __init__(self, max_size: int = PATH_CACHE_SIZE):
+        """
+        :param max_size: Le nombre maximum de chemins gardés
+        """
+        self.max_size = max_size
+        self.paths: OrderedDict[tuple, tuple] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.owner = None
+
+    def set_owner(self, owner) -> None:
+        """
+        Vide le cache si les chemins viennent d'un autre terrain (nouvelle partie)
+
+        :param owner: Le terrain sur lequel les chemins sont calculés
+        """
+        if owner is not self.owner:
+            self.paths.clear()
+            self.owner = owner
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        """
+        :return: Le chemin gardé pour cette clé, None s'il n'y en a pas
+        """
+        path = self.paths.get(key)
+        if path is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.paths.move_to_end(key)
+        return path
+
+    def put(self, key: tuple, path: typing.Iterable) -> tuple:
+        """
+        :return: Le chemin sous forme de tuple, tel qu'il est gardé
+        """
+        path = tuple(path)
+        self.paths[key] = path
+        self.paths.move_to_end(key)
+        while len(self.paths) > self.max_size:
+            self.paths.popitem(last=False)
+        return path
+
+    def get_stats(self) -> dict[str, Union[int, float]]:
+        """
+        :return: Le nombre de chemins trouvés et non trouvés dans le cache, la proportion trouvée et la taille actuelle
+        """
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.,
+                "size": len(self.paths)}
+
+
+path_cache = PathCache()
+
+
+def find_path_cached(start: tuple[int, int],
+                     target_x: Optional[int],
+                     target_y: Optional[int],
+                     bounds: Optional[tuple[int, int, int, int]] = None,
+                     iter_limit: int = PATH_ITER_LIMIT) -> tuple[tuple[int, int], ...]:
+    """
+    find_path sur over_terrain en passant par path_cache
+
+    :return: Les cases du chemin (le tuple est partagé, il ne faut pas le modifier)
+    """
+    terrain = sing.ROOT.game_objects["terrain"]
+    path_cache.set_owner(terrain)
+    key = start, target_x, target_y, bounds, iter_limit, terrain.obstacle_version
+    path = path_cache.get(key)
+    if path is None:
+        path = path_cache.put(key, find_path(terrain.over_terrain, start, target_x, target_y, bounds, iter_limit))
+    return path
+
+
 def get_path2target(current_pos: Vector2,
                     target_x: Optional[int],
                     target_y: Optional[int],
                     chunk_limit: Optional[pygame.Rect] = None,
-                    iter_limit: int = 12) -> list[Vector2]:
+                    iter_limit: int = PATH_ITER_LIMIT) -> list[Vector2]:
     """
     Calcule  un chemin pour aller à la case souhaitée à l'aide de l'algorithme A* (A-Star)
 
@@ -273,39 +419,17 @@ def get_path2target(current_pos: Vector2,
     :param target_x: L'abcisse de la case de goal
     :param target_y: L'ordonnée de la case de goal
     :param chunk_limit: Le chunk dans lequel l'algorithme va être forcé à trouver un chemin dedans.
-    :param iter_limit:
-    :return: Une liste des cases que l'ennemi? doit suivre
+    :param iter_limit: Le nombre maximum de cases explorées
+    :return: Une liste des cases que l'ennemi doit suivre
     """
-    queue: PriorityQueue[Path] = PriorityQueue()
-    queue.put(Path([current_pos.copy()]))
-
-    ter = sing.ROOT.game_objects["terrain"].over_terrain
-    counter = 0
-
-    while True:
-        cur = queue.get()
-        if counter > iter_limit:
-            return cur.coords
-        if (target_x is None or target_y is None) and (cur.coords[-1].x == target_x or cur.coords[-1].y == target_y):
-            return cur.coords
-        elif cur.coords[-1].x == target_x and cur.coords[-1].y == target_y:
-            return cur.coords
-
-        for d in DIRS:
-            nxt = Vector2(cur.coords[-1].x + d[0], cur.coords[-1].y + d[1])
-            if chunk_limit is not None:
-                if (not chunk_limit.topleft[0] <= nxt.x <= chunk_limit.bottomright[0]) or \
-                        (not chunk_limit.topleft[1] <= nxt.y <= chunk_limit.bottomright[1]) or \
-                        ter[int(nxt.y)][int(nxt.x)] is not None or \
-                        nxt in cur.coords:
-                    continue
-
-            new_path = cur.copy()
-            new_path.coords.append(nxt)
-            new_path.cost = (len(new_path.coords) + (((target_x - nxt.x) if target_x is not None else 0) ** 2 +
-                                                     ((target_y - nxt.y) if target_y is not None else 0) ** 2))
-            queue.put(new_path)
-        counter += 1
+    bounds = None
+    if chunk_limit is not None:
+        bounds = chunk_limit.left, chunk_limit.top, chunk_limit.right, chunk_limit.bottom
+    path = find_path_cached((int(current_pos.x), int(current_pos.y)),
+                            int(target_x) if target_x is not None else None,
+                            int(target_y) if target_y is not None else None,
+                            bounds, iter_limit)
+    return [Vector2(x, y) for x, y in path]
 
 
 def get_path2nxt_chunk(current_pos: Vector2,
@@ -340,12 +464,13 @@ class MovementGenerator:
                  hitbox: pygame.Surface,
                  ref: GameObject,
                  knockback_decay: float = 0.1,
-                 exclude: Optional[str] = None):
+                 exclude=None):
         """
 
         :param hitbox: Un pygame.Surface qui définit la taille du hitbox
         :param ref: le gameobject qui utilise cette instance
-        :param exclude: Le nom des objets exclus lors de la détection des collisions
+        :param exclude: Les objets exclus lors de la détection des collisions (un masque de couches obtenu avec
+            GameRoot.get_layer_mask, un objet ou un prédicat). Par défaut seulement ref.
         """
         from GameExtensions.generate_terrain import Terrain
         self.hitbox = hitbox
@@ -353,7 +478,7 @@ class MovementGenerator:
         self.terrain: Terrain = sing.ROOT.game_objects["terrain"]
         self.knockback = Vector2(0, 0)
         self.kb_decay = knockback_decay
-        self.exclude = ref.name if exclude is None else exclude
+        self.exclude = ref if exclude is None else exclude
 
     def update_knockback(self):
         self.knockback -= self.knockback * self.kb_decay
@@ -429,6 +554,9 @@ class Entity(GameObject):
         super().update()
         self.mov_gen.update_knockback()
 
+    def get_trace_state(self) -> bytes:
+        return repr(self.hp).encode()
+
 
 class HPBar(GameObject):
     """
@@ -468,3 +596,6 @@ class HPBar(GameObject):
         self.children["red"].prop = self.prop
         super().blit(screen, apply_alpha)
 
+    def get_render_state(self) -> tuple:
+        return super().get_render_state() + (self.prop,)
+
@@ -1,11 +1,22 @@
+import os
 import pygame
 import sys
+import time
 import GameManager.singleton as sing
 import GameManager.util as util
+from GameManager.spatial import SpatialGrid
+from GameManager.profiler import FrameProfiler
+from GameManager.inputs import InputManager
+from GameManager.render_queue import RenderQueue, GameObjectDict
+from GameManager.locals import DEFAULT_Z_LAYER
 import re
-from typing import Optional
+import struct
+import zlib
+from typing import Optional, Union, Callable
 from collections import OrderedDict
 
+ExcludeType = Union[None, int, str, util.GameObject, Callable[[util.GameObject], bool]]
+
 
 class GameRoot:
     """
@@ -13,7 +24,9 @@ class GameRoot:
     La classe pour la géstion du jeu entière
     """
     def __init__(self, screen_dimension: tuple[int, int], default_background_color: tuple[int, int, int], title: str,
-                 resources_root_path: str, camera_pos: pygame.Vector2, fps_limit=60, display_flag=pygame.SCALED):
+                 resources_root_path: str, camera_pos: pygame.Vector2, fps_limit=60, display_flag=pygame.SCALED,
+                 collision_cell_size: int = 32, dirty_rendering=False, fixed_step: Optional[float] = None,
+                 max_sim_steps: int = 5, max_frame_skip: int = 2, headless=False):
         """
 
         :param screen_dimension: La dimension de la fenêtre
@@ -23,10 +36,25 @@ class GameRoot:
         :param camera_pos: La position de la caméra
         :param fps_limit: La limite de l'fps
         :param display_flag: Option pour la fenêtre du pygame
+        :param collision_cell_size: La taille d'une case de la grille de collision (celle d'un block du terrain)
+        :param dirty_rendering: Si True, on ne redessine que les zones de l'écran qui ont changé (tant que la caméra
+            ne bouge pas)
+        :param fixed_step: La durée (en secondes) d'un pas de simulation fixe, None pour un pas par frame de la durée
+            de la frame précédente. Avec des pas fixes, l'affichage se fait à la vitesse de l'écran et les positions
+            sont interpolées entre deux pas.
+        :param max_sim_steps: Le nombre maximal de pas de simulation par frame (pas fixes)
+        :param max_frame_skip: Le nombre maximal de frames de suite sans affichage quand la simulation est en retard
+            (pas fixes)
+        :param headless: Si True, pas de fenêtre (drivers SDL "dummy", la surface d'affichage existe quand même pour
+            convert_alpha, sans display_flag) et rien n'est dessiné
         """
+        if headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
         pygame.init()
         sing.ROOT = self
-        self.display: pygame.Surface = pygame.display.set_mode(screen_dimension, flags=display_flag)
+        # pygame.SCALED a besoin d'un vrai renderer
+        self.display: pygame.Surface = pygame.display.set_mode(screen_dimension, flags=0 if headless else display_flag)
         pygame.display.set_caption(title)
         self.background: tuple[int, int, int] = default_background_color
         self.fps_limit = fps_limit
@@ -38,19 +66,48 @@ class GameRoot:
         self.key_downs = []
         self.mouse_ups: list[bool, bool, bool] = [False, False, False]
         self.mouse_downs: list[bool, bool, bool] = [False, False, False]
+        self.input = InputManager()
         self.camera_pos: pygame.Vector2 = camera_pos
-        self.game_objects: OrderedDict[str, util.GameObject] = OrderedDict()
-        self.collidable_objects: list[util.GameObject] = []
+        # les objets à afficher par couche, tenue à jour par game_objects
+        self.render_queue = RenderQueue()
+        self.game_objects: OrderedDict[str, util.GameObject] = GameObjectDict(self.render_queue)
+        self.collidable_objects: dict[int, util.GameObject] = {}
         self.global_fonts: dict[str, pygame.font.Font] = {}
-        self.object_collision_rects: list[pygame.Rect] = []
+        self.collision_grid = SpatialGrid(collision_cell_size)
+        self.moved_collidables: dict[int, util.GameObject] = {}
+        self.collision_providers: list = []
+        self.new_collision_handle = 0
+        self.collision_layers: dict[str, int] = {}
+        self.exclude_filters: dict[Union[int, str], Callable[[util.GameObject], bool]] = {}
+        self.exclude_results: dict[str, dict[int, bool]] = {}
         self.objects2be_removed: list[util.GameObject] = []
         self.objects2be_added: list[util.GameObject] = []
+        # fonctions à appeler au début du prochain pas, voir call_before_next_step
+        self.next_step_calls: list[Callable[[], None]] = []
         self.objects_by_tag: dict[str, list[util.GameObject]] = {}
         self.new_object_index = 0
-        self.display_priority: list[str] = []
         self.parameters: dict = {}
         self.sounds: dict[str, pygame.mixer.Sound] = {}
         self.tick_count = 0
+        self.dirty_rendering = dirty_rendering
+        self.render_states: dict[str, tuple[tuple, pygame.Rect]] = {}
+        self.dirty_rects: list[pygame.Rect] = []
+        self.full_redraw = True
+        self.last_camera_pos: Optional[tuple[float, float]] = None
+        self.profiler = FrameProfiler()
+        self.headless = headless
+        self.fixed_step = fixed_step
+        self.max_sim_steps = max_sim_steps
+        self.max_frame_skip = max_frame_skip
+        # temps réel pas encore simulé, durée réelle de la dernière frame et frames sautées de suite
+        self.accumulator = 0.
+        self.frame_time = 0.
+        self.skipped_frames = 0
+        # True quand un pas de simulation a vu les entrées de la frame (elles sont alors vidées)
+        self.inputs_consumed = True
+        self.previous_camera_pos: Optional[pygame.Vector2] = None
+        # position dans l'intervalle entre les deux derniers pas (0 à 1) pendant l'affichage, None sinon
+        self.render_alpha: Optional[float] = None
 
     def mainloop(self):
         """
@@ -58,23 +115,29 @@ class GameRoot:
         """
 
         self.delta = 0
+        if self.headless and self.input.replaying:
+            # replay sans fenêtre : tous les pas d'un coup, aussi vite que possible, puis on quitte
+            ticks = self.input.remaining
+            start = time.perf_counter()
+            mismatch = self.run_replay()
+            duration = time.perf_counter() - start
+            print(f"replay : {ticks} pas en {duration:.2f} s ({ticks / max(duration, 1e-9):.0f} pas/s), "
+                  + self.describe_replay_result(mismatch))
+            self.profiler.on_exit()
+            pygame.quit()
+            sys.exit(0 if mismatch is None else 1)
+        profiler = self.profiler
+        profiler.start()
+        last_frame = time.perf_counter()
         while True:
-            self.object_collision_rects.clear()
-            for l in self.objects_by_tag.values():
-                l.clear()
-            t = pygame.time.get_ticks()
-            self.key_ups.clear()
-            self.key_downs.clear()
-            last_mouse_ups = self.mouse_ups.copy()
-            last_mouse_downs = self.mouse_downs.copy()
-            self.mouse_ups.clear()
-            self.mouse_downs.clear()
-            self.mouse_ups = [False, False, False]
-            self.mouse_downs = [False, False, False]
+            if self.inputs_consumed:
+                self.clear_inputs()
 
             # _____EVENTS_____
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    profiler.on_exit()
+                    self.input.stop_recording()
                     pygame.quit()
                     sys.exit(0)
                 elif event.type == pygame.KEYDOWN:
@@ -84,59 +147,305 @@ class GameRoot:
                 elif event.type == pygame.MOUSEBUTTONUP:
                     if event.button > 3:  # MOUSE SCROLL
                         continue
-                    # if not last_mouse_ups[event.button - 1]:
                     self.mouse_ups[event.button - 1] = True
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     if event.button > 3:  # MOUSE SCROLL
                         continue
-                    # if not last_mouse_downs[event.button - 1]:
                     self.mouse_downs[event.button - 1] = True
 
             # ___________
+            profiler.mark("events")
 
             # ___MAIN UPDATE___
-            try:
-                for gm in self.game_objects.values():
-                    if gm.enabled:
-                        gm.early_update()
-            except RuntimeError:
-                pass
+            render = self.simulate_frame()
+            if self.input.replay is not None and not self.input.replaying:
+                # fin d'un replay avec fenêtre : on donne le résultat et le joueur reprend la main
+                print(f"replay : terminé, {self.describe_replay_result(self.input.end_replay())}")
+            # _________________
+
+            # __ BLIT THINGS ON THE SCREEN __
+            if render:
+                self.render()
+            profiler.mark("display")
+            self.clock.tick(self.fps_limit)
+            profiler.mark("idle")
+            profiler.end_frame(self.tick_count)
+            now = time.perf_counter()
+            self.frame_time = now - last_frame
+            last_frame = now
+            if self.fixed_step is None:
+                self.delta = self.frame_time
+            else:
+                self.accumulator += self.frame_time
+
+    def clear_inputs(self) -> None:
+        """
+        Oublie les événements (touches et boutons appuyés ou relâchés) déjà vus par un pas de simulation
+        """
+        self.key_ups.clear()
+        self.key_downs.clear()
+        self.mouse_ups = [False, False, False]
+        self.mouse_downs = [False, False, False]
+
+    def simulate_frame(self) -> bool:
+        """
+        La partie simulation d'une frame : un pas de la durée de la frame précédente, ou avec des pas fixes, autant de
+        pas qu'il faut pour rattraper le temps écoulé. Les événements de la frame ne sont vus que par le premier pas.
+
+        :return: True si la frame doit être affichée
+        """
+        if self.fixed_step is None:
+            self.step()
+            self.inputs_consumed = True
+            return True
+        render = True
+        # pas de simulation fixes : on rattrape le temps écoulé, au plus max_sim_steps pas par frame
+        steps = 0
+        while self.accumulator >= self.fixed_step and steps < self.max_sim_steps:
+            self.save_previous_positions()
+            self.delta = self.fixed_step
+            self.step()
+            if steps == 0:
+                # un clic ou une touche ne doit servir qu'une fois, même si la frame fait plusieurs pas
+                self.clear_inputs()
+            self.accumulator -= self.fixed_step
+            steps += 1
+        # les entrées sont gardées jusqu'au prochain pas si cette frame n'en a pas fait
+        self.inputs_consumed = steps > 0
+        if self.accumulator >= self.fixed_step:
+            # en retard : on saute l'affichage pour simuler plus à la prochaine frame, sinon on abandonne le
+            # temps en trop (le jeu ralentit au lieu de s'effondrer)
+            if self.skipped_frames < self.max_frame_skip:
+                render = False
+            else:
+                self.accumulator %= self.fixed_step
+        self.skipped_frames = 0 if render else self.skipped_frames + 1
+        return render
+
+    def step(self) -> None:
+        """
+        Un pas de simulation : early_update et update de tous les objets, puis les ajouts et suppressions d'objets.
+        """
+        profiler = self.profiler
+        calls, self.next_step_calls = self.next_step_calls, []
+        for func in calls:
+            func()
+        self.input.begin_step(self)
+        for l in self.objects_by_tag.values():
+            l.clear()
+        try:
+            for gm in self.game_objects.values():
+                if gm.enabled:
+                    profiler.call(gm, "early_update", gm.early_update)
+        except RuntimeError:
+            pass
+        profiler.mark("early_update")
 
+        try:
+            for gm in self.game_objects.values():
+                if gm.enabled:
+                    profiler.call(gm, "update", gm.update)
+        except RuntimeError:
+            pass
+        profiler.mark("update")
+
+        # ___ ADD/REMOVE OBJECTS ___
+        for gm in self.objects2be_added:
+            self.game_objects.setdefault(gm.name, gm)
+
+        for gm in self.objects2be_removed:
             try:
-                for gm in self.game_objects.values():
-                    if gm.enabled:
-                        gm.update()
-            except RuntimeError:
+                self.game_objects.pop(gm.name)
+            except KeyError:
                 pass
-            # _________________
+            self.remove_collidable_object(gm)
+        self.objects2be_added.clear()
+        self.objects2be_removed.clear()
+        # _________________
+        profiler.mark("flush")
+        self.tick_count += 1
+        self.input.end_step(self)
 
-            # ___ ADD/REMOVE OBJECTS ___
-            for gm in self.objects2be_added:
-                self.game_objects.setdefault(gm.name, gm)
-
-            for gm in self.objects2be_removed:
-                try:
-                    self.game_objects.pop(gm.name)
-                except KeyError:
-                    pass
-                self.remove_collidable_object(gm)
-            self.objects2be_added.clear()
-            self.objects2be_removed.clear()
-            # _________________
+    def call_before_next_step(self, func: Callable[[], None]) -> None:
+        """
+        Appelle une fonction au début du prochain pas de simulation, avant que les entrées soient lues. Par exemple pour
+        commencer une partie (ou son enregistrement) entre deux pas plutôt qu'au milieu de l'update d'un bouton.
 
-            # __ BLIT THINGS ON THE SCREEN __
+        :param func: La fonction, sans paramètre
+        """
+        self.next_step_calls.append(func)
+
+    def save_previous_positions(self) -> None:
+        """
+        Garde la position des objets et de la caméra avant un pas de simulation, pour l'interpolation de l'affichage.
+        """
+        self.previous_camera_pos = self.camera_pos.copy()
+        for gm in self.game_objects.values():
+            gm.previous_pos = gm.pos.copy()
+
+    def run_ticks(self, ticks: int, delta: float, render: Optional[bool] = None) -> list[float]:
+        """
+        Lance des pas de simulation de suite, aussi vite que possible (sans limite d'FPS) et avec un delta fixe, par
+        exemple pour un benchmark ou une simulation headless. Les événements de pygame sont ignorés.
+
+        :param ticks: Le nombre de pas
+        :param delta: La durée simulée d'un pas en secondes
+        :param render: Si on dessine chaque pas (par défaut, seulement si le jeu n'est pas headless)
+        :return: La durée réelle de chaque pas en secondes (affichage compris)
+        """
+        render = not self.headless if render is None else render
+        # pas d'interpolation : chaque pas est affiché tel quel
+        self.previous_camera_pos = None
+        profiler = self.profiler
+        profiler.start()
+        durations = []
+        for _ in range(ticks):
+            start = time.perf_counter()
+            pygame.event.pump()
+            self.clear_inputs()
+            profiler.mark("events")
+            self.delta = delta
+            self.step()
+            if render:
+                self.render()
+                profiler.mark("display")
+            profiler.end_frame(self.tick_count)
+            durations.append(time.perf_counter() - start)
+        return durations
+
+    def run_replay(self) -> Optional[int]:
+        """
+        Rejoue jusqu'au bout le journal chargé avec self.input.load_replay, aussi vite que possible.
+
+        :return: Le premier pas (depuis le début du journal) dont l'état diffère de l'enregistrement, None si la
+            partie rejouée est identique
+        """
+        self.run_ticks(self.input.remaining, self.fixed_step or 0.)
+        return self.input.mismatch
+
+    @staticmethod
+    def describe_replay_result(mismatch: Optional[int]) -> str:
+        """
+        :param mismatch: Le premier pas différent de l'enregistrement (InputManager.mismatch)
+        :return: Le résultat d'un replay en quelques mots
+        """
+        return "identique à l'enregistrement" if mismatch is None else f"différent à partir du pas {mismatch}"
+
+    def get_state_checksum(self) -> int:
+        """
+        Somme de contrôle de l'état de la simulation : le nom, la position et la rotation de chaque objet, et ce que
+        renvoie sa fonction get_trace_state. Deux parties identiques ont la même somme à chaque pas.
+
+        :return: La somme (crc32)
+        """
+        checksum = zlib.crc32(struct.pack("<Q", self.tick_count))
+        for name, gm in self.game_objects.items():
+            checksum = zlib.crc32(name.encode(), checksum)
+            checksum = zlib.crc32(struct.pack("<3d", gm.pos.x, gm.pos.y, gm.rotation), checksum)
+            checksum = zlib.crc32(gm.get_trace_state(), checksum)
+        return checksum
+
+    def render(self) -> None:
+        """
+        Affiche la frame. Avec des pas de simulation fixes, les objets et la caméra sont affichés entre leur position
+        avant et après le dernier pas, selon le temps écoulé depuis (voir get_render_offset).
+        """
+        if self.headless:
+            return
+        camera_pos = self.camera_pos
+        if self.fixed_step is not None and self.previous_camera_pos is not None:
+            self.render_alpha = min(1., self.accumulator / self.fixed_step)
+            self.camera_pos = self.previous_camera_pos.lerp(camera_pos, self.render_alpha)
+        try:
+            if self.dirty_rendering:
+                self.render_dirty()
+            else:
+                self.display.fill(self.background)
+                self.blit_objects()
+                self.profiler.mark("blit")
+                pygame.display.update()
+        finally:
+            self.camera_pos = camera_pos
+            self.render_alpha = None
+
+    def get_render_order(self) -> list[util.GameObject]:
+        """
+        Renvoie les objets dans l'ordre dans lequel ils sont affichés : par couche (z_layer) puis dans l'ordre où ils
+        ont été ajoutés
+
+        :return: La liste des objets
+        """
+        return list(self.render_queue)
+
+    def blit_objects(self) -> None:
+        """
+        Affiche tous les objets actifs sur la fenêtre
+        """
+        for gm in self.get_render_order():
+            if gm.enabled:
+                self.profiler.call(gm, "blit", gm.blit, self.display)
+
+    def invalidate(self, rect: Optional[pygame.Rect] = None) -> None:
+        """
+        Demande de redessiner une zone de l'écran à la prochaine frame (mode de rendu partiel)
+
+        :param rect: La zone, ou None pour redessiner tout l'écran
+        """
+        if rect is None:
+            self.full_redraw = True
+        else:
+            self.dirty_rects.append(rect)
+
+    def render_dirty(self) -> None:
+        """
+        Rendu partiel: compare l'état d'affichage de chaque objet avec celui de la frame précédente et ne redessine
+        que les zones qui ont changé. Si la caméra a bougé, tout l'écran est redessiné.
+        """
+        camera = (self.camera_pos.x, self.camera_pos.y)
+        full = self.full_redraw or camera != self.last_camera_pos
+        self.last_camera_pos = camera
+        self.full_redraw = False
+        damaged = self.dirty_rects
+        self.dirty_rects = []
+
+        states: dict[str, tuple[tuple, pygame.Rect]] = {}
+        for gm in self.get_render_order():
+            state = gm.get_render_state()
+            rect = gm.get_render_rect()
+            states[gm.name] = state, rect
+            if full:
+                continue
+            prev = self.render_states.get(gm.name)
+            if prev is None:
+                damaged.append(rect)
+            elif prev[0] != state:
+                damaged.append(prev[1])
+                damaged.append(rect)
+        if not full:
+            for name, (state, rect) in self.render_states.items():
+                if name not in states:
+                    damaged.append(rect)
+        self.render_states = states
+
+        if full:
             self.display.fill(self.background)
-            for gm in self.game_objects:
-                if self.game_objects[gm].enabled and gm not in self.display_priority:
-                    self.game_objects[gm].blit(self.display)
-            for gm in reversed(self.display_priority):
-                if gm in self.game_objects:
-                    if self.game_objects[gm].enabled:
-                        self.game_objects[gm].blit(self.display)
+            self.blit_objects()
+            self.profiler.mark("blit")
             pygame.display.update()
-            self.clock.tick(self.fps_limit)
-            self.delta = (pygame.time.get_ticks() - t) / 1000
-            self.tick_count += 1
+            return
+
+        screen_rect = self.display.get_rect()
+        damaged = [r.clip(screen_rect) for r in damaged]
+        damaged = [r for r in damaged if r.width > 0 and r.height > 0]
+        if len(damaged) == 0:
+            self.profiler.mark("blit")
+            return
+        self.display.set_clip(damaged[0].unionall(damaged[1:]))
+        self.display.fill(self.background)
+        self.blit_objects()
+        self.display.set_clip(None)
+        self.profiler.mark("blit")
+        pygame.display.update(damaged)
 
     def add_gameObject(self, *gameObject: util.GameObject, immediate=False):
         """
@@ -152,57 +461,188 @@ class GameRoot:
                 self.game_objects.setdefault(g.name, g)
         return self
 
-    def add_collidable_object(self, gameObject: util.GameObject) -> None:
+    def add_collidable_object(self, gameObject: util.GameObject, indexed=True) -> int:
         """
         Fonction pour ajouter un objet qui possède un hitbox
 
         :param gameObject: L'objet qu'on veut ajouter
+        :param indexed: Si False, l'objet n'est pas rangé dans la grille de collision : c'est un fournisseur de
+            collisions (voir add_collision_provider) qui le trouve lors des requêtes
+        :return: Le handle de l'objet. Il reste valable jusqu'à ce que l'objet soit supprimé et n'est jamais réutilisé.
         """
-        self.collidable_objects.append(gameObject)
+        if gameObject.collision_handle is not None:
+            return gameObject.collision_handle
+        handle = self.new_collision_handle
+        self.new_collision_handle += 1
+        gameObject.collision_handle = handle
+        gameObject.collision_mask = self.get_layer_mask(*gameObject.tags)
+        self.collidable_objects[handle] = gameObject
+        if indexed:
+            self.collision_grid.insert(handle, gameObject.get_collision_rect())
+        return handle
+
+    def add_collision_provider(self, provider) -> None:
+        """
+        Ajoute un fournisseur de collisions : un objet qui gère lui-même les hitboxes de beaucoup d'objets (ajoutés
+        avec add_collidable_object(obj, indexed=False)), par exemple avec des tableaux numpy.
+        Il doit avoir un attribut collision_mask (les couches de tous ses objets) et une méthode
+        query_collisions(rect) qui renvoie les handles de ses objets en contact avec le rect.
 
-    def calculate_collision_rects(self) -> None:
+        :param provider: Le fournisseur
+        """
+        if provider not in self.collision_providers:
+            self.collision_providers.append(provider)
+
+    def remove_collision_provider(self, provider) -> None:
+        if provider in self.collision_providers:
+            self.collision_providers.remove(provider)
+
+    def get_collidable(self, handle: int) -> Optional[util.GameObject]:
         """
-        Calcule les hitboxes pour tous les objets
+        Renvoie l'objet qui correspond à un handle renvoyé par is_colliding ou collide_all
 
+        :param handle: Le handle
+        :return: L'objet s'il est toujours là sinon None
         """
-        if len(self.object_collision_rects) == 0:
-            self.object_collision_rects = list(map(lambda obj: obj.get_collision_rect(), self.collidable_objects))
+        return self.collidable_objects.get(handle)
 
-    def is_colliding(self, rect: pygame.Rect, exclude: Optional[str] = None) -> int:
+    def get_layer_mask(self, *layers: str) -> int:
         """
-        Fonction pour vérifier si le rect donné est en contact avec un autre objet
+        Calcule le masque (bitfield) qui correspond aux couches données. Chaque tag est une couche de collision et
+        reçoit un bit la première fois qu'on le rencontre.
+
+        :param layers: Les noms des couches (tags)
+        :return: Le masque
+        """
+        mask = 0
+        for layer in layers:
+            bit = self.collision_layers.get(layer)
+            if bit is None:
+                bit = 1 << len(self.collision_layers)
+                self.collision_layers[layer] = bit
+            mask |= bit
+        return mask
+
+    def get_exclude_filter(self, exclude: ExcludeType) -> Optional[Callable[[util.GameObject], bool]]:
+        """
+        Transforme le paramètre exclude des requêtes de collision en prédicat.
+
+        :param exclude: None, un masque de couches (int), un objet, un prédicat ou un regex sur le nom (ancienne API,
+            le résultat est mis en cache pour chaque objet)
+        :return: Une fonction qui renvoie True si l'objet doit être ignoré, None si on n'exclut rien
+        """
+        if exclude is None:
+            return None
+        if isinstance(exclude, util.GameObject):
+            return lambda obj: obj is exclude
+        if callable(exclude):
+            return exclude
+        f = self.exclude_filters.get(exclude)
+        if f is not None:
+            return f
+        if isinstance(exclude, int):
+            def f(obj: util.GameObject) -> bool:
+                return obj.collision_mask & exclude != 0
+        else:
+            pattern = re.compile(exclude)
+            results = self.exclude_results.setdefault(exclude, {})
+
+            def f(obj: util.GameObject) -> bool:
+                res = results.get(obj.collision_handle)
+                if res is None:
+                    res = results[obj.collision_handle] = pattern.match(obj.name) is not None
+                return res
+        self.exclude_filters[exclude] = f
+        return f
+
+    def mark_collidable_moved(self, gameObject: util.GameObject) -> None:
+        """
+        Signale qu'un objet possédant un hitbox a bougé. Sa hitbox sera recalculée avant la prochaine requête.
+
+        :param gameObject: L'objet qui a bougé
+        """
+        if gameObject.collision_handle is not None:
+            self.moved_collidables[gameObject.collision_handle] = gameObject
+
+    def update_collidable_object(self, gameObject: util.GameObject) -> None:
+        """
+        Recalcule immédiatement la hitbox d'un objet (par exemple un objet statique dont la hitbox a changé)
+
+        :param gameObject: L'objet
+        """
+        if gameObject.collision_handle is not None:
+            self.collision_grid.move(gameObject.collision_handle, gameObject.get_collision_rect())
+
+    def calculate_collision_rects(self) -> None:
+        """
+        Met à jour dans la grille les hitboxes des objets qui ont bougé depuis la dernière requête
+
+        """
+        if len(self.moved_collidables) == 0:
+            return
+        for handle, obj in self.moved_collidables.items():
+            if handle in self.collision_grid.rects:
+                self.collision_grid.move(handle, obj.get_collision_rect())
+        self.moved_collidables.clear()
+
+    def query_collisions(self, rect: pygame.Rect, exclude: ExcludeType = None) -> list[int]:
+        """
+        Cherche dans la grille et chez les fournisseurs de collisions les objets en contact avec le rect
 
         :param rect: Le rect qu'on veut vérifier
-        :param exclude: Exception pour pas détecter une collision avec
-        :return: L'index de l'objet si il est en contact sinon -1
+        :param exclude: Sert seulement à ne pas interroger les fournisseurs dont tous les objets sont exclus
+        :return: Les handles triés dans l'ordre croissant (le filtre exclude n'est pas encore appliqué)
         """
         self.calculate_collision_rects()
-        il = rect.collidelistall(self.object_collision_rects)
-        for i in il:
-            if i > len(self.collidable_objects) - 1:
+        handles = self.collision_grid.query(rect)
+        extra = []
+        for provider in self.collision_providers:
+            if isinstance(exclude, int) and provider.collision_mask & exclude:
                 continue
-            if exclude is None or not re.match(exclude, self.collidable_objects[i].name):
-                return i
+            extra += provider.query_collisions(rect)
+        if extra:
+            handles = sorted(handles + extra)
+        return handles
+
+    def is_colliding(self, rect: pygame.Rect, exclude: ExcludeType = None) -> int:
+        """
+        Fonction pour vérifier si le rect donné est en contact avec un autre objet
+
+        :param rect: Le rect qu'on veut vérifier
+        :param exclude: Exception pour pas détecter une collision avec (voir get_exclude_filter)
+        :return: Le handle de l'objet si il est en contact sinon -1
+        """
+        excluded = self.get_exclude_filter(exclude)
+        for handle in self.query_collisions(rect, exclude):
+            if excluded is None or not excluded(self.collidable_objects[handle]):
+                return handle
         return -1
 
-    def collide_all(self, rect: pygame.Rect, exclude: Optional[str] = None) -> tuple[int]:
+    def collide_all(self, rect: pygame.Rect, exclude: ExcludeType = None) -> tuple[int]:
         """
         Pareil que is_colliding mais peut détecter plusieurs objets
 
         :param rect: Le rect qu'on veut vérifier
-        :param exclude: Exceptions pour pas détecter une collision avec
-        :return: Les indexes des objets si le rect est en contact sinon un tuple vide
+        :param exclude: Exceptions pour pas détecter une collision avec (voir get_exclude_filter)
+        :return: Les handles des objets si le rect est en contact sinon un tuple vide
         """
-        self.calculate_collision_rects()
-        il = rect.collidelistall(self.object_collision_rects)
+        excluded = self.get_exclude_filter(exclude)
         ret = []
-        for i in il:
-            if i > len(self.collidable_objects) - 1:
-                continue
-            if exclude is None or not re.match(exclude, self.collidable_objects[i].name):
-                ret.append(i)
+        for handle in self.query_collisions(rect, exclude):
+            if excluded is None or not excluded(self.collidable_objects[handle]):
+                ret.append(handle)
         return tuple(ret)
 
+    def collide_objects(self, rect: pygame.Rect, exclude: ExcludeType = None) -> list[util.GameObject]:
+        """
+        Pareil que collide_all mais renvoie directement les objets
+
+        :param rect: Le rect qu'on veut vérifier
+        :param exclude: Exceptions pour pas détecter une collision avec (voir get_exclude_filter)
+        :return: Les objets en contact avec le rect
+        """
+        return [self.collidable_objects[handle] for handle in self.collide_all(rect, exclude)]
+
     def remove_collidable_object(self, obj: util.GameObject) -> bool:
         """
         Supprime un objet possédant un hitbox
@@ -210,11 +650,16 @@ class GameRoot:
         :param obj: L'objet qu'on veut supprimer
         :return: True si il réussit sinon False
         """
-        for i, o in enumerate(self.collidable_objects):
-            if o == obj:
-                self.collidable_objects.pop(i)
-                return True
-        return False
+        handle = obj.collision_handle
+        if handle is None or self.collidable_objects.get(handle) is not obj:
+            return False
+        del self.collidable_objects[handle]
+        self.collision_grid.remove(handle)
+        self.moved_collidables.pop(handle, None)
+        for results in self.exclude_results.values():
+            results.pop(handle, None)
+        obj.collision_handle = None
+        return True
 
     def remove_object(self, obj: util.GameObject):
         """
@@ -229,11 +674,18 @@ class GameRoot:
         Supprime tous les objets du jeu
         """
         self.game_objects.clear()
+        for obj in self.collidable_objects.values():
+            obj.collision_handle = None
         self.collidable_objects.clear()
-        self.object_collision_rects.clear()
+        self.collision_grid.clear()
+        self.moved_collidables.clear()
+        self.collision_providers.clear()
+        for results in self.exclude_results.values():
+            results.clear()
         self.objects2be_removed.clear()
         self.objects2be_added.clear()
         self.objects_by_tag.clear()
+        self.full_redraw = True
 
     def get_obj_list_by_tag(self, tag: str) -> list[util.GameObject]:
         """
@@ -253,7 +705,14 @@ class GameRoot:
         return self.objects_by_tag[tag]
 
     def setup_priority(self, order: list[str]) -> None:
-        self.display_priority = [x for x in order if x in self.game_objects]
+        """
+        Affiche les objets de ces noms par-dessus les autres, le premier de la liste tout en haut, en leur donnant
+        chacun une couche (z_layer) au-dessus de DEFAULT_Z_LAYER. Les objets de ces noms ajoutés plus tard sont aussi
+        rangés dans leur couche.
+
+        :param order: Les noms des objets
+        """
+        self.render_queue.set_name_layers({name: DEFAULT_Z_LAYER + len(order) - i for i, name in enumerate(order)})
 
     def set_parameter(self, key, value) -> None:
         self.parameters[key] = value
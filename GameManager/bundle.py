@@ -0,0 +1,159 @@
+"""
+Paquet de ressources : tous les fichiers du dossier resources/ rangés dans un seul fichier indexé, lu avec mmap.
+Les images peuvent y être rangées déjà décodées (pixels RGBA bruts) pour ne plus décoder de PNG au lancement.
+
+Construction du paquet : python -m GameManager.bundle [--no-decode]
+"""
+import argparse
+import io
+import json
+import mmap
+import os
+import struct
+import typing
+from typing import Optional
+
+import pygame
+
+from GameManager.locals import BUNDLE_FILE, IMAGE_EXTENSIONS
+
+# en-tête : signature, version du format et taille de l'index (JSON) qui suit
+BUNDLE_MAGIC = b"NSIB"
+BUNDLE_VERSION = 1
+HEADER_FORMAT = "<4sII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# les données de chaque fichier commencent sur un multiple de ALIGN octets
+ALIGN = 16
+
+
+def get_bundle_key(filename: typing.Union[str, os.PathLike]) -> str:
+    """
+    :param filename: Le nom d'un fichier relatif à la racine des ressources
+    :return: Le nom utilisé dans l'index du paquet (normalisé, avec des /)
+    """
+    return os.path.normpath(filename).replace(os.sep, "/")
+
+
+def build_bundle(root: str, folder: str = "resources", output: str = BUNDLE_FILE, decode_images=True) -> int:
+    """
+    Range tous les fichiers d'un dossier dans un paquet.
+
+    :param root: La racine des ressources (sing.ROOT.resources_path)
+    :param folder: Le dossier à ranger, relatif à root
+    :param output: Le fichier du paquet, relatif à root
+    :param decode_images: Si True, les images sont rangées décodées en RGBA (plus gros, mais rien à décoder)
+    :return: La taille du paquet en octets
+    """
+    output_path = os.path.abspath(os.path.join(root, output))
+    blobs: list[tuple[str, dict, bytes]] = []
+    for dir_path, _, files in sorted(os.walk(os.path.join(root, folder))):
+        for file in sorted(files):
+            path = os.path.join(dir_path, file)
+            if os.path.abspath(path) == output_path:
+                continue
+            key = get_bundle_key(os.path.relpath(path, root))
+            if decode_images and os.path.splitext(file)[1].lower() in IMAGE_EXTENSIONS:
+                image = pygame.image.load(path)
+                pixels = pygame.image.tostring(image, "RGBA")
+                blobs.append((key, {"kind": "rgba", "size": image.get_size()}, pixels))
+            else:
+                with open(path, "rb") as f:
+                    blobs.append((key, {"kind": "file"}, f.read()))
+
+    index = {}
+    offset = 0
+    for key, entry, data in blobs:
+        index[key] = dict(entry, offset=offset, length=len(data))
+        offset += -(-len(data) // ALIGN) * ALIGN
+    header = json.dumps(index).encode()
+    data_start = -(-(HEADER_SIZE + len(header)) // ALIGN) * ALIGN
+
+    with open(output_path, "wb") as f:
+        f.write(struct.pack(HEADER_FORMAT, BUNDLE_MAGIC, BUNDLE_VERSION, len(header)))
+        f.write(header)
+        for key, _, data in blobs:
+            f.seek(data_start + index[key]["offset"])
+            f.write(data)
+        f.truncate(data_start + offset)
+    return data_start + offset
+
+
+class AssetBundle:
+    """
+    Un paquet ouvert avec mmap : les fichiers ne sont pas lus au lancement, seules les pages utilisées sont
+    chargées par le système quand une ressource est demandée.
+    """
+
+    def __init__(self, filename: str):
+        """
+        :param filename: Le chemin du paquet
+        """
+        with open(filename, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_size = struct.unpack_from(HEADER_FORMAT, self.data)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError(f"{filename} n'est pas un paquet de ressources valide (version {BUNDLE_VERSION})")
+        self.index: dict[str, dict] = json.loads(self.data[HEADER_SIZE:HEADER_SIZE + header_size])
+        self.data_start = -(-(HEADER_SIZE + header_size) // ALIGN) * ALIGN
+
+    def __contains__(self, filename: typing.Union[str, os.PathLike]) -> bool:
+        return get_bundle_key(filename) in self.index
+
+    def get_bytes(self, filename: typing.Union[str, os.PathLike]) -> memoryview:
+        """
+        :param filename: Le nom du fichier relatif à la racine des ressources
+        :return: Les données du fichier, sans copie
+        """
+        entry = self.index[get_bundle_key(filename)]
+        start = self.data_start + entry["offset"]
+        return memoryview(self.data)[start:start + entry["length"]]
+
+    def get_file(self, filename: typing.Union[str, os.PathLike]) -> io.BytesIO:
+        """
+        :return: Le fichier sous forme d'objet fichier, pour pygame.mixer.Sound et pygame.font.Font
+        """
+        return io.BytesIO(self.get_bytes(filename))
+
+    def load_image(self, filename: typing.Union[str, os.PathLike]) -> pygame.Surface:
+        """
+        Équivalent de pygame.image.load(...).convert_alpha() qui lit le paquet.
+
+        :param filename: Le nom du fichier relatif à la racine des ressources
+        :return: L'image
+        """
+        entry = self.index[get_bundle_key(filename)]
+        if entry["kind"] == "rgba":
+            # la surface lit directement les pixels du mmap, convert_alpha en fait une copie au format de l'écran
+            return pygame.image.frombuffer(self.get_bytes(filename), tuple(entry["size"]), "RGBA").convert_alpha()
+        return pygame.image.load(self.get_file(filename), os.path.basename(filename)).convert_alpha()
+
+
+# paquets déjà ouverts, par chemin (None si le paquet n'existe pas)
+opened_bundles: dict[str, Optional[AssetBundle]] = {}
+
+
+def get_bundle(root: str, filename: str = BUNDLE_FILE) -> Optional[AssetBundle]:
+    """
+    :param root: La racine des ressources
+    :param filename: Le fichier du paquet, relatif à root
+    :return: Le paquet s'il a été construit, sinon None (les ressources sont alors lues fichier par fichier)
+    """
+    path = os.path.join(root, filename)
+    if path not in opened_bundles:
+        opened_bundles[path] = AssetBundle(path) if os.path.isfile(path) else None
+    return opened_bundles[path]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Range le dossier resources/ dans un seul paquet")
+    parser.add_argument("--root", default=os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                        help="la racine des ressources")
+    parser.add_argument("--output", default=BUNDLE_FILE, help="le fichier du paquet, relatif à la racine")
+    parser.add_argument("--no-decode", action="store_true", help="garder les images en PNG dans le paquet")
+    args = parser.parse_args()
+    size = build_bundle(args.root, output=args.output, decode_images=not args.no_decode)
+    print(f"{args.output}: {size / 1024:.0f} Ko")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Entrées du jeu (clavier et souris) et journaux d'entrées : une partie enregistrée peut être rejouée à l'identique, sans
+fenêtre et aussi vite que possible, pour reproduire un problème de performance.
+
+Format du journal : un en-tête (signature, version, graine du module random, taille des métadonnées), les métadonnées
+en JSON puis un enregistrement par pas de simulation. Un enregistrement commence par un octet qui dit quels champs ont
+changé depuis le pas précédent, suivi de ces champs seulement et de la somme de contrôle de l'état du jeu à la fin du
+pas : un pas sans changement prend 5 octets.
+"""
+import json
+import random
+import struct
+from typing import NamedTuple, Optional, Sequence
+
+import pygame
+
+# en-tête : signature, version du format, graine de random et taille des métadonnées (JSON) qui suivent
+LOG_MAGIC = b"NSIR"
+LOG_VERSION = 1
+HEADER_FORMAT = "<4sIQI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# champs d'un enregistrement (bits de l'octet du début)
+DELTA = 1
+MOUSE_POS = 2
+MOUSE_BUTTONS = 4
+KEYS = 8
+EVENTS = 16
+
+
+class InputFrame(NamedTuple):
+    """
+    Les entrées vues par un pas de simulation
+    """
+    delta: float
+    mouse_pos: tuple[int, int]
+    # boutons de la souris enfoncés, un bit par bouton (5 boutons comme pygame.mouse.get_pressed(5))
+    mouse_buttons: int
+    # scancodes des touches enfoncées
+    keys: tuple[int, ...]
+    key_downs: tuple[int, ...]
+    key_ups: tuple[int, ...]
+    # un bit par bouton (gauche, milieu, droite)
+    mouse_downs: int
+    mouse_ups: int
+    # somme de contrôle de l'état du jeu à la fin du pas (GameRoot.get_state_checksum)
+    checksum: int = 0
+
+
+def to_bits(values: Sequence[bool]) -> int:
+    return sum(1 << i for i, value in enumerate(values) if value)
+
+
+def from_bits(bits: int, n: int) -> list[bool]:
+    return [bool(bits >> i & 1) for i in range(n)]
+
+
+def encode_frame(frame: InputFrame, previous: Optional[InputFrame]) -> bytes:
+    """
+    :param frame: L'enregistrement à écrire
+    :param previous: L'enregistrement du pas précédent (None pour le premier)
+    :return: Les octets de l'enregistrement, avec seulement les champs qui ont changé
+    """
+    flags = 0
+    data = []
+    if previous is None or frame.delta != previous.delta:
+        flags |= DELTA
+        data.append(struct.pack("<d", frame.delta))
+    if previous is None or frame.mouse_pos != previous.mouse_pos:
+        flags |= MOUSE_POS
+        data.append(struct.pack("<hh", *frame.mouse_pos))
+    if previous is None or frame.mouse_buttons != previous.mouse_buttons:
+        flags |= MOUSE_BUTTONS
+        data.append(struct.pack("<B", frame.mouse_buttons))
+    if previous is None or frame.keys != previous.keys:
+        flags |= KEYS
+        data.append(struct.pack(f"<B{len(frame.keys)}H", len(frame.keys), *frame.keys))
+    if frame.key_downs or frame.key_ups or frame.mouse_downs or frame.mouse_ups:
+        flags |= EVENTS
+        keys = frame.key_downs + frame.key_ups
+        data.append(struct.pack(f"<BBB{len(keys)}I", frame.mouse_downs | frame.mouse_ups << 3, len(frame.key_downs),
+                                len(frame.key_ups), *keys))
+    return bytes((flags,)) + b"".join(data) + struct.pack("<I", frame.checksum)
+
+
+def decode_frames(data: bytes) -> list[InputFrame]:
+    """
+    :param data: Les enregistrements d'un journal (sans l'en-tête)
+    :return: Les entrées de chaque pas
+    """
+    frames = []
+    frame = InputFrame(0., (0, 0), 0, (), (), (), 0, 0)
+    i = 0
+    while i < len(data):
+        flags = data[i]
+        i += 1
+        changes = {"key_downs": (), "key_ups": (), "mouse_downs": 0, "mouse_ups": 0}
+        if flags & DELTA:
+            changes["delta"], = struct.unpack_from("<d", data, i)
+            i += 8
+        if flags & MOUSE_POS:
+            changes["mouse_pos"] = struct.unpack_from("<hh", data, i)
+            i += 4
+        if flags & MOUSE_BUTTONS:
+            changes["mouse_buttons"] = data[i]
+            i += 1
+        if flags & KEYS:
+            n = data[i]
+            changes["keys"] = struct.unpack_from(f"<{n}H", data, i + 1)
+            i += 1 + 2 * n
+        if flags & EVENTS:
+            mouse, downs, ups = struct.unpack_from("<BBB", data, i)
+            keys = struct.unpack_from(f"<{downs + ups}I", data, i + 3)
+            changes.update(mouse_downs=mouse & 7, mouse_ups=mouse >> 3, key_downs=keys[:downs], key_ups=keys[downs:])
+            i += 3 + 4 * (downs + ups)
+        changes["checksum"], = struct.unpack_from("<I", data, i)
+        i += 4
+        frame = frame._replace(**changes)
+        frames.append(frame)
+    return frames
+
+
+class InputRecorder:
+    """
+    Écrit un journal d'entrées, un enregistrement par pas de simulation
+    """
+
+    def __init__(self, filename: str, seed: int, metadata: Optional[dict] = None):
+        """
+        :param filename: Le fichier du journal
+        :param seed: La graine donnée au module random au début de l'enregistrement
+        :param metadata: Des informations sur la partie (en JSON), rendues par read_input_log
+        """
+        self.file = open(filename, "wb")
+        header = json.dumps(metadata or {}).encode()
+        self.file.write(struct.pack(HEADER_FORMAT, LOG_MAGIC, LOG_VERSION, seed, len(header)))
+        self.file.write(header)
+        self.previous: Optional[InputFrame] = None
+        self.count = 0
+
+    def write(self, frame: InputFrame) -> None:
+        self.file.write(encode_frame(frame, self.previous))
+        self.previous = frame
+        self.count += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def read_input_log(filename: str) -> tuple[int, dict, list[InputFrame]]:
+    """
+    :param filename: Le fichier du journal
+    :return: La graine de random, les métadonnées et les entrées de chaque pas
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+    magic, version, seed, header_size = struct.unpack_from(HEADER_FORMAT, data)
+    if magic != LOG_MAGIC or version != LOG_VERSION:
+        raise ValueError(f"{filename} n'est pas un journal d'entrées valide (version {LOG_VERSION})")
+    metadata = json.loads(data[HEADER_SIZE:HEADER_SIZE + header_size])
+    return seed, metadata, decode_frames(data[HEADER_SIZE + header_size:])
+
+
+class InputManager:
+    """
+    L'état du clavier et de la souris vu par la simulation (sing.ROOT.input). Les objets doivent le lire ici plutôt
+    qu'avec pygame.key.get_pressed, pygame.mouse.get_pos et pygame.mouse.get_pressed : au début de chaque pas, l'état
+    est lu sur pygame, ou dans le journal pendant un replay, et il peut être enregistré.
+    Les événements (touches et boutons appuyés ou relâchés) restent dans GameRoot.key_downs, key_ups, mouse_downs et
+    mouse_ups.
+    """
+
+    def __init__(self):
+        self.keys: Sequence[bool] = pygame.key.get_pressed()
+        self.mouse_pos: tuple[int, int] = (0, 0)
+        self.mouse_buttons: tuple[bool, ...] = (False,) * 5
+        self.recorder: Optional[InputRecorder] = None
+        self.current: Optional[InputFrame] = None
+        self.replay: Optional[list[InputFrame]] = None
+        self.replay_index = 0
+        # premier pas du replay dont l'état diffère de l'enregistrement
+        self.mismatch: Optional[int] = None
+
+    @property
+    def replaying(self) -> bool:
+        return self.replay is not None and self.replay_index < len(self.replay)
+
+    @property
+    def remaining(self) -> int:
+        """
+        Le nombre de pas qui restent à rejouer
+        """
+        return len(self.replay) - self.replay_index if self.replay is not None else 0
+
+    @property
+    def deterministic(self) -> bool:
+        """
+        True pendant un enregistrement ou un replay : la simulation ne doit alors dépendre que des entrées, de la
+        graine de random et des delta (pas de threads, pas de temps réel)
+        """
+        return self.recorder is not None or self.replay is not None
+
+    def get_pressed(self) -> Sequence[bool]:
+        """
+        :return: Équivalent de pygame.key.get_pressed()
+        """
+        return self.keys
+
+    def get_mouse_pos(self) -> tuple[int, int]:
+        """
+        :return: Équivalent de pygame.mouse.get_pos()
+        """
+        return self.mouse_pos
+
+    def get_mouse_pressed(self, num_buttons: int = 3) -> tuple[bool, ...]:
+        """
+        :param num_buttons: 3 ou 5, comme pygame.mouse.get_pressed
+        :return: Équivalent de pygame.mouse.get_pressed(num_buttons)
+        """
+        return self.mouse_buttons[:num_buttons]
+
+    def start_recording(self, filename: str, seed: Optional[int] = None, metadata: Optional[dict] = None) -> int:
+        """
+        Commence à enregistrer les entrées de chaque pas. Le module random reçoit une graine qui est gardée dans le
+        journal.
+
+        :param filename: Le fichier du journal
+        :param seed: La graine de random (au hasard par défaut)
+        :param metadata: Des informations sur la partie, rendues par load_replay
+        :return: La graine
+        """
+        self.stop_recording()
+        seed = random.SystemRandom().getrandbits(63) if seed is None else seed
+        random.seed(seed)
+        self.recorder = InputRecorder(filename, seed, metadata)
+        return seed
+
+    def stop_recording(self) -> None:
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def load_replay(self, filename: str) -> dict:
+        """
+        Rejoue un journal à partir du prochain pas : les entrées et les delta viennent du journal, et le module random
+        reçoit la graine de l'enregistrement.
+
+        :param filename: Le fichier du journal
+        :return: Les métadonnées du journal
+        """
+        seed, metadata, self.replay = read_input_log(filename)
+        self.replay_index = 0
+        self.current = None
+        self.mismatch = None
+        random.seed(seed)
+        return metadata
+
+    def end_replay(self) -> Optional[int]:
+        """
+        Oublie le journal rejoué : les entrées viennent à nouveau de pygame
+
+        :return: Le premier pas dont l'état différait de l'enregistrement, None si le replay était identique
+        """
+        self.replay = None
+        self.current = None
+        return self.mismatch
+
+    def begin_step(self, root) -> None:
+        """
+        Appelée au début de chaque pas de simulation : lit l'état des entrées (ou le prend dans le journal) et les
+        delta du pas.
+
+        :param root: Le GameRoot
+        """
+        if self.replaying:
+            frame = self.replay[self.replay_index]
+            if self.current is None or frame.keys != self.current.keys:
+                pressed = set(frame.keys)
+                self.keys = pygame.key.ScancodeWrapper(i in pressed for i in range(len(self.keys)))
+            self.current = frame
+            self.mouse_pos = frame.mouse_pos
+            self.mouse_buttons = tuple(from_bits(frame.mouse_buttons, 5))
+            root.delta = frame.delta
+            root.key_downs = list(frame.key_downs)
+            root.key_ups = list(frame.key_ups)
+            root.mouse_downs = from_bits(frame.mouse_downs, 3)
+            root.mouse_ups = from_bits(frame.mouse_ups, 3)
+            return
+        self.keys = pygame.key.get_pressed()
+        self.mouse_pos = pygame.mouse.get_pos()
+        self.mouse_buttons = pygame.mouse.get_pressed(5)
+        if self.recorder is not None:
+            self.current = InputFrame(root.delta, self.mouse_pos, to_bits(self.mouse_buttons),
+                                      tuple(i for i, pressed in enumerate(self.keys) if pressed),
+                                      tuple(root.key_downs), tuple(root.key_ups), to_bits(root.mouse_downs),
+                                      to_bits(root.mouse_ups))
+
+    def end_step(self, root) -> None:
+        """
+        Appelée à la fin de chaque pas de simulation : écrit l'enregistrement du pas ou vérifie que le replay arrive au
+        même état que l'enregistrement.
+
+        :param root: Le GameRoot
+        """
+        if self.replaying:
+            if self.mismatch is None and root.get_state_checksum() != self.replay[self.replay_index].checksum:
+                self.mismatch = self.replay_index
+            self.replay_index += 1
+        elif self.recorder is not None:
+            self.recorder.write(self.current._replace(checksum=root.get_state_checksum()))
@@ -8,3 +8,23 @@ MOUSE_MIDDLE: Final = 1
 MOUSE_LEFT: Final = 0
 
 VOLUME: Final = "volume"
+
+# précision des angles (en degrés) et mémoire maximale (en octets) du cache des images tournées
+ROTATION_STEP: Final = 1
+ROTATION_CACHE_BYTES: Final = 64 << 20
+
+# les extensions des fichiers préchargés par preload_images et le manifeste des images à précharger
+IMAGE_EXTENSIONS: Final = (".png", ".jpg", ".jpeg", ".bmp")
+IMAGE_MANIFEST: Final = "resources/image_manifest.json"
+
+# le paquet des ressources construit par python -m GameManager.bundle, relatif à la racine des ressources
+BUNDLE_FILE: Final = "resources.bundle"
+
+# le nombre de frames gardées par le profiler de GameRoot
+PROFILER_FRAMES: Final = 600
+
+# la couche d'affichage par défaut des objets (GameObject.z_layer), setup_priority utilise les couches au-dessus
+DEFAULT_Z_LAYER: Final = 0
+
+# la durée d'un pas de simulation du jeu (60 pas par seconde, quelle que soit la vitesse de l'affichage)
+SIM_STEP: Final = 1 / 60
@@ -0,0 +1,160 @@
+import csv
+import json
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from GameManager.locals import PROFILER_FRAMES
+
+# les étapes d'une frame de GameRoot.mainloop, dans l'ordre
+PHASES = ("events", "early_update", "update", "flush", "blit", "display", "idle")
+# les fonctions des objets dont on mesure le coût par classe
+OBJECT_CALLS = ("early_update", "update", "blit")
+
+
+class FrameProfiler:
+    """
+    Mesure le temps passé dans chaque étape de la boucle principale et le coût de early_update, update et blit par
+    classe de GameObject (enfants compris). Les dernières frames sont gardées dans un buffer circulaire.
+    Quand il est désactivé, seules les étapes sont chronométrées (quelques appels à perf_counter par frame) et rien
+    n'est gardé.
+    """
+
+    def __init__(self, size: int = PROFILER_FRAMES):
+        """
+        :param size: Le nombre de frames gardées
+        """
+        self.enabled = False
+        self.dump_path: Optional[str] = None
+        # (numéro de la frame, durée de chaque étape en secondes dans l'ordre de PHASES)
+        self.frames: deque[tuple[int, tuple[float, ...]]] = deque(maxlen=size)
+        # pour chaque frame : nom de la classe -> durées de early_update, update et blit en secondes
+        self.object_costs: deque[dict[str, list[float]]] = deque(maxlen=size)
+        self.current = dict.fromkeys(PHASES, 0.)
+        self.current_objects: dict[str, list[float]] = {}
+        self.last = time.perf_counter()
+
+    def enable(self, dump_path: Optional[str] = None) -> None:
+        """
+        :param dump_path: Le fichier (.csv ou .json) où les mesures sont écrites quand le jeu se ferme
+        """
+        self.enabled = True
+        self.dump_path = dump_path
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def start(self) -> None:
+        """
+        Appelée au lancement de la boucle principale : la première frame ne compte pas le temps passé avant.
+        """
+        self.current = dict.fromkeys(PHASES, 0.)
+        self.current_objects = {}
+        self.last = time.perf_counter()
+
+    def clear(self) -> None:
+        self.frames.clear()
+        self.object_costs.clear()
+
+    def mark(self, phase: str) -> None:
+        """
+        Ajoute le temps écoulé depuis la dernière marque à une étape de la frame.
+        """
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def call(self, obj, name: str, method: Callable, *args) -> None:
+        """
+        Appelle method(*args) et ajoute sa durée au coût de la classe de obj (seulement si le profiler est actif).
+
+        :param obj: L'objet dont on appelle la fonction
+        :param name: Le nom de la fonction (dans OBJECT_CALLS)
+        """
+        if not self.enabled:
+            method(*args)
+            return
+        start = time.perf_counter()
+        method(*args)
+        costs = self.current_objects.get(type(obj).__name__)
+        if costs is None:
+            costs = self.current_objects[type(obj).__name__] = [0.] * len(OBJECT_CALLS)
+        costs[OBJECT_CALLS.index(name)] += time.perf_counter() - start
+
+    def end_frame(self, tick: int) -> None:
+        """
+        Range les mesures de la frame qui se termine et prépare la suivante.
+
+        :param tick: Le numéro de la frame
+        """
+        if self.enabled:
+            self.frames.append((tick, tuple(self.current[phase] for phase in PHASES)))
+            self.object_costs.append(self.current_objects)
+        self.current = dict.fromkeys(PHASES, 0.)
+        self.current_objects = {}
+
+    def get_phase_stats(self, last: Optional[int] = None) -> dict[str, dict[str, float]]:
+        """
+        :param last: Le nombre de frames à résumer (toutes les frames gardées par défaut)
+        :return: Pour chaque étape, la moyenne, le 95e centile et le maximum en millisecondes
+        """
+        frames = list(self.frames)[-last:] if last else list(self.frames)
+        stats = {}
+        for i, phase in enumerate(PHASES + ("total",)):
+            values = sorted(sum(durations) if phase == "total" else durations[i] for _, durations in frames)
+            if not values:
+                stats[phase] = {"mean": 0., "p95": 0., "max": 0.}
+                continue
+            stats[phase] = {"mean": 1000 * sum(values) / len(values),
+                            "p95": 1000 * values[min(len(values) - 1, int(len(values) * 0.95))],
+                            "max": 1000 * values[-1]}
+        return stats
+
+    def get_object_stats(self, last: Optional[int] = None) -> list[tuple[str, float, float, float]]:
+        """
+        :param last: Le nombre de frames à résumer (toutes les frames gardées par défaut)
+        :return: Pour chaque classe, son nom et le temps moyen par frame (en millisecondes) de early_update, update
+            et blit, de la plus coûteuse à la moins coûteuse
+        """
+        frames = list(self.object_costs)[-last:] if last else list(self.object_costs)
+        totals: dict[str, list[float]] = {}
+        for costs in frames:
+            for name, durations in costs.items():
+                total = totals.setdefault(name, [0.] * len(OBJECT_CALLS))
+                for i, duration in enumerate(durations):
+                    total[i] += duration
+        n = max(1, len(frames))
+        stats = [(name, *(1000 * t / n for t in total)) for name, total in totals.items()]
+        return sorted(stats, key=lambda s: -sum(s[1:]))
+
+    def save(self, path: str) -> None:
+        """
+        Écrit les mesures gardées dans un fichier : une ligne par frame en CSV (étapes puis classes), ou tout le
+        détail en JSON selon l'extension du fichier. Les durées sont en millisecondes.
+
+        :param path: Le fichier
+        """
+        if path.endswith(".json"):
+            data = [{"tick": tick, "phases": {phase: 1000 * d for phase, d in zip(PHASES, durations)},
+                     "objects": {name: dict(zip(OBJECT_CALLS, (1000 * d for d in costs)))
+                                 for name, costs in objects.items()}}
+                    for (tick, durations), objects in zip(self.frames, self.object_costs)]
+            with open(path, "w") as f:
+                json.dump(data, f)
+            return
+        classes = sorted({name for objects in self.object_costs for name in objects})
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["tick", *PHASES, *(f"{name}.{call}" for name in classes for call in OBJECT_CALLS)])
+            for (tick, durations), objects in zip(self.frames, self.object_costs):
+                row = [tick, *(round(1000 * d, 4) for d in durations)]
+                for name in classes:
+                    row += [round(1000 * d, 4) for d in objects.get(name, (0.,) * len(OBJECT_CALLS))]
+                writer.writerow(row)
+
+    def on_exit(self) -> None:
+        """
+        Appelée quand le jeu se ferme : écrit les mesures si un fichier a été donné à enable.
+        """
+        if self.enabled and self.dump_path is not None:
+            self.save(self.dump_path)
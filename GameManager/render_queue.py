@@ -0,0 +1,153 @@
+from __future__ import annotations  # Avoid circular import
+
+import bisect
+import typing
+from collections import OrderedDict
+
+if typing.TYPE_CHECKING:  # Avoid circular import
+    from GameManager.util import GameObject
+
+
+class RenderQueue:
+    """
+    Les objets à afficher, rangés par couche (GameObject.z_layer) : les couches sont affichées de la plus basse à la
+    plus haute et, dans une couche, les objets dans l'ordre où ils ont été ajoutés. Ajouter, enlever, déplacer
+    (move_to_end) ou changer la couche d'un objet se fait en O(1) (sauf la première fois qu'une couche est utilisée).
+    """
+
+    def __init__(self):
+        # couche -> objets de la couche par nom, dans l'ordre d'affichage
+        self.layers: dict[int, OrderedDict[str, GameObject]] = {}
+        # les couches utilisées, triées (une couche vide est gardée, il y en a peu)
+        self.order: list[int] = []
+        # couches données par setup_priority aux objets de ces noms, même ajoutés plus tard
+        self.name_layers: dict[str, int] = {}
+
+    def add(self, gm: GameObject) -> None:
+        """
+        Ajoute un objet à la fin de sa couche
+
+        :param gm: L'objet
+        """
+        if gm.name in self.name_layers:
+            gm.__dict__["z_layer"] = self.name_layers[gm.name]
+        layer = self.layers.get(gm.z_layer)
+        if layer is None:
+            layer = self.layers[gm.z_layer] = OrderedDict()
+            bisect.insort(self.order, gm.z_layer)
+        layer[gm.name] = gm
+
+    def remove(self, gm: GameObject) -> None:
+        """
+        :param gm: L'objet à enlever (rien ne se passe s'il n'est pas dans la file)
+        """
+        layer = self.find_layer(gm)
+        if layer is not None:
+            del layer[gm.name]
+
+    def find_layer(self, gm: GameObject) -> typing.Optional[OrderedDict[str, GameObject]]:
+        """
+        :return: La couche où l'objet est rangé, None s'il n'est pas dans la file
+        """
+        layer = self.layers.get(gm.z_layer)
+        if layer is not None and layer.get(gm.name) is gm:
+            return layer
+        return None
+
+    def change_layer(self, gm: GameObject, old: int) -> None:
+        """
+        Appelée quand la couche d'un objet change : il passe à la fin de sa nouvelle couche.
+
+        :param gm: L'objet
+        :param old: Son ancienne couche
+        """
+        layer = self.layers.get(old)
+        if layer is not None and layer.get(gm.name) is gm:
+            del layer[gm.name]
+            self.add(gm)
+
+    def move_to_end(self, gm: GameObject, last: bool = True) -> None:
+        """
+        Affiche l'objet après (ou avant si last est False) les autres objets de sa couche
+        """
+        layer = self.find_layer(gm)
+        if layer is not None:
+            layer.move_to_end(gm.name, last)
+
+    def set_name_layers(self, name_layers: dict[str, int]) -> None:
+        """
+        :param name_layers: La couche des objets de chaque nom (y compris ceux qui seront ajoutés plus tard)
+        """
+        self.name_layers = name_layers
+        for layer in [layer.copy() for layer in self.layers.values()]:
+            for name, gm in layer.items():
+                if name in name_layers:
+                    gm.z_layer = name_layers[name]
+
+    def clear(self) -> None:
+        for layer in self.layers.values():
+            layer.clear()
+
+    def __iter__(self) -> typing.Iterator[GameObject]:
+        for z in self.order:
+            yield from self.layers[z].values()
+
+    def __len__(self) -> int:
+        return sum(len(layer) for layer in self.layers.values())
+
+
+class GameObjectDict(OrderedDict):
+    """
+    Le dictionnaire des objets du jeu (GameRoot.game_objects) : les objets ajoutés, enlevés ou déplacés (move_to_end)
+    le sont aussi dans la file d'affichage. Ses copies (copy, copy.copy) sont des OrderedDict simples.
+    """
+
+    def __init__(self, render_queue: RenderQueue):
+        super().__init__()
+        self.render_queue = render_queue
+
+    def __setitem__(self, name: str, gm: GameObject) -> None:
+        old = self.get(name)
+        if old is not None:
+            self.render_queue.remove(old)
+        super().__setitem__(name, gm)
+        self.render_queue.add(gm)
+
+    def __delitem__(self, name: str) -> None:
+        self.render_queue.remove(self[name])
+        super().__delitem__(name)
+
+    def setdefault(self, name: str, gm: GameObject = None) -> GameObject:
+        if name not in self:
+            self[name] = gm
+        return self[name]
+
+    def pop(self, name: str, *default):
+        if name in self:
+            self.render_queue.remove(self[name])
+        return super().pop(name, *default)
+
+    def popitem(self, last: bool = True) -> tuple[str, GameObject]:
+        name, gm = super().popitem(last)
+        self.render_queue.remove(gm)
+        return name, gm
+
+    def move_to_end(self, name: str, last: bool = True) -> None:
+        super().move_to_end(name, last)
+        self.render_queue.move_to_end(self[name], last)
+
+    def clear(self) -> None:
+        super().clear()
+        self.render_queue.clear()
+
+    def copy(self) -> OrderedDict[str, GameObject]:
+        """
+        :return: Une copie simple (OrderedDict), qui n'est pas reliée à la file d'affichage
+        """
+        return OrderedDict(self)
+
+    __copy__ = copy
+
+    def __reduce__(self):
+        # copy.deepcopy et pickle donnent aussi un OrderedDict simple
+        return OrderedDict, (list(self.items()),)
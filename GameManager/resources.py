@@ -1,32 +1,252 @@
 import pygame
+import io
 import os
+import json
 import pathlib
 import typing
+from collections import OrderedDict
 import GameManager.singleton as sing
 from typing import Optional
-from GameManager.locals import VOLUME
+from GameManager.locals import VOLUME, IMAGE_EXTENSIONS
+from GameManager.surface_cache import get_surface_bytes
+from GameManager.bundle import get_bundle
+
+
+class ImageCache:
+    """
+    Garde les images chargées par load_img, par fichier (chemin normalisé) et par taille. Chaque fichier n'est
+    décodé qu'une fois : les autres tailles sont calculées à partir de l'image d'origine gardée en mémoire.
+    Les images sont partagées entre tous ceux qui les chargent : il ne faut pas les modifier sur place.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        """
+        :param max_bytes: La mémoire maximale gardée par le cache en octets, None pour ne rien oublier. Au-delà,
+            les images les moins récemment utilisées sont oubliées (et relues depuis le disque au besoin).
+        """
+        self.max_bytes = max_bytes
+        self.surfaces: OrderedDict[tuple[str, Optional[tuple]], pygame.Surface] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_loads = 0
+
+    def get(self, filename: typing.Union[str, pathlib.Path], resize: Optional[tuple[int, int]] = None) \
+            -> pygame.Surface:
+        """
+        :param filename: Le nom du fichier, relatif à sing.ROOT.resources_path
+        :param resize: La taille voulue, None pour la taille d'origine
+        :return: L'image (partagée)
+        """
+        key = os.path.normpath(filename), None if resize is None else tuple(resize)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        if key[1] is None:
+            bundle = get_bundle(sing.ROOT.resources_path)
+            if bundle is not None and key[0] in bundle:
+                surface = bundle.load_image(key[0])
+            else:
+                surface = pygame.image.load(os.path.join(sing.ROOT.resources_path, key[0])).convert_alpha()
+            self.disk_loads += 1
+        else:
+            surface = pygame.transform.scale(self.get(key[0]), key[1])
+        self.put(key, surface)
+        return surface
+
+    def put(self, key: tuple[str, Optional[tuple]], surface: pygame.Surface) -> None:
+        size = get_surface_bytes(surface)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self.surfaces[key] = surface
+        self.bytes += size
+        while self.max_bytes is not None and self.bytes > self.max_bytes:
+            _, old = self.surfaces.popitem(last=False)
+            self.bytes -= get_surface_bytes(old)
+
+    def clear(self) -> None:
+        self.surfaces.clear()
+        self.bytes = 0
+
+    def get_stats(self) -> dict[str, float]:
+        """
+        :return: Le nombre de hits, de misses, de lectures sur le disque, le taux de hit, le nombre d'images gardées
+            et la mémoire utilisée
+        """
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "disk_loads": self.disk_loads,
+                "hit_rate": self.hits / total if total else 0., "size": len(self.surfaces), "bytes": self.bytes}
+
+
+# le cache utilisé par load_img
+image_cache = ImageCache()
+
+
+def get_resource_file(filename: typing.Union[str, pathlib.Path]) -> typing.Union[str, io.BytesIO]:
+    """
+    :param filename: Le nom du fichier, relatif à sing.ROOT.resources_path
+    :return: Le fichier lu dans le paquet des ressources s'il y est, sinon le chemin du fichier
+    """
+    bundle = get_bundle(sing.ROOT.resources_path)
+    if bundle is not None and filename in bundle:
+        return bundle.get_file(filename)
+    return os.path.join(sing.ROOT.resources_path, filename)
+
+
+def get_resource_size(filename: typing.Union[str, pathlib.Path]) -> int:
+    """
+    :param filename: Le nom du fichier, relatif à sing.ROOT.resources_path
+    :return: La taille du fichier en octets (dans le paquet des ressources s'il y est)
+    """
+    bundle = get_bundle(sing.ROOT.resources_path)
+    if bundle is not None and filename in bundle:
+        return len(bundle.get_bytes(filename))
+    return os.path.getsize(os.path.join(sing.ROOT.resources_path, filename))
 
 
 def load_img(filename: typing.Union[str, pathlib.Path],
              resize: typing.Optional[tuple[int, int]] = None) -> pygame.Surface:
     """
-    Fonction pour charger une image
+    Fonction pour charger une image. L'image est gardée dans image_cache et partagée : il ne faut pas la modifier
+    sur place (la copier avant si besoin).
 
     :param filename: Le nom du fichier
     :param resize: Un tuple pour la nouvelle taille éventuellement
     :return: L'image chargée
     """
-    loaded = pygame.image.load(os.path.join(sing.ROOT.resources_path, filename)).convert_alpha()
-    if resize is None:
-        return loaded
+    return image_cache.get(filename, resize)
+
+
+def get_image_manifest(folder: typing.Union[str, pathlib.Path] = "resources") -> list[list]:
+    """
+    Construit un manifeste de toutes les images d'un dossier (et de ses sous-dossiers), à leur taille d'origine.
+
+    :param folder: Le dossier, relatif à sing.ROOT.resources_path
+    :return: Une liste de [nom du fichier, None]
+    """
+    bundle = get_bundle(sing.ROOT.resources_path)
+    if bundle is not None:
+        prefix = os.path.normpath(folder).replace(os.sep, "/") + "/"
+        return [[path, None] for path in bundle.index
+                if path.startswith(prefix) and os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS]
+    manifest = []
+    for dir_path, _, files in sorted(os.walk(os.path.join(sing.ROOT.resources_path, folder))):
+        for file in sorted(files):
+            if os.path.splitext(file)[1].lower() in IMAGE_EXTENSIONS:
+                manifest.append([os.path.relpath(os.path.join(dir_path, file), sing.ROOT.resources_path), None])
+    return manifest
+
+
+def save_image_manifest(filename: typing.Union[str, pathlib.Path]) -> None:
+    """
+    Écrit un manifeste JSON de toutes les images (et tailles) chargées jusqu'ici, pour les précharger aux prochains
+    lancements avec preload_images.
+
+    :param filename: Le nom du fichier, relatif à sing.ROOT.resources_path
+    """
+    manifest = [[path, None if size is None else list(size)] for path, size in image_cache.surfaces]
+    with open(os.path.join(sing.ROOT.resources_path, filename), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+
+def preload_images(manifest: Optional[typing.Union[str, pathlib.Path]] = None) -> int:
+    """
+    Charge d'avance les images pour que le jeu ne lise plus le disque pendant une partie : celles du manifeste
+    s'il existe (voir save_image_manifest), sinon toutes les images du dossier resources/ à leur taille d'origine
+    (les autres tailles sont alors calculées en mémoire à la première demande).
+
+    :param manifest: Le nom du fichier manifeste, relatif à sing.ROOT.resources_path
+    :return: Le nombre d'images chargées
+    """
+    if manifest is not None and os.path.isfile(os.path.join(sing.ROOT.resources_path, manifest)):
+        with open(os.path.join(sing.ROOT.resources_path, manifest)) as f:
+            entries = json.load(f)
     else:
-        return pygame.transform.scale(loaded, resize)
+        entries = get_image_manifest()
+    for path, size in entries:
+        image_cache.get(path, size)
+    return len(entries)
+
+
+class AssetRegistry:
+    """
+    Garde les sons et les polices déjà chargés pour que chaque fichier ne soit décodé qu'une fois : un son par
+    fichier, une police par fichier et par taille. Les objets sont partagés entre tous ceux qui les chargent.
+    """
+
+    def __init__(self):
+        self.sounds: dict[str, pygame.mixer.Sound] = {}
+        self.fonts: dict[tuple[str, int], pygame.font.Font] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_sound(self, filename: typing.Union[str, pathlib.Path]) -> pygame.mixer.Sound:
+        """
+        :param filename: Le nom du fichier, relatif à sing.ROOT.resources_path
+        :return: Le son (partagé)
+        """
+        path = os.path.normpath(filename)
+        sound = self.sounds.get(path)
+        if sound is None:
+            self.misses += 1
+            sound = self.sounds[path] = pygame.mixer.Sound(get_resource_file(path))
+        else:
+            self.hits += 1
+        return sound
+
+    def get_font(self, filename: typing.Union[str, pathlib.Path], font_size: int) -> pygame.font.Font:
+        """
+        :param filename: Le nom du fichier, relatif à sing.ROOT.resources_path
+        :param font_size: La taille de la police
+        :return: La police (partagée)
+        """
+        key = os.path.normpath(filename), font_size
+        font = self.fonts.get(key)
+        if font is None:
+            self.misses += 1
+            font = self.fonts[key] = pygame.font.Font(get_resource_file(key[0]), font_size)
+        else:
+            self.hits += 1
+        return font
+
+    @staticmethod
+    def get_sound_bytes(sound: pygame.mixer.Sound) -> int:
+        """
+        :return: La mémoire occupée par les échantillons décodés du son, en octets
+        """
+        init = pygame.mixer.get_init()
+        if init is None:
+            return 0
+        frequency, size, channels = init
+        return int(sound.get_length() * frequency) * channels * abs(size) // 8
+
+    def get_memory_report(self) -> dict[str, float]:
+        """
+        :return: Le nombre de sons et de polices gardés, la mémoire des sons décodés, la taille des fichiers des
+            polices (en octets) et le nombre de chargements évités
+        """
+        font_files = {path for path, _ in self.fonts}
+        return {"sounds": len(self.sounds), "fonts": len(self.fonts),
+                "sound_bytes": sum(self.get_sound_bytes(sound) for sound in self.sounds.values()),
+                "font_file_bytes": sum(get_resource_size(path) for path in font_files),
+                "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        self.sounds.clear()
+        self.fonts.clear()
+
+
+# le registre utilisé par load_sound et load_font
+asset_registry = AssetRegistry()
 
 
 def load_font(filename: typing.Union[str, pathlib.Path], font_size: int, global_font=False, name="")\
         -> pygame.font.Font:
     """
-    Fonction pour charger une police
+    Fonction pour charger une police. Le fichier n'est ouvert qu'une fois par taille, la police est partagée.
 
     :param filename: Le nom du fichier
     :param font_size: La taille de la police
@@ -34,7 +254,7 @@ def load_font(filename: typing.Union[str, pathlib.Path], font_size: int, global_
     :param name: Le nom de la police si global_font == True
     :return: La police chargée
     """
-    fnt = pygame.font.Font(os.path.join(sing.ROOT.resources_path, filename), font_size)
+    fnt = asset_registry.get_font(filename, font_size)
     if global_font:
         sing.ROOT.global_fonts.setdefault(name, fnt)
     return fnt
@@ -42,13 +262,14 @@ def load_font(filename: typing.Union[str, pathlib.Path], font_size: int, global_
 
 def load_sound(filename: typing.Union[str, pathlib.Path], name: str, override_volume: Optional[float] = None) -> None:
     """
-    Fonction pour charger un fichier audio
+    Fonction pour charger un fichier audio. Le fichier n'est décodé qu'une fois, les noms qui utilisent le même
+    fichier partagent le même son (et donc le même volume).
 
     :param filename: Le nom du fichier
     :param name: Le nom du son chargé
     :param override_volume: Si on souhaite utiliser un volume spécifique ou pas
     """
-    sound = pygame.mixer.Sound(os.path.join(sing.ROOT.resources_path, filename))
+    sound = asset_registry.get_sound(filename)
     if VOLUME in sing.ROOT.parameters and override_volume is None:
         sound.set_volume(sing.ROOT.parameters[VOLUME])
     elif override_volume is not None:
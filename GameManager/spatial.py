@@ -0,0 +1,116 @@
+from typing import Iterator
+
+import pygame
+
+
+class SpatialGrid:
+    """
+    Grille uniforme (spatial hash) qui range les hitboxes par case. Une requête ne regarde que les cases touchées
+    par le rect donné, donc le coût dépend de la densité locale et pas de la taille du monde.
+    Les objets sont identifiés par un int (handle) fourni par l'utilisateur de la grille.
+    """
+
+    def __init__(self, cell_size: int):
+        """
+        :param cell_size: La taille d'une case en pixels (idéalement la taille d'un block du terrain)
+        """
+        assert cell_size > 0, "La taille d'une case doit être superieure à 0"
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], dict[int, None]] = {}
+        self.rects: dict[int, pygame.Rect] = {}
+        self.spans: dict[int, tuple[int, int, int, int]] = {}
+
+    def get_span(self, rect: pygame.Rect) -> tuple[int, int, int, int]:
+        """
+        Calcule les cases couvertes par un rect.
+
+        :param rect: Le rect
+        :return: Les indices (gauche, haut, droite, bas) des cases, bornes incluses
+        """
+        cs = self.cell_size
+        return rect.left // cs, rect.top // cs, (rect.right - 1) // cs, (rect.bottom - 1) // cs
+
+    def iter_cells(self, span: tuple[int, int, int, int]) -> Iterator[tuple[int, int]]:
+        for cy in range(span[1], span[3] + 1):
+            for cx in range(span[0], span[2] + 1):
+                yield cx, cy
+
+    def insert(self, handle: int, rect: pygame.Rect) -> None:
+        """
+        Ajoute une hitbox dans la grille.
+
+        :param handle: L'identifiant de l'objet
+        :param rect: Sa hitbox
+        """
+        span = self.get_span(rect)
+        self.rects[handle] = rect
+        self.spans[handle] = span
+        for cell in self.iter_cells(span):
+            self.cells.setdefault(cell, {})[handle] = None
+
+    def move(self, handle: int, rect: pygame.Rect) -> None:
+        """
+        Met à jour la hitbox d'un objet déjà présent. Les cases ne sont modifiées que si l'objet en a changé.
+
+        :param handle: L'identifiant de l'objet
+        :param rect: Sa nouvelle hitbox
+        """
+        span = self.get_span(rect)
+        old_span = self.spans.get(handle)
+        self.rects[handle] = rect
+        if span == old_span:
+            return
+        if old_span is not None:
+            self._unlink(handle, old_span)
+        self.spans[handle] = span
+        for cell in self.iter_cells(span):
+            self.cells.setdefault(cell, {})[handle] = None
+
+    def remove(self, handle: int) -> bool:
+        """
+        Supprime un objet de la grille.
+
+        :param handle: L'identifiant de l'objet
+        :return: True si l'objet était dans la grille sinon False
+        """
+        span = self.spans.pop(handle, None)
+        if span is None:
+            return False
+        self.rects.pop(handle)
+        self._unlink(handle, span)
+        return True
+
+    def _unlink(self, handle: int, span: tuple[int, int, int, int]) -> None:
+        for cell in self.iter_cells(span):
+            bucket = self.cells.get(cell)
+            if bucket is None:
+                continue
+            bucket.pop(handle, None)
+            if not bucket:
+                del self.cells[cell]
+
+    def query(self, rect: pygame.Rect) -> list[int]:
+        """
+        Cherche les objets dont la hitbox touche le rect donné.
+
+        :param rect: Le rect qu'on veut vérifier
+        :return: Les identifiants triés dans l'ordre croissant (donc l'ordre d'ajout si les handles sont croissants)
+        """
+        found = set()
+        rects = self.rects
+        for cell in self.iter_cells(self.get_span(rect)):
+            bucket = self.cells.get(cell)
+            if bucket is None:
+                continue
+            for handle in bucket:
+                if handle not in found and rect.colliderect(rects[handle]):
+                    found.add(handle)
+        return sorted(found)
+
+    def clear(self) -> None:
+        self.cells.clear()
+        self.rects.clear()
+        self.spans.clear()
+
+    def __len__(self) -> int:
+        return len(self.rects)
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+
+import pygame
+
+from GameManager.locals import ROTATION_STEP, ROTATION_CACHE_BYTES
+
+
+def get_surface_bytes(surface: pygame.Surface) -> int:
+    """
+    :return: La mémoire occupée par les pixels de la surface, en octets
+    """
+    return surface.get_height() * surface.get_pitch()
+
+
+class RotationCache:
+    """
+    Garde les images tournées déjà calculées, par image source et par angle arrondi à step degrés près.
+    Une image source doit être utilisée telle quelle (jamais modifiée sur place) tant qu'elle est dans le cache,
+    et les images renvoyées sont partagées : il ne faut pas dessiner dessus.
+    Quand la mémoire des images gardées dépasse max_bytes, les moins récemment utilisées sont oubliées.
+    """
+
+    def __init__(self, max_bytes: int = ROTATION_CACHE_BYTES, step: float = ROTATION_STEP):
+        """
+        :param max_bytes: La mémoire maximale gardée par le cache, en octets
+        :param step: La précision des angles en degrés
+        """
+        assert step > 0, "Le pas des angles doit être superieur à 0"
+        self.max_bytes = max_bytes
+        self.step = step
+        # (id de la source, angle) -> (source, image tournée). Garder la source empêche que son id soit réutilisé
+        self.surfaces: OrderedDict[tuple[int, float], tuple[pygame.Surface, pygame.Surface]] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def quantize(self, angle: float) -> float:
+        """
+        :param angle: Un angle en degrés
+        :return: L'angle arrondi au pas du cache, entre 0 et 360
+        """
+        return round(angle / self.step) * self.step % 360
+
+    def rotate(self, surface: pygame.Surface, angle: float) -> pygame.Surface:
+        """
+        Équivalent de pygame.transform.rotate qui réutilise l'image si elle a déjà été tournée de cet angle.
+
+        :param surface: L'image source
+        :param angle: L'angle en degrés
+        :return: L'image tournée (partagée)
+        """
+        angle = self.quantize(angle)
+        key = id(surface), angle
+        entry = self.surfaces.get(key)
+        if entry is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        rotated = pygame.transform.rotate(surface, angle)
+        size = get_surface_bytes(rotated)
+        if size > self.max_bytes:
+            return rotated
+        self.surfaces[key] = surface, rotated
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, old) = self.surfaces.popitem(last=False)
+            self.bytes -= get_surface_bytes(old)
+        return rotated
+
+    def clear(self) -> None:
+        self.surfaces.clear()
+        self.bytes = 0
+
+    def get_stats(self) -> dict[str, float]:
+        """
+        :return: Le nombre de hits, de misses, le taux de hit, le nombre d'images gardées et la mémoire utilisée
+        """
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.,
+                "size": len(self.surfaces), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+# le cache partagé par tous les GameObject et les Animator
+rotation_cache = RotationCache()
@@ -6,6 +6,8 @@ from pygame.sprite import Sprite
 import math
 from GameManager.funcs import rad2deg, tuple2Vec2, is_included
 import GameManager.singleton as sing
+from GameManager.surface_cache import rotation_cache
+from GameManager.locals import DEFAULT_Z_LAYER
 
 
 class SurfaceModifier:
@@ -25,6 +27,8 @@ class SurfaceModifier:
         self.g = g
         self.b = b
         self.a = a
+        # augmente à chaque modification, pour que les images déjà combinées sachent qu'elles ne sont plus à jour
+        self.version = 0
         self.correction()
 
     def to_tuple(self) -> tuple[int, int, int, int]:
@@ -43,6 +47,7 @@ class SurfaceModifier:
         :param value: La valeur que l'utilisateur souhaite mettre.
         """
         self.r = self.g = self.b = value
+        self.version += 1
 
     def add_rgb(self, value: Union[int, float]) -> None:
         """
@@ -53,6 +58,7 @@ class SurfaceModifier:
         self.r += value
         self.g += value
         self.b += value
+        self.version += 1
 
     def set_alpha(self, value: int) -> None:
         """
@@ -61,6 +67,7 @@ class SurfaceModifier:
         :param value: La valeur que l'utilisateur souhaite mettre.
         """
         self.a = value
+        self.version += 1
 
     def add_alpha(self, value: Union[int, float]) -> None:
         """
@@ -69,6 +76,7 @@ class SurfaceModifier:
         :param value: La valeur que l'utilisateur souhaite ajouter.
         """
         self.a += value
+        self.version += 1
 
     def correction(self) -> None:
         """
@@ -86,6 +94,11 @@ class GameObject(Sprite):
     """
     La base de tous les objets utilisables dans le jeu.
     """
+    # Un objet statique ne bouge jamais une fois sa hitbox enregistrée dans la grille de collision
+    static_collision = False
+    # Si False, get_real_pos de cet objet dépend d'autre chose que pos et rotation (par exemple la taille de l'image
+    # pour les UI) : ses enfants ne gardent pas leur position réelle en cache
+    cache_transform = True
 
     def __init__(self, pos: Vector2, rotation: float, image: pygame.Surface, name: str, enabled=True,
                  parent=None, alpha=255, tags: Optional[list[str]] = None, simple_mouse_up=False):
@@ -99,15 +112,23 @@ class GameObject(Sprite):
         """
 
         super().__init__()
+        # position réelle gardée en cache, None quand l'objet ou un de ses parents a bougé depuis le dernier calcul
+        self.real_pos: Optional[Vector2] = None
+        # position avant le dernier pas de simulation fixe (gardée par GameRoot pour les objets de game_objects)
+        self.previous_pos: Optional[Vector2] = None
+        self.children: ChildrenHolder[str, GameObject] = ChildrenHolder(self)
+        self.__dict__["z_layer"] = DEFAULT_Z_LAYER
         self.pos = pos
         self.rotation = rotation
         self.image: pygame.Surface = image
-        self.copy_img: pygame.Surface = self.image.copy()
+        # l'image source des rotations, partagée (jamais modifiée) pour que rotation_cache serve à tous les objets
+        self.copy_img: pygame.Surface = self.image
         self.rect: pygame.Rect = self.image.get_rect(center=(self.pos.x, self.pos.y))
-        self.children: ChildrenHolder[str, GameObject] = ChildrenHolder(self)
         self.name: str = name
         self.parent: Union[GameObject, None] = parent
         self.surf_mult: SurfaceModifier = SurfaceModifier(255, 255, 255, alpha)
+        # dernière image combinée par alpha_converted : (image, modificateur, version du modificateur, résultat)
+        self.tinted: Optional[tuple[pygame.Surface, SurfaceModifier, int, pygame.Surface]] = None
         self.enabled = enabled
         self.tags = [] if tags is None else tags
         self.simple_mouseup = simple_mouse_up
@@ -115,9 +136,67 @@ class GameObject(Sprite):
         self.last_early_update, self.last_update = 0, 0
 
         self.mouse_in_rect = False
+        self.collision_handle: Optional[int] = None
+        self.collision_mask = 0
 
         self.rotate(rotation, False)
 
+    @property
+    def pos(self) -> Vector2:
+        """
+        La position relative au parent. Il faut la modifier avec translate ou en la remplaçant (pas avec pos.x = ...)
+        pour que la position réelle des enfants soit recalculée.
+        """
+        return self.__dict__["pos"]
+
+    @pos.setter
+    def pos(self, value: Vector2) -> None:
+        self.__dict__["pos"] = value
+        self.invalidate_real_pos()
+
+    @property
+    def rotation(self) -> float:
+        return self.__dict__["rotation"]
+
+    @rotation.setter
+    def rotation(self, value: float) -> None:
+        self.__dict__["rotation"] = value
+        self.invalidate_real_pos()
+
+    @property
+    def z_layer(self) -> int:
+        """
+        La couche d'affichage : les objets d'une couche plus haute sont affichés par-dessus, ceux d'une même couche
+        dans l'ordre où ils ont été ajoutés au jeu.
+        """
+        return self.__dict__["z_layer"]
+
+    @z_layer.setter
+    def z_layer(self, value: int) -> None:
+        old = self.__dict__["z_layer"]
+        self.__dict__["z_layer"] = value
+        if old != value and sing.ROOT is not None:
+            sing.ROOT.render_queue.change_layer(self, old)
+
+    @property
+    def parent(self) -> Optional["GameObject"]:
+        return self.__dict__.get("parent")
+
+    @parent.setter
+    def parent(self, value: Optional["GameObject"]) -> None:
+        self.__dict__["parent"] = value
+        self.invalidate_real_pos()
+
+    def invalidate_real_pos(self) -> None:
+        """
+        Oublie la position réelle gardée en cache de l'objet et de tous ses enfants.
+        """
+        self.real_pos = None
+        for child in self.children.values():
+            # un enfant déjà invalidé a déjà des enfants invalidés
+            if child.real_pos is not None:
+                child.invalidate_real_pos()
+
     def blit(self, screen: pygame.Surface, apply_alpha=True) -> None:
         """
         Affiche l'objet sur la fenêtre.
@@ -158,6 +237,8 @@ class GameObject(Sprite):
         else:
             self.pos = movement
         self.rect = self.image.get_rect(center=(self.pos.x, self.pos.y))
+        if self.collision_handle is not None and not self.static_collision:
+            sing.ROOT.mark_collidable_moved(self)
 
     def rotate(self, rotation: float, additive=True) -> None:
         """
@@ -176,10 +257,12 @@ class GameObject(Sprite):
         else:
             self.rotation = rotation
         self.rotation %= math.pi * 2
-        rotated = pygame.transform.rotate(self.copy_img, rad2deg(self.rotation))
+        rotated = rotation_cache.rotate(self.copy_img, rad2deg(self.rotation))
         rct = rotated.get_rect(center=b4_rct.center)
         self.image = rotated
         self.rect = rct
+        if self.collision_handle is not None and not self.static_collision:
+            sing.ROOT.mark_collidable_moved(self)
 
         for child in self.children.values():
             child.rotate(rotation, additive)
@@ -192,7 +275,7 @@ class GameObject(Sprite):
             self.early_update_done = False
         if self.early_update_done:
             return
-        if is_included(tuple2Vec2(pygame.mouse.get_pos()), self.image.get_rect(center=self.get_screen_pos())):
+        if is_included(tuple2Vec2(sing.ROOT.input.get_mouse_pos()), self.image.get_rect(center=self.get_screen_pos())):
             if not self.mouse_in_rect:
                 self.on_mouse_rect_enter()
                 self.mouse_in_rect = True
@@ -241,19 +324,19 @@ class GameObject(Sprite):
         parent de l'objet mais cette fonction permet de savoir la position absolue en tenant compte la rotation de
         son parent, position relative, etc...
 
+        La position est gardée en cache jusqu'à ce que l'objet ou un de ses parents soit déplacé ou tourné : une
+        hiérarchie comme Player → hands → right_hand → item n'est calculée qu'une fois par frame.
+
         :return: self.pos si l'objet n'a pas de parent, sinon sa position absolue.
         """
-
-        if self.parent is None:
+        parent = self.parent
+        if parent is None:
             return self.pos.copy()
-        else:
-            par_pos = self.parent.get_real_pos()
-            rel_pos = self.pos + par_pos
-            prot = self.parent.rotation
-
-            vec = Vector2(rel_pos.x - par_pos.x, rel_pos.y - par_pos.y)
-            vec.rotate_rad_ip(-prot)
-            return par_pos + vec
+        if self.real_pos is None or not parent.cache_transform:
+            vec = self.pos.rotate_rad(-parent.rotation)
+            vec += parent.get_real_pos()
+            self.real_pos = vec
+        return self.real_pos.copy()
 
     def get_screen_pos(self) -> Vector2:
         """
@@ -262,16 +345,47 @@ class GameObject(Sprite):
         :return: La position.
         """
         rp = self.get_real_pos()
+        if sing.ROOT.render_alpha is not None:
+            rp += self.get_render_offset(sing.ROOT.render_alpha)
         return rp + tuple2Vec2(sing.ROOT.screen_dim) / 2 - sing.ROOT.camera_pos
 
+    def get_render_offset(self, alpha: float) -> Vector2:
+        """
+        Le décalage à appliquer à l'affichage pour interpoler entre deux pas de simulation fixes : l'objet suit le
+        déplacement de son ancêtre dans game_objects pendant le dernier pas.
+
+        :param alpha: La position dans l'intervalle entre les deux derniers pas (0 avant, 1 après)
+        :return: Le décalage
+        """
+        top = self
+        while top.parent is not None:
+            top = top.parent
+        if top.previous_pos is None:
+            return Vector2()
+        return (top.previous_pos - top.pos) * (1 - alpha)
+
     def alpha_converted(self) -> pygame.Surface:
         """
-        Permet de générer l'image combiné avec self.surf_mult
+        Permet de générer l'image combiné avec self.surf_mult. Le résultat est gardé jusqu'à ce que self.image ou
+        self.surf_mult change : il ne faut pas dessiner dessus.
 
         :return: L'image avec transparence.
         """
-        tmp = self.image.copy()
-        tmp.fill(self.surf_mult.to_tuple(), None, pygame.BLEND_RGBA_MULT)
+        mult = self.surf_mult
+        tinted = self.tinted
+        if tinted is not None and tinted[0] is self.image and tinted[1] is mult and tinted[2] == mult.version:
+            return tinted[3]
+        r, g, b, a = mult.to_tuple()
+        if (r, g, b) != (255, 255, 255):
+            tmp = self.image.copy()
+            tmp.fill((r, g, b, a), None, pygame.BLEND_RGBA_MULT)
+        elif a != 255:
+            # seulement de la transparence : l'alpha de la surface suffit, pas besoin de recalculer chaque pixel
+            tmp = self.image.copy()
+            tmp.set_alpha(a)
+        else:
+            tmp = self.image
+        self.tinted = self.image, mult, mult.version, tmp
         return tmp
 
     def on_mouse_down(self, button: int):
@@ -286,6 +400,46 @@ class GameObject(Sprite):
     def on_mouse_rect_exit(self):
         pass
 
+    def get_trace_state(self) -> bytes:
+        """
+        Renvoie l'état de l'objet qui n'est pas dans sa position ni sa rotation (vie, tableaux, ...), pour la somme de
+        contrôle de GameRoot.get_state_checksum qui vérifie qu'un replay est identique à l'enregistrement.
+
+        :return: L'état en octets
+        """
+        return b""
+
+    def get_render_state(self) -> tuple:
+        """
+        Renvoie un tuple qui résume ce qui est affiché par l'objet et ses enfants. Utilisé par le mode de rendu
+        partiel de GameRoot: si le tuple change d'une frame à l'autre, la zone de l'objet est redessinée.
+        Les objets qui dessinent autre chose que self.image doivent surcharger cette fonction.
+
+        :return: Le tuple
+        """
+        if not self.enabled:
+            return False,
+        pos = self.get_screen_pos()
+        return (True, self.image, pos.x, pos.y, self.surf_mult.to_tuple(),
+                tuple(child.get_render_state() for child in self.children.values()))
+
+    def get_render_rect(self) -> pygame.Rect:
+        """
+        Renvoie la zone de l'écran couverte par l'objet et ses enfants.
+
+        :return: Le rect sur l'écran
+        """
+        rect = self.image.get_rect(center=self.get_screen_pos())
+        for child in self.children.values():
+            child_rect = child.get_render_rect()
+            if child_rect.width == 0 or child_rect.height == 0:
+                continue
+            if rect.width == 0 or rect.height == 0:
+                rect = child_rect
+            else:
+                rect.union_ip(child_rect)
+        return rect
+
     def get_collision_rect(self) -> pygame.Rect:
         return self.image.get_rect(center=self.get_real_pos())
 
@@ -0,0 +1,323 @@
+"""
+Petits benchmarks pour comparer les performances de certaines parties du jeu.
+
+Les scénarios de jeu (terrain, zombies, blocks) tournent sans fenêtre (GameRoot headless), avec une graine et un
+delta fixes : deux lancements simulent exactement la même partie et leurs résultats peuvent être comparés. Avec
+--render, chaque tick des scénarios zombies et blocks est aussi dessiné (sur la surface d'affichage headless).
+
+Utilisation : python benchmark.py [pathfinding|terrain|zombies|blocks ...] [--seed S] [--ticks N] [--alloc]
+    [--render] [--json fichier]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from queue import PriorityQueue
+from typing import Callable, Optional
+
+import pygame
+from pygame.math import Vector2
+
+import GameExtensions.inventory as inv
+from GameExtensions.generate_terrain import Terrain, RenderOverTerrain
+from GameExtensions.player import Player
+from GameExtensions.navigation import NavigationManager
+from GameExtensions.enemy_system import EnemySystem
+from GameExtensions.field_objects import Core, WoodBlock
+from GameExtensions.locals import DIRS, FONT_SIZE, ITEM_FONT_NAME, S, PATH_BUDGET_MS
+from GameExtensions.UI import HPBar
+from GameExtensions.util import find_path
+from GameManager.locals import SIM_STEP
+from GameManager.MainLoopManager import GameRoot
+from GameManager.resources import load_font, load_img
+from GameManager.util import GameObject
+
+# le nombre de chemins calculés par tick par le NavigationManager (au lieu d'un budget en temps, pour que les
+# scénarios ne dépendent pas de la vitesse de la machine)
+ROUTES_PER_TICK = 4
+
+
+class LegacyPath:
+    """
+    Copie de l'ancienne classe Path (un chemin complet par noeud de la recherche)
+    """
+
+    def __init__(self, coords: list[Vector2], cost=0):
+        self.coords: list[Vector2] = coords
+        self.cost = cost
+
+    def copy(self):
+        return LegacyPath(self.coords.copy(), self.cost)
+
+    def __lt__(self, other):
+        return self.cost < other.cost
+
+
+def legacy_path2target(ter: list[list],
+                       current_pos: Vector2,
+                       target_x: Optional[int],
+                       target_y: Optional[int],
+                       chunk_limit: Optional[pygame.Rect] = None,
+                       iter_limit: int = 12) -> list[Vector2]:
+    """
+    Copie de l'ancien get_path2target (la grille est passée en paramètre et la file vide est gérée)
+    """
+    queue: PriorityQueue[LegacyPath] = PriorityQueue()
+    queue.put(LegacyPath([current_pos.copy()]))
+    counter = 0
+
+    cur = None
+    while not queue.empty():
+        cur = queue.get()
+        if counter > iter_limit:
+            return cur.coords
+        if (target_x is None or target_y is None) and (cur.coords[-1].x == target_x or cur.coords[-1].y == target_y):
+            return cur.coords
+        elif cur.coords[-1].x == target_x and cur.coords[-1].y == target_y:
+            return cur.coords
+
+        for d in DIRS:
+            nxt = Vector2(cur.coords[-1].x + d[0], cur.coords[-1].y + d[1])
+            if chunk_limit is not None:
+                if (not chunk_limit.topleft[0] <= nxt.x <= chunk_limit.bottomright[0]) or \
+                        (not chunk_limit.topleft[1] <= nxt.y <= chunk_limit.bottomright[1]) or \
+                        ter[int(nxt.y)][int(nxt.x)] is not None or \
+                        nxt in cur.coords:
+                    continue
+
+            new_path = cur.copy()
+            new_path.coords.append(nxt)
+            new_path.cost = (len(new_path.coords) + (((target_x - nxt.x) if target_x is not None else 0) ** 2 +
+                                                     ((target_y - nxt.y) if target_y is not None else 0) ** 2))
+            queue.put(new_path)
+        counter += 1
+    return cur.coords
+
+
+def make_grid(size: int, density: float, seed: int) -> list[list]:
+    """
+    Crée une grille aléatoire (comme over_terrain) avec une proportion density d'obstacles
+    """
+    rand = random.Random(seed)
+    return [[object() if rand.random() < density else None for _ in range(size)] for _ in range(size)]
+
+
+def bench_pathfinding(size=150, density=0.15, queries=200, seed=1) -> None:
+    """
+    Compare l'ancien A* (avec sa limite de 12 itérations et une limite plus grande) avec find_path
+    """
+    grid = make_grid(size, density, seed)
+    rand = random.Random(seed)
+    limit = pygame.Rect(0, 0, size - 1, size - 1)
+    pairs = []
+    while len(pairs) < queries:
+        start = rand.randrange(size), rand.randrange(size)
+        goal = rand.randrange(size), rand.randrange(size)
+        if grid[start[1]][start[0]] is None and abs(start[0] - goal[0]) + abs(start[1] - goal[1]) < 60:
+            pairs.append((start, goal))
+
+    def run(name, func):
+        reached = 0
+        t = time.perf_counter()
+        for start, goal in pairs:
+            path = func(start, goal)
+            reached += tuple(path[-1]) == goal
+        dt = time.perf_counter() - t
+        print(f"{name:<24} {dt / len(pairs) * 1000:8.3f} ms/chemin   goal atteint: {reached}/{len(pairs)}")
+
+    print(f"Pathfinding : grille {size}x{size}, {density:.0%} d'obstacles, {queries} chemins")
+    for it in (12, 100):
+        run(f"ancien (iter_limit={it})",
+            lambda s, g: legacy_path2target(grid, Vector2(s), g[0], g[1], limit, it))
+    run("find_path", lambda s, g: find_path(grid, s, g[0], g[1]))
+
+
+def make_root() -> GameRoot:
+    """
+    Crée un GameRoot headless avec les polices utilisées par le jeu
+    """
+    root = GameRoot((720, 480), (30, 30, 30), "benchmark", os.path.dirname(os.path.realpath(__file__)), Vector2(),
+                    headless=True)
+    load_font("resources/fonts/square-deal.ttf", 30, True, "title_font")
+    load_font("resources/fonts/square-deal.ttf", 20, True, "menu_font")
+    load_font("resources/fonts/arcade.ttf", 24, True, "arcade_font")
+    load_font("resources/test/fonts/square-deal.ttf", FONT_SIZE, global_font=True, name=ITEM_FONT_NAME)
+    return root
+
+
+def make_terrain(seed: int) -> Terrain:
+    """
+    Génère le terrain d'une partie, avec les mêmes paramètres que main.py
+    """
+    bs = 32
+    biomes = [load_img("resources/environment/terrain/dark_grass.png", (bs, bs)),
+              load_img("resources/environment/terrain/grass.png", (bs, bs))]
+    return Terrain(seed, (150, 150), biomes, bs, forest_density_scale=1100, forest_size_scale=2000,
+                   tree_dens_lim=0.7)
+
+
+def make_world(seed: int, zombies: int, spread: int = 1500, max_routes: Optional[int] = ROUTES_PER_TICK,
+               budget_ms: float = PATH_BUDGET_MS) -> GameRoot:
+    """
+    Crée une partie comme GameLoader (terrain, inventaire, joueur, core, navigation, barre de vie) avec des zombies
+    placés au hasard
+
+    :param seed: La graine du terrain et du placement des zombies
+    :param zombies: Le nombre de zombies
+    :param spread: La distance maximale (en pixels, sur chaque axe) entre un zombie et le centre de la carte
+    :param max_routes: Le nombre de chemins calculés par tick (None pour le budget en temps du jeu)
+    :param budget_ms: Le budget en temps des chemins quand max_routes est None
+    :return: Le GameRoot
+    """
+    random.seed(seed)
+    root = make_root()
+    inventory = inv.Inventory((8, 6), Vector2(40, 40), load_img("resources/UI/inventory.png"),
+                              load_img("resources/UI/hotbar.png"), load_img("resources/UI/crafting_space.png"),
+                              load_img("resources/UI/selected_item.png"), "inventory",
+                              root.global_fonts[ITEM_FONT_NAME])
+    root.add_gameObject(make_terrain(seed), inventory, immediate=True) \
+        .add_gameObject(Player(Vector2(-80, 80), 0, "player"), immediate=True) \
+        .add_gameObject(RenderOverTerrain(), immediate=True) \
+        .add_gameObject(Core(), immediate=True) \
+        .add_gameObject(NavigationManager(budget_ms=budget_ms, max_routes=max_routes), immediate=True)
+    system = EnemySystem()
+    root.add_gameObject(system, immediate=True)
+    root.game_objects.move_to_end("inventory")
+    root.add_gameObject(HPBar(Vector2(0, -20), S), immediate=True).add_collidable_object(root.game_objects["player"])
+    rand = random.Random(seed)
+    for i in range(zombies):
+        system.spawn(Vector2(rand.randint(-spread, spread), rand.randint(-spread, spread)), f"Zombie{i}")
+    return root
+
+
+class ScenarioScript(GameObject):
+    """
+    Appelle une fonction à chaque tick (avant les autres objets ajoutés après lui), pour scripter un scénario
+    """
+
+    def __init__(self, action: Callable[[int], None]):
+        """
+        :param action: La fonction, appelée avec le numéro du tick
+        """
+        super().__init__(Vector2(), 0, pygame.Surface((0, 0)), "scenario_script")
+        self.action = action
+        self.tick = 0
+
+    def update(self) -> None:
+        self.action(self.tick)
+        self.tick += 1
+
+
+def run_scenario(name: str, run: Callable[[], list[float]], trace_alloc=False) -> dict[str, float]:
+    """
+    Lance un scénario déjà préparé et affiche ses résultats
+
+    :param name: Le nom du scénario
+    :param run: La fonction qui lance le scénario et renvoie la durée de chaque tick en secondes
+    :param trace_alloc: Si True, la mémoire allouée est suivie avec tracemalloc (le scénario est alors plus lent)
+    :return: Le nombre de ticks par seconde, les durées médiane, au 99e centile et maximale (en millisecondes) d'un
+        tick, le nombre de blocs mémoire encore alloués à la fin et, avec trace_alloc, le pic et le reste de la
+        mémoire allouée pendant le scénario (en Ko)
+    """
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    if trace_alloc:
+        tracemalloc.start()
+    durations = run()
+    results = {}
+    if trace_alloc:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.update(alloc_peak_kb=peak / 1024, alloc_kept_kb=current / 1024)
+    gc.collect()
+    values = sorted(durations)
+    results = {"ticks": len(values), "ticks_per_s": len(values) / sum(values),
+               "p50_ms": 1000 * values[len(values) // 2],
+               "p99_ms": 1000 * values[min(len(values) - 1, int(len(values) * 0.99))],
+               "max_ms": 1000 * values[-1], "kept_blocks": sys.getallocatedblocks() - blocks, **results}
+    line = (f"{name:<10} {results['ticks']:5d} ticks  {results['ticks_per_s']:8.1f} ticks/s   "
+            f"p50 {results['p50_ms']:7.2f} ms   p99 {results['p99_ms']:7.2f} ms   max {results['max_ms']:7.2f} ms   "
+            f"blocs gardés {results['kept_blocks']:+d}")
+    if trace_alloc:
+        line += f"   pic {results['alloc_peak_kb']:.0f} Ko, gardé {results['alloc_kept_kb']:.0f} Ko"
+    print(line)
+    return results
+
+
+def scenario_terrain(seed: int, ticks: int) -> Callable[[], list[float]]:
+    """
+    Génération du terrain (un tick = une génération complète)
+    """
+    make_root()
+    ticks = max(1, ticks // 100)
+
+    def run():
+        durations = []
+        for _ in range(ticks):
+            start = time.perf_counter()
+            make_terrain(seed)
+            durations.append(time.perf_counter() - start)
+        return durations
+    return run
+
+
+def scenario_zombies(seed: int, ticks: int, zombies: int = 500, render: bool = False) -> Callable[[], list[float]]:
+    """
+    Zombies qui poursuivent le joueur et le core
+    """
+    root = make_world(seed, zombies)
+    return lambda: root.run_ticks(ticks, SIM_STEP, render)
+
+
+def scenario_blocks(seed: int, ticks: int, per_tick: int = 4, radius: int = 25,
+                    render: bool = False) -> Callable[[], list[float]]:
+    """
+    Des blocks posés à chaque tick autour du core (les champs de directions et le graphe de navigation sont
+    recalculés), pendant que des zombies avancent
+    """
+    root = make_world(seed, 100)
+    rand = random.Random(seed)
+    terrain = root.game_objects["terrain"]
+
+    def place(_):
+        for _ in range(per_tick):
+            pos = Vector2(rand.randint(-radius, radius), rand.randint(-radius, radius)) * terrain.block_px_size
+            WoodBlock(pos).register()
+    root.add_gameObject(ScenarioScript(place), immediate=True)
+    return lambda: root.run_ticks(ticks, SIM_STEP, render)
+
+
+SCENARIOS = {"terrain": scenario_terrain, "zombies": scenario_zombies, "blocks": scenario_blocks}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks du jeu")
+    parser.add_argument("names", nargs="*", choices=["pathfinding", *SCENARIOS], default=[],
+                        help="les benchmarks à lancer (tous par défaut)")
+    parser.add_argument("--seed", type=int, default=1, help="la graine des scénarios")
+    parser.add_argument("--ticks", type=int, default=600, help="le nombre de ticks des scénarios")
+    parser.add_argument("--alloc", action="store_true", help="suivre la mémoire allouée avec tracemalloc")
+    parser.add_argument("--render", action="store_true", help="dessiner chaque tick des scénarios zombies et blocks")
+    parser.add_argument("--json", help="le fichier où écrire les résultats des scénarios")
+    args = parser.parse_args()
+    names = args.names or ["pathfinding", *SCENARIOS]
+
+    if "pathfinding" in names:
+        bench_pathfinding(seed=args.seed)
+    results = {}
+    for name in names:
+        if name in SCENARIOS:
+            options = {"render": True} if args.render and name != "terrain" else {}
+            results[name] = run_scenario(name, SCENARIOS[name](args.seed, args.ticks, **options), args.alloc)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"seed": args.seed, "ticks": args.ticks, "delta": SIM_STEP, "render": args.render,
+                       "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,16 +6,19 @@ from GameExtensions.UI import *
 from GameExtensions.generate_terrain import Terrain, RenderOverTerrain
 from GameExtensions.player import Player
 from GameExtensions.enemy import Zombie
+from GameExtensions.navigation import NavigationManager
+from GameExtensions.enemy_system import EnemySystem
 from GameExtensions.items import *
 from GameExtensions.field_objects import Core
 from GameExtensions.locals import *
 from GameManager.MainLoopManager import GameRoot
 from GameManager.resources import *
 from GameManager.util import GameObject
-from GameManager.locals import VOLUME
+from GameManager.locals import VOLUME, IMAGE_MANIFEST, SIM_STEP
 
+# --headless (avec --replay) : pas de fenêtre, voir la fin du fichier
 root = GameRoot((720, 480), (30, 30, 30), "Defend the cube!", os.path.dirname(os.path.realpath(__file__)),
-                Vector2(), 1000)
+                Vector2(), 1000, fixed_step=SIM_STEP, headless="--headless" in sys.argv)
 
 
 class Timer(TextLabel):
@@ -47,8 +50,12 @@ class EnemySpawner(GameObject):
         if self.timer == 0:
             if random.random() <= (0.0003 * (self.game_time ** 2) + 6) / 100:
                 self.counter += 1
-                sing.ROOT.add_gameObject(Zombie(Vector2(random.randint(-1500, 1500), random.randint(-1500, 1500)),
-                                                f"Zombie{self.counter}"))
+                pos = Vector2(random.randint(-1500, 1500), random.randint(-1500, 1500))
+                enemy_system: Optional[EnemySystem] = sing.ROOT.game_objects.get("enemy_system")
+                if enemy_system is not None:
+                    enemy_system.spawn(pos, f"Zombie{self.counter}")
+                else:
+                    sing.ROOT.add_gameObject(Zombie(pos, f"Zombie{self.counter}"))
             self.timer = 2
 
 
@@ -95,13 +102,16 @@ class GameLoader(GameObject):
         root.add_gameObject(TextLabel(Vector2(0, -25), 0, root.global_fonts["menu_font"], "Loading...", (200, 200, 200),
                                       "loading_label", anchor=S),
                             TextLabel(Vector2(0, -50), 0, root.global_fonts["menu_font"], "Generating terrain...",
-                                      (200, 200, 200), "state_label", anchor=S))
+                                      (200, 200, 200), "state_label", anchor=S), immediate=True)
         self.ter: Optional[Terrain] = None
 
-        ter_gen_th = threading.Thread(target=self.generate_ter)
-        ter_gen_th.start()
+        self.ter_gen_th = threading.Thread(target=self.generate_ter)
+        self.ter_gen_th.start()
 
     def early_update(self) -> None:
+        if self.ter is None and root.input.deterministic:
+            # partie enregistrée ou rejouée : on attend le terrain pour que la partie commence au même pas
+            self.ter_gen_th.join()
         if self.ter is not None:
             # region Generate objects
             lb: TextLabel = root.game_objects["state_label"]
@@ -123,10 +133,16 @@ class GameLoader(GameObject):
                 .add_gameObject(Player(Vector2(-80, 80), 0, "player"), immediate=True) \
                 .add_gameObject(RenderOverTerrain(), immediate=True) \
                 .add_gameObject(Core(), immediate=True) \
+                .add_gameObject(NavigationManager(), immediate=True) \
                 .game_objects.move_to_end("inventory")
+            if sing.ROOT.parameters.get(ENEMY_SYSTEM, True):
+                root.add_gameObject(EnemySystem(), immediate=True)
+                root.game_objects.move_to_end("inventory")
 
             if "FPS_LABEL" not in sing.ROOT.parameters or sing.ROOT.parameters["FPS_LABEL"]:
                 root.add_gameObject(FPS_Label(Vector2(50, 20)))
+            if root.profiler.enabled:
+                root.add_gameObject(ProfilerOverlay(Vector2(10, 60)))
 
             root.add_gameObject(HPBar(Vector2(0, -20), S), immediate=True) \
                 .add_collidable_object(root.game_objects["player"])
@@ -157,16 +173,61 @@ class GameLoader(GameObject):
             seed = SEED
         else:
             seed = int(sing.ROOT.parameters[CUST_SEED])
-        ter = Terrain(seed, (150, 150), biomes, bs, forest_density_scale=1100, forest_size_scale=2000, tree_dens_lim=0.7)
+        if sing.ROOT.parameters.get(INF_WORLD, False):
+            # la carte est générée par tronçons pendant la partie
+            ter = Terrain(seed, INF_WORLD_SIZE, biomes, bs, forest_density_scale=1100, forest_size_scale=2000,
+                          tree_dens_lim=0.7, streamed=True)
+        else:
+            ter = Terrain(seed, (150, 150), biomes, bs, forest_density_scale=1100, forest_size_scale=2000,
+                          tree_dens_lim=0.7)
         self.ter = ter
 
 
-def start_game():
+# le fichier où enregistrer la partie (--record), None si elle n'est pas enregistrée
+RECORD_FILE: Optional[str] = None
+
+
+def get_game_settings() -> dict:
+    """
+    :return: Les paramètres du menu qui changent la partie, gardés dans les enregistrements
+    """
+    return {key: sing.ROOT.parameters.get(key, default)
+            for key, default in ((RAND_SEED, True), (CUST_SEED, "123"), (INF_WORLD, False), (ENEMY_SYSTEM, True))}
+
+
+def load_game():
     root.clear_objects()
     root.add_gameObject(GameLoader(), immediate=True)
 
 
+def start_game():
+    if RECORD_FILE is not None and root.input.recorder is None:
+        # l'enregistrement commence avec la partie, entre deux pas : le replay part du même état
+        root.call_before_next_step(start_recorded_game)
+    else:
+        load_game()
+
+
+def start_recorded_game():
+    root.input.start_recording(RECORD_FILE, metadata={"seed": SEED, "settings": get_game_settings()})
+    root.tick_count = 0
+    load_game()
+
+
+def start_replayed_game(settings: dict):
+    """
+    Commence la partie d'un enregistrement, sans passer par le menu
+
+    :param settings: Les paramètres de la partie enregistrée (get_game_settings)
+    """
+    for key, value in settings.items():
+        root.set_parameter(key, value)
+    root.tick_count = 0
+    load_game()
+
+
 def main(settings_param=None):
+    preload_images(IMAGE_MANIFEST)
     load_font("resources/fonts/square-deal.ttf", 30, True, "title_font")
     load_font("resources/fonts/square-deal.ttf", 20, True, "menu_font")
     load_font("resources/fonts/arcade.ttf", 24, True, "arcade_font")
@@ -193,6 +254,9 @@ def main(settings_param=None):
                           anchor=CENTER, on_click_sound=btn_sound)
 
     def quit_game():
+        # comme la fermeture de la fenêtre (GameRoot.mainloop) : les mesures de --profile sont écrites
+        root.profiler.on_exit()
+        root.input.stop_recording()
         pygame.quit()
         sys.exit(0)
 
@@ -259,6 +323,26 @@ def main(settings_param=None):
                           "seed_bool_check", on_check_func=on_check,
                           anchor=N, default_state=randomize)
 
+    inf_world_label = TextLabel(Vector2(-160, 265), 0, sing.ROOT.global_fonts["menu_font"], "Infinite world",
+                                (190, 190, 190), "inf_world_label", anchor=N)
+
+    inf_world = False if settings_param is None else settings_param[INF_WORLD]
+    sing.ROOT.set_parameter(INF_WORLD, inf_world)
+    inf_world_check = CheckBox(Vector2(0, 265), load_img("resources/UI/check_box.png"),
+                               load_img("resources/UI/check_mark.png"), "inf_world_check",
+                               on_check_func=lambda b: sing.ROOT.set_parameter(INF_WORLD, b), anchor=N,
+                               default_state=inf_world)
+
+    enemy_system_label = TextLabel(Vector2(-160, 305), 0, sing.ROOT.global_fonts["menu_font"], "Enemy system",
+                                   (190, 190, 190), "enemy_system_label", anchor=N)
+
+    enemy_system = True if settings_param is None else settings_param[ENEMY_SYSTEM]
+    sing.ROOT.set_parameter(ENEMY_SYSTEM, enemy_system)
+    enemy_system_check = CheckBox(Vector2(0, 305), load_img("resources/UI/check_box.png"),
+                                  load_img("resources/UI/check_mark.png"), "enemy_system_check",
+                                  on_check_func=lambda b: sing.ROOT.set_parameter(ENEMY_SYSTEM, b), anchor=N,
+                                  default_state=enemy_system)
+
     back = Button(Vector2(0, 135), 0,
                   load_img("resources/UI/button.png", (60, 32)),
                   "back_btn", lambda: menu_manager.switch_menu("main_menu"), text="Back",
@@ -266,7 +350,9 @@ def main(settings_param=None):
                   anchor=CENTER, on_click_sound=btn_sound)
 
     settings.children.add_gameobjects(title_label, volume_label, volume_slider, fps_label, fps_check,
-                                      seed_bool_label, seed_check, seed_inp_label, seed_box, back)
+                                      seed_bool_label, seed_check, seed_inp_label, seed_box,
+                                      inf_world_label, inf_world_check, enemy_system_label, enemy_system_check,
+                                      back)
 
     # endregion
 
@@ -278,4 +364,19 @@ def main(settings_param=None):
 
 
 if __name__ == "__main__":
+    # python main.py --profile [mesures.csv|mesures.json] : mesure chaque frame, les affiche pendant la partie et les
+    # écrit dans le fichier en quittant
+    if "--profile" in sys.argv:
+        i = sys.argv.index("--profile")
+        root.profiler.enable(sys.argv[i + 1] if i + 1 < len(sys.argv) else None)
+    # python main.py --record partie.nsir : enregistre les entrées de la partie lancée depuis le menu (avec la graine
+    # du terrain et les paramètres de la partie)
+    # python main.py --replay partie.nsir [--headless] : la rejoue à l'identique avec les mêmes paramètres, sans
+    # fenêtre et aussi vite que possible avec --headless. Le résultat (identique ou pas) est affiché à la fin.
+    if "--record" in sys.argv:
+        RECORD_FILE = sys.argv[sys.argv.index("--record") + 1]
+    elif "--replay" in sys.argv:
+        replay_metadata = root.input.load_replay(sys.argv[sys.argv.index("--replay") + 1])
+        SEED = replay_metadata["seed"]
+        root.call_before_next_step(lambda: start_replayed_game(replay_metadata["settings"]))
     main()
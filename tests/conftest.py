@@ -0,0 +1,7 @@
+import os
+import sys
+
+# les tests tournent sans fenêtre ni son
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
@@ -0,0 +1,69 @@
+import pygame
+
+from GameManager.util import GameObject
+
+
+def make_object() -> GameObject:
+    # une image avec des couleurs et une transparence par pixel différentes
+    image = pygame.Surface((16, 16), pygame.SRCALPHA)
+    for x in range(16):
+        for y in range(16):
+            image.set_at((x, y), (x * 16, y * 16, 128, (x + y) * 8))
+    return GameObject(pygame.Vector2(), 0, image, "object")
+
+
+def get_reference(image: pygame.Surface, color: tuple[int, int, int, int]) -> pygame.Surface:
+    # le calcul d'origine : chaque pixel multiplié par la couleur
+    tmp = image.copy()
+    tmp.fill(color, None, pygame.BLEND_RGBA_MULT)
+    return tmp
+
+
+def blit_on(image: pygame.Surface) -> pygame.Surface:
+    screen = pygame.Surface((16, 16))
+    screen.fill((40, 90, 160))
+    screen.blit(image, (0, 0))
+    return screen
+
+
+def get_max_difference(a: pygame.Surface, b: pygame.Surface) -> int:
+    return max(abs(x - y) for x, y in zip(pygame.image.tobytes(a, "RGB"), pygame.image.tobytes(b, "RGB")))
+
+
+def test_identity_is_not_copied():
+    obj = make_object()
+    assert obj.alpha_converted() is obj.image
+
+
+def test_alpha_only_matches_multiply():
+    """
+    Seulement de la transparence : l'image garde ses pixels et utilise l'alpha de la surface, ce qui doit donner le
+    même affichage que la multiplication de chaque pixel
+    """
+    obj = make_object()
+    for alpha in (0, 1, 77, 128, 254):
+        obj.surf_mult.set_alpha(alpha)
+        converted = obj.alpha_converted()
+        assert converted is not obj.image and converted.get_alpha() == alpha
+        assert pygame.image.tobytes(converted, "RGBA") == pygame.image.tobytes(obj.image, "RGBA")
+        assert get_max_difference(blit_on(converted), blit_on(get_reference(obj.image, (255, 255, 255, alpha)))) <= 2
+    # l'image d'origine n'est jamais modifiée
+    assert obj.image.get_alpha() == 255
+    obj.surf_mult.set_alpha(255)
+    assert obj.alpha_converted() is obj.image
+
+
+def test_tint_and_cache():
+    obj = make_object()
+    obj.surf_mult.set_rgb(100)
+    obj.surf_mult.set_alpha(200)
+    converted = obj.alpha_converted()
+    reference = get_reference(obj.image, (100, 100, 100, 200))
+    assert pygame.image.tobytes(converted, "RGBA") == pygame.image.tobytes(reference, "RGBA")
+    # gardé tant que ni l'image ni le modificateur ne changent
+    assert obj.alpha_converted() is converted
+    obj.surf_mult.add_rgb(10)
+    assert obj.alpha_converted() is not converted
+    converted = obj.alpha_converted()
+    obj.image = obj.image.copy()
+    assert obj.alpha_converted() is not converted
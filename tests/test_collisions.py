@@ -0,0 +1,51 @@
+import random
+
+import pygame
+
+import benchmark
+from GameManager.util import GameObject
+
+
+def make_box(i: int) -> GameObject:
+    return GameObject(pygame.Vector2(i % 20 * 10, i // 20 * 10), 0, pygame.Surface((12, 12)), f"box{i}")
+
+
+def test_handles_stable_after_removals():
+    """
+    Les handles des objets restants ne changent pas quand d'autres sont supprimés, et un handle supprimé n'est
+    jamais redonné
+    """
+    root = benchmark.make_root()
+    rand = random.Random(1)
+    boxes = [make_box(i) for i in range(200)]
+    handles = {box: root.add_collidable_object(box) for box in boxes}
+    assert len(set(handles.values())) == len(boxes)
+    # le regex est mis en cache par handle : il ne doit pas garder les objets supprimés
+    root.collide_all(pygame.Rect(0, 0, 200, 100), r"box1")
+
+    removed = rand.sample(boxes, 120)
+    for box in removed:
+        assert root.remove_collidable_object(box)
+        assert box.collision_handle is None
+        assert not root.remove_collidable_object(box)
+    kept = [box for box in boxes if box not in removed]
+    for box in kept:
+        assert box.collision_handle == handles[box]
+        assert root.get_collidable(handles[box]) is box
+    for box in removed:
+        assert root.get_collidable(handles[box]) is None
+    assert all(set(results) <= {box.collision_handle for box in kept}
+               for results in root.exclude_results.values())
+
+    found = root.collide_all(pygame.Rect(-10, -10, 220, 220))
+    assert found == tuple(sorted(handles[box] for box in kept))
+
+    # un objet ajouté à nouveau reçoit un nouveau handle
+    new_handles = [root.add_collidable_object(box) for box in removed[:10]]
+    assert not set(new_handles) & set(handles.values())
+    assert [root.get_collidable(handle) for handle in new_handles] == removed[:10]
+    assert root.add_collidable_object(removed[0]) == new_handles[0]
+
+    root.clear_objects()
+    assert all(box.collision_handle is None for box in boxes)
+    assert root.add_collidable_object(boxes[0]) not in handles.values()
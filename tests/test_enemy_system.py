@@ -0,0 +1,47 @@
+import random
+
+import pygame
+
+import benchmark
+from GameManager.locals import SIM_STEP
+
+
+def get_colliding(system, rect: pygame.Rect) -> list[int]:
+    """
+    :return: Les handles des zombies en contact avec le rect, en regardant tous les zombies
+    """
+    rects = system.get_rects(system.positions[:system.count])
+    return sorted(int(system.handles[i]) for i, (left, top, right, bottom) in enumerate(rects.tolist())
+                  if left < rect.right and right > rect.left and top < rect.bottom and bottom > rect.top)
+
+
+def test_query_collisions_matches_full_scan():
+    """
+    L'index par case doit trouver les mêmes zombies que la vérification de tous les rects, y compris après que les
+    zombies ont bougé, sont morts ou ont été déplacés à la main
+    """
+    root = benchmark.make_world(3, 400, spread=600)
+    system = root.game_objects["enemy_system"]
+    rand = random.Random(3)
+
+    def check():
+        for _ in range(200):
+            size = rand.choice((1, 8, 40, 200, 3000))
+            rect = pygame.Rect(rand.randint(-700, 700), rand.randint(-700, 700), rand.randint(1, size),
+                               rand.randint(1, size))
+            assert sorted(system.query_collisions(rect)) == get_colliding(system, rect)
+        # rect posé exactement sur un zombie
+        x, y = system.positions[0]
+        rect = pygame.Rect(0, 0, 2, 2)
+        rect.center = round(x), round(y)
+        assert system.handles[0] in system.query_collisions(rect)
+
+    check()
+    root.run_ticks(30, SIM_STEP)
+    check()
+    system.enemies[0].pos = pygame.Vector2(-123.5, 87.25)
+    check()
+    for i in range(0, 100, 3):
+        system.enemies[i].hp = 0
+    root.run_ticks(1, SIM_STEP)
+    check()
@@ -0,0 +1,101 @@
+"""
+Le terrain généré doit rester celui de l'ancien create_terrain (avant la génération par tableaux numpy).
+
+data/terrain_reference.json a été produit par le create_terrain d'origine : une ligne de texte par rangée de cases
+("~" eau, "s" sable, sinon l'indice du biome) et d'objets ("T" arbre, "R" roche). L'ancien Voronoi gardait ses
+points dans un dictionnaire partagé par toutes les instances, il était vidé avant chaque carte (comme au lancement du
+jeu, où une seule carte est créée).
+"""
+import json
+import os
+import random
+
+import numpy as np
+import pytest
+
+import benchmark
+from GameExtensions.generate_terrain import Terrain
+from GameExtensions.resources import Resource, Tree
+from GameManager.resources import load_img
+import GameManager.singleton as sing
+
+with open(os.path.join(os.path.dirname(__file__), "data", "terrain_reference.json")) as f:
+    REFERENCE = json.load(f)
+
+
+def make_terrain(seed: int, size: tuple[int, int], options: dict) -> Terrain:
+    benchmark.make_root()
+    bs = 32
+    biomes = [load_img("resources/environment/terrain/dark_grass.png", (bs, bs)),
+              load_img("resources/environment/terrain/grass.png", (bs, bs))]
+    return Terrain(seed, size, biomes, bs, **options)
+
+
+def to_text(tiles: np.ndarray, trees: np.ndarray, rocks: np.ndarray) -> tuple[list[str], list[str]]:
+    """
+    :return: Les couches au format de terrain_reference.json
+    """
+    codes = {Terrain.WATER_CODE: "~", Terrain.SAND_CODE: "s"}
+    tile_lines = ["".join(codes.get(c, str(c)) for c in line) for line in tiles.tolist()]
+    objects = np.where(trees, "T", np.where(rocks, "R", "."))
+    return tile_lines, ["".join(line) for line in objects.tolist()]
+
+
+@pytest.mark.parametrize("case", REFERENCE, ids=lambda case: f"{case['seed']}-{case['size'][0]}x{case['size'][1]}")
+def test_generate_layers_matches_reference(case):
+    size = tuple(case["size"])
+    terrain = make_terrain(case["seed"], size, case["options"])
+    tiles, objects = to_text(*terrain.generate_layers(terrain.per, size))
+    assert tiles == case["tiles"]
+    assert objects == case["objects"]
+
+
+@pytest.mark.parametrize("case", REFERENCE, ids=lambda case: f"{case['seed']}-{case['size'][0]}x{case['size'][1]}")
+def test_generate_layers_by_pieces(case):
+    """
+    Les zones (utilisées par le mode streamed) doivent donner les mêmes cases que la carte entière
+    """
+    width, height = case["size"]
+    terrain = make_terrain(case["seed"], (width, height), case["options"])
+    n = 16
+    tiles, objects = [""] * height, [""] * height
+    for top in range(0, height, n):
+        for left in range(0, width, n):
+            piece_tiles, piece_objects = to_text(*terrain.generate_layers(terrain.per, (n, n), (left, top)))
+            for i, (line, obj_line) in enumerate(zip(piece_tiles, piece_objects)):
+                tiles[top + i] += line
+                objects[top + i] += obj_line
+    assert tiles == case["tiles"]
+    assert objects == case["objects"]
+
+
+def test_resource_sizes_use_terrain_rng():
+    """
+    Contrairement à l'ancien create_terrain, la taille des arbres et des roches (et les pommes) ne dépend plus de
+    l'état du module random mais seulement de la graine du monde : cette partie de la carte a changé.
+    """
+    case = next(case for case in REFERENCE if sum(line.count("T") for line in case["objects"]) > 10)
+
+    def get_resources(global_seed: int) -> list[tuple]:
+        random.seed(global_seed)
+        terrain = make_terrain(case["seed"], tuple(case["size"]), case["options"])
+        return [(obj.name, obj.image.get_size(), isinstance(obj, Tree) and obj.has_apple)
+                for line in terrain.over_terrain for obj in line if obj is not None]
+
+    resources = get_resources(0)
+    assert len({size for _, size, _ in resources}) > 1
+    assert get_resources(1) == resources
+
+
+def test_mined_chunk_is_kept():
+    """
+    Un tronçon dont une ressource a été minée ne doit plus être déchargé (mode streamed)
+    """
+    terrain = make_terrain(5, (256, 256), {"streamed": True, "stream_chunk_size": 16})
+    sing.ROOT.add_gameObject(terrain, immediate=True)
+    chunks = terrain.over_terrain.chunks
+    assert all(terrain.can_unload_chunk(key) for key in chunks)
+    obj = next(obj for line in chunks[next(iter(chunks))] for obj in line if obj is not None)
+    Resource.on_mine(obj)
+    key = obj.cell[0] // 16, obj.cell[1] // 16
+    assert [k for k in chunks if not terrain.can_unload_chunk(k)] == [key]
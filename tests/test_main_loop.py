@@ -0,0 +1,56 @@
+import pygame
+
+import benchmark
+import GameManager.singleton as sing
+from GameManager.locals import SIM_STEP
+from GameManager.util import GameObject
+
+
+class ClickCounter(GameObject):
+    def __init__(self):
+        super().__init__(pygame.Vector2(), 0, pygame.Surface((1, 1)), "counter")
+        self.clicks = 0
+        self.keys = []
+        self.steps = 0
+
+    def update(self) -> None:
+        super().update()
+        self.steps += 1
+        self.clicks += sing.ROOT.mouse_downs[0]
+        self.keys += sing.ROOT.key_downs
+
+
+def test_events_seen_by_one_step():
+    """
+    Une frame qui rattrape plusieurs pas ne doit donner ses événements qu'au premier
+    """
+    root = benchmark.make_root()
+    root.fixed_step = SIM_STEP
+    counter = ClickCounter()
+    root.add_gameObject(counter, immediate=True)
+
+    root.accumulator = 2.5 * SIM_STEP
+    root.mouse_downs[0] = True
+    root.key_downs.append(pygame.K_e)
+    assert root.simulate_frame()
+    assert counter.steps == 2
+    assert counter.clicks == 1
+    assert counter.keys == [pygame.K_e]
+
+
+def test_events_kept_until_next_step():
+    """
+    Une frame trop courte pour faire un pas garde ses événements pour la frame suivante
+    """
+    root = benchmark.make_root()
+    root.fixed_step = SIM_STEP
+    counter = ClickCounter()
+    root.add_gameObject(counter, immediate=True)
+
+    root.accumulator = 0.5 * SIM_STEP
+    root.mouse_downs[0] = True
+    root.simulate_frame()
+    assert counter.steps == 0 and not root.inputs_consumed
+    root.accumulator += SIM_STEP
+    root.simulate_frame()
+    assert counter.steps == 1 and counter.clicks == 1
@@ -0,0 +1,174 @@
+import random
+
+import numpy as np
+import pytest
+
+import benchmark
+from GameExtensions.navigation import ChunkGraph, FlowField, get_grid_distances, get_grid_distances_many
+from GameManager.locals import SIM_STEP
+
+
+@pytest.fixture
+def graph() -> ChunkGraph:
+    root = benchmark.make_world(1, 0)
+    return ChunkGraph(root.game_objects["terrain"])
+
+
+def get_reference(graph: ChunkGraph, cell: tuple[int, int]) -> dict[tuple[int, int], float]:
+    """
+    :return: Le coût vers les entrées du chunk, avec une recherche depuis la case
+    """
+    key = graph.get_chunk(cell)
+    blocked, weights, width = graph.get_window(key)
+    left, top = key[0] * graph.chunk_size, key[1] * graph.chunk_size
+    dist = get_grid_distances(blocked, weights, width, (cell[0] - left) + (cell[1] - top) * width)
+    return {(x, y): dist[(x - left) + (y - top) * width] for x, y in graph.nodes[key]
+            if dist[(x - left) + (y - top) * width] != float("inf")}
+
+
+def check_connect(graph: ChunkGraph, cell: tuple[int, int]) -> None:
+    graph.ensure_chunk(graph.get_chunk(cell))
+    found, reference = graph.connect(cell), get_reference(graph, cell)
+    assert found.keys() == reference.keys()
+    for node, cost in reference.items():
+        assert found[node] == pytest.approx(cost, rel=1e-5)
+
+
+def test_connect_matches_search(graph):
+    """
+    connect lit les coûts calculés depuis les entrées : ils doivent être ceux d'une recherche depuis la case, y
+    compris pour une case occupée (la cible peut l'être)
+    """
+    terrain = graph.terrain
+    rand = random.Random(1)
+    for _ in range(100):
+        check_connect(graph, (rand.randrange(terrain.size[0]), rand.randrange(terrain.size[1])))
+    ys, xs = np.nonzero(terrain.obstacles)
+    for x, y in rand.sample(list(zip(xs.tolist(), ys.tolist())), 20):
+        check_connect(graph, (x, y))
+
+
+@pytest.mark.parametrize("max_sweeps", [1, 8])
+def test_grid_distances_many(graph, max_sweeps):
+    """
+    Les balayages (et le Dijkstra qui les termine si la limite est atteinte) donnent exactement les coûts de
+    get_grid_distances, eau et cases occupées comprises
+    """
+    rand = random.Random(4)
+    for key in ((0, 0), (1, 1), (2, 3)):
+        graph.ensure_chunk(key)
+        blocked, weights, width = graph.get_window(key)
+        starts = [i for i in rand.sample(range(len(blocked)), 6) if not blocked[i]]
+        distances = get_grid_distances_many(blocked, weights, width, starts, max_sweeps)
+        assert distances.tolist() == [get_grid_distances(blocked, weights, width, start) for start in starts]
+    # un labyrinthe : il faut bien plus d'un balayage
+    width = 9
+    blocked = [y % 2 == 1 and x != (0 if y % 4 == 1 else width - 1) for y in range(9) for x in range(width)]
+    weights = [1.] * len(blocked)
+    distances = get_grid_distances_many(blocked, weights, width, [0], max_sweeps)
+    assert distances.tolist() == [get_grid_distances(blocked, weights, width, 0)]
+    assert distances[0, -1] == 32
+
+
+def test_chunk_rebuilt_after_obstacle_change(graph):
+    cell = 60, 60
+    key = graph.get_chunk(cell)
+    graph.ensure_chunk(key)
+    window = graph.get_window(key)
+    assert graph.get_window(key) is window
+
+    # un mur qui coupe le chunk en deux
+    terrain = graph.terrain
+    left, top, right, bottom = graph.get_bounds(key)
+    for y in range(top, bottom):
+        terrain.set_over_ter((62, y), object())
+    graph.check_version()
+    assert key not in graph.windows and key not in graph.node_distances
+    graph.ensure_chunk(key)
+    assert graph.get_window(key) is not window
+    check_connect(graph, cell)
+    assert all(x < 62 for x, _ in graph.connect(cell))
+
+
+def check_field(field: FlowField, terrain) -> None:
+    """
+    Le champ doit donner les distances d'un champ recalculé, et chaque case doit mener à une voisine plus proche
+    """
+    reference = FlowField(field.radius)
+    reference.rebuild(terrain, field.target)
+    assert field.dist == reference.dist
+    assert (field.next_array == np.array(field.next_cell)).all()
+    for i, nxt in enumerate(field.next_cell):
+        if nxt >= 0:
+            assert nxt in field.get_neighbours(i) and field.dist[nxt] == field.dist[i] - 1
+        else:
+            assert (nxt == -2) == (field.dist[i] == FlowField.UNREACHED)
+
+
+def test_flow_field_repairs_obstacle_changes(graph):
+    terrain = graph.terrain
+    target = 60, 60
+    field = FlowField(10)
+    field.update(terrain, target)
+    rand = random.Random(2)
+    for _ in range(200):
+        cell = target[0] + rand.randint(-10, 10), target[1] + rand.randint(-10, 10)
+        terrain.set_over_ter(cell, None if terrain.obstacles[cell[1], cell[0]] else object())
+        field.update(terrain, target)
+        check_field(field, terrain)
+    # plusieurs changements d'un coup, dont un mur qui coupe la zone
+    for y in range(target[1] - 10, target[1] + 11):
+        terrain.set_over_ter((target[0] + 3, y), object())
+    terrain.set_over_ter((target[0] - 2, target[1]), None)
+    field.update(terrain, target)
+    check_field(field, terrain)
+    assert field.rebuild_count == 1
+
+    # un changement en dehors de la zone ne fait rien
+    terrain.set_over_ter((target[0] + 30, target[1]), object())
+    assert field.needs_update(target, terrain.obstacle_version)
+    field.update(terrain, target)
+    assert field.rebuild_count == 1 and not field.needs_update(target, terrain.obstacle_version)
+
+
+def test_flow_field_follows_target(graph):
+    terrain = graph.terrain
+    for x in range(56, 66):
+        for y in range(56, 66):
+            terrain.set_over_ter((x, y), None)
+    field = FlowField(10, trail_length=2)
+    field.update(terrain, (60, 60))
+
+    def follow(cell: tuple[int, int]) -> tuple[int, int]:
+        for _ in range(100):
+            nxt = field.get_next_cell(cell)
+            if nxt == cell:
+                return cell
+            cell = nxt
+        raise AssertionError("le chemin ne mène pas à la cible")
+
+    for target in ((61, 60), (61, 61), (61, 60), (60, 60), (60, 61)):
+        field.update(terrain, target)
+        assert field.rebuild_count == 1
+        assert follow((52, 55)) == follow((68, 66)) == target
+    field.update(terrain, (59, 61))
+    field.update(terrain, (58, 61))
+    assert field.rebuild_count == 2
+    check_field(field, terrain)
+    # une case de plus loin que la voisine
+    field.update(terrain, (60, 61))
+    assert field.rebuild_count == 3
+
+
+def test_one_chunk_built_per_frame():
+    """
+    Au début d'une partie, les chemins des zombies demandent beaucoup de chunks : ils sont construits un par frame
+    """
+    root = benchmark.make_world(1, 300, max_routes=None, budget_ms=1000)
+    navigation = root.game_objects["navigation"]
+    counts = []
+    for _ in range(60):
+        root.run_ticks(1, SIM_STEP)
+        counts.append(navigation.get_build_count())
+    assert counts[-1] > 5
+    assert all(b - a <= 1 for a, b in zip([0] + counts, counts))
@@ -0,0 +1,159 @@
+import random
+from collections import deque
+from typing import Optional
+
+import pytest
+
+import benchmark
+from GameExtensions.util import PathCache, find_path, find_path_cached, path_cache
+
+
+def get_bfs_distances(grid: list[list], start: tuple[int, int], goal: Optional[tuple[int, int]] = None,
+                      bounds: Optional[tuple[int, int, int, int]] = None) -> dict[tuple[int, int], int]:
+    """
+    :return: Le nombre de pas depuis le départ pour chaque case atteignable (la case goal peut être occupée)
+    """
+    left, top, right, bottom = bounds if bounds is not None else (0, 0, len(grid[0]) - 1, len(grid) - 1)
+    dist = {start: 0}
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        for nxt in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            nx, ny = nxt
+            if left <= nx <= right and top <= ny <= bottom and nxt not in dist \
+                    and (grid[ny][nx] is None or nxt == goal):
+                dist[nxt] = dist[(x, y)] + 1
+                queue.append(nxt)
+    return dist
+
+
+def check_path(grid: list[list], path: list[tuple[int, int]], start: tuple[int, int],
+               goal: Optional[tuple[int, int]] = None, bounds: Optional[tuple[int, int, int, int]] = None) -> None:
+    """
+    Le chemin part du départ, avance d'une case à la fois, reste dans les bornes et ne passe que par des cases libres
+    (sauf la case d'arrivée précise)
+    """
+    left, top, right, bottom = bounds if bounds is not None else (0, 0, len(grid[0]) - 1, len(grid) - 1)
+    assert path[0] == start
+    for (ax, ay), (bx, by) in zip(path, path[1:]):
+        assert abs(ax - bx) + abs(ay - by) == 1
+    for x, y in path[1:]:
+        assert left <= x <= right and top <= y <= bottom
+        assert grid[y][x] is None or (x, y) == goal
+
+
+@pytest.mark.parametrize("density", [0.1, 0.3])
+def test_find_path_is_shortest(density):
+    """
+    find_path doit trouver un plus court chemin (comparé à un parcours en largeur), vers une case libre ou occupée
+    """
+    size = 40
+    grid = benchmark.make_grid(size, density, 3)
+    rand = random.Random(3)
+    reached = 0
+    for _ in range(150):
+        start = rand.randrange(size), rand.randrange(size)
+        goal = rand.randrange(size), rand.randrange(size)
+        if grid[start[1]][start[0]] is not None or start == goal:
+            continue
+        path = find_path(grid, start, goal[0], goal[1], iter_limit=size * size)
+        check_path(grid, path, start, goal)
+        dist = get_bfs_distances(grid, start, goal)
+        if goal in dist:
+            reached += 1
+            assert path[-1] == goal and len(path) - 1 == dist[goal]
+        else:
+            # pas de chemin : on va vers la case atteignable la plus proche du goal
+            h = min(abs(x - goal[0]) + abs(y - goal[1]) for x, y in dist)
+            assert abs(path[-1][0] - goal[0]) + abs(path[-1][1] - goal[1]) == h
+    assert reached > 50
+
+
+def test_find_path_line_target_and_bounds():
+    size = 40
+    grid = benchmark.make_grid(size, 0.25, 4)
+    rand = random.Random(4)
+    for _ in range(100):
+        start = rand.randrange(size), rand.randrange(size)
+        if grid[start[1]][start[0]] is not None:
+            continue
+        # une ligne ou une colonne entière : la case d'arrivée doit être libre
+        line = rand.randrange(size)
+        dist = get_bfs_distances(grid, start)
+        path = find_path(grid, start, None, line, iter_limit=size * size)
+        check_path(grid, path, start)
+        ends = [d for (x, y), d in dist.items() if y == line]
+        if ends:
+            assert path[-1][1] == line and len(path) - 1 == min(ends)
+        path = find_path(grid, start, line, None, iter_limit=size * size)
+        check_path(grid, path, start)
+        ends = [d for (x, y), d in dist.items() if x == line]
+        if ends:
+            assert path[-1][0] == line and len(path) - 1 == min(ends)
+
+        # un chemin qui doit rester dans un carré autour du départ
+        bounds = start[0] - 8, start[1] - 8, start[0] + 8, start[1] + 8
+        goal = tuple(min(size - 1, max(0, c + rand.randint(-8, 8))) for c in start)
+        path = find_path(grid, start, goal[0], goal[1], bounds, iter_limit=size * size)
+        check_path(grid, path, start, goal, bounds)
+        dist = get_bfs_distances(grid, start, goal, (max(0, bounds[0]), max(0, bounds[1]), min(size - 1, bounds[2]),
+                                                     min(size - 1, bounds[3])))
+        if goal in dist and goal != start:
+            assert path[-1] == goal and len(path) - 1 == dist[goal]
+
+
+def test_path_cache_lru():
+    cache = PathCache(3)
+    assert cache.get("a") is None
+    path = cache.put("a", [(0, 0), (0, 1)])
+    assert path == ((0, 0), (0, 1)) and cache.get("a") is path
+    cache.put("b", [])
+    cache.put("c", [])
+    # "a" vient d'être utilisé : c'est "b" qui part
+    cache.get("a")
+    cache.put("d", [])
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+    assert cache.get_stats() == {"hits": 5, "misses": 2, "hit_rate": 5 / 7, "size": 3}
+
+    cache.set_owner(1)
+    assert cache.get_stats()["size"] == 0
+    cache.put("a", [])
+    cache.set_owner(1)
+    assert cache.get("a") == ()
+
+
+def test_find_path_cached_follows_obstacles():
+    """
+    Un chemin gardé dans path_cache ne doit plus servir dès qu'une case est occupée ou libérée sur le terrain
+    """
+    root = benchmark.make_world(1, 0)
+    terrain = root.game_objects["terrain"]
+    rand = random.Random(5)
+    start = None
+    while start is None or terrain.obstacles[start[1], start[0]]:
+        start = rand.randrange(terrain.size[0]), rand.randrange(terrain.size[1])
+    bounds = start[0] - 10, start[1] - 10, start[0] + 10, start[1] + 10
+    dist = get_bfs_distances(terrain.over_terrain, start, bounds=bounds)
+    goal = max(dist, key=dist.get)
+    assert dist[goal] >= 5
+
+    path = find_path_cached(start, goal[0], goal[1], bounds)
+    assert path[-1] == goal and len(path) - 1 == dist[goal]
+    hits = path_cache.get_stats()["hits"]
+    assert find_path_cached(start, goal[0], goal[1], bounds) is path
+    assert path_cache.get_stats()["hits"] == hits + 1
+
+    # une case du chemin est bloquée : le chemin est recalculé et l'évite
+    blocked = path[len(path) // 2]
+    terrain.set_over_ter(blocked, object())
+    new_path = find_path_cached(start, goal[0], goal[1], bounds)
+    assert new_path is not path and blocked not in new_path
+    check_path(terrain.over_terrain, list(new_path), start, goal, bounds)
+    terrain.set_over_ter(blocked, None)
+    assert find_path_cached(start, goal[0], goal[1], bounds) == path
+
+    # une nouvelle partie ne reprend pas les chemins de l'ancienne
+    root = benchmark.make_world(1, 0)
+    assert find_path_cached(start, goal[0], goal[1], bounds) is not path
+    assert path_cache.owner is root.game_objects["terrain"]
@@ -0,0 +1,45 @@
+import copy
+from collections import OrderedDict
+
+import pygame
+
+import benchmark
+from GameManager.util import GameObject
+
+
+def make_objects(root, *names: str, z_layer: int = 0) -> list[GameObject]:
+    objects = []
+    for name in names:
+        gm = GameObject(pygame.Vector2(), 0, pygame.Surface((1, 1)), name)
+        gm.z_layer = z_layer
+        root.game_objects[name] = gm
+        objects.append(gm)
+    return objects
+
+
+def test_move_to_end():
+    root = benchmark.make_root()
+    a, b, c = make_objects(root, "a", "b", "c")
+    top, = make_objects(root, "top", z_layer=1)
+    root.game_objects.move_to_end("a")
+    assert root.get_render_order() == [b, c, a, top]
+    root.game_objects.move_to_end("c", last=False)
+    assert root.get_render_order() == [c, b, a, top]
+    assert root.render_queue.layers[0] is root.render_queue.find_layer(c)
+    c.z_layer = 1
+    assert root.get_render_order() == [b, a, top, c]
+
+
+def test_copy_game_objects():
+    """
+    Les copies de game_objects sont des OrderedDict simples : les modifier ne change pas la file d'affichage
+    """
+    root = benchmark.make_root()
+    objects = make_objects(root, "a", "b")
+    for copied in (root.game_objects.copy(), copy.copy(root.game_objects)):
+        assert type(copied) is OrderedDict
+        assert list(copied.values()) == objects
+        del copied["a"]
+        copied.move_to_end("b", last=False)
+    assert root.get_render_order() == objects
+    assert type(root.game_objects.__reduce__()[0]()) is OrderedDict
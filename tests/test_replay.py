@@ -0,0 +1,65 @@
+import pygame
+
+import benchmark
+from GameManager.locals import SIM_STEP
+
+
+def test_replay_with_distant_zombies(tmp_path):
+    """
+    Les zombies loin des champs de directions demandent des chemins au NavigationManager. Le replay doit donner la
+    même partie même si la machine est bien plus lente ou plus rapide (budget en temps très différent)
+    """
+    log = str(tmp_path / "game.nsir")
+    root = benchmark.make_world(2, 60, spread=2200, max_routes=None, budget_ms=1000)
+    keys = [26, 7, 22, 4]  # W, D, S, A
+
+    def get_pressed():
+        pressed = [False] * 512
+        pressed[keys[root.tick_count // 40 % 4]] = True
+        return pygame.key.ScancodeWrapper(pressed)
+
+    real_get_pressed = pygame.key.get_pressed
+    pygame.key.get_pressed = get_pressed
+    try:
+        root.input.start_recording(log, seed=7)
+        root.run_ticks(240, SIM_STEP)
+        root.input.stop_recording()
+    finally:
+        pygame.key.get_pressed = real_get_pressed
+    recorded = root.get_state_checksum()
+    assert root.game_objects["navigation"].request_count > 0
+
+    root = benchmark.make_world(2, 60, spread=2200, max_routes=None, budget_ms=0.001)
+    root.input.load_replay(log)
+    assert root.run_replay() is None
+    assert root.get_state_checksum() == recorded
+
+
+def test_recording_started_between_steps(tmp_path):
+    """
+    Un enregistrement commencé par call_before_next_step (comme main.py au lancement d'une partie) part d'un état que
+    le replay retrouve en faisant le même appel avant son premier pas
+    """
+    log = str(tmp_path / "game.nsir")
+    root = benchmark.make_world(4, 50)
+    root.run_ticks(20, SIM_STEP)
+
+    def start_recording():
+        root.input.start_recording(log, seed=3)
+        root.tick_count = 0
+    root.call_before_next_step(start_recording)
+    root.run_ticks(120, SIM_STEP)
+    root.input.stop_recording()
+    recorded = root.get_state_checksum()
+
+    root = benchmark.make_world(4, 50)
+    root.run_ticks(20, SIM_STEP)
+
+    def start_replay():
+        root.input.load_replay(log)
+        root.tick_count = 0
+    root.call_before_next_step(start_replay)
+    root.run_ticks(120, SIM_STEP)
+    assert root.get_state_checksum() == recorded
+    assert not root.input.replaying and root.input.end_replay() is None
+    assert root.input.replay is None and not root.input.deterministic
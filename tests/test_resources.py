@@ -0,0 +1,89 @@
+import os
+
+import pygame
+import pytest
+
+import benchmark
+from GameManager.bundle import AssetBundle, build_bundle, get_bundle, get_bundle_key, opened_bundles
+from GameManager.locals import BUNDLE_FILE
+from GameManager.resources import ImageCache, get_image_manifest
+from GameManager.surface_cache import get_surface_bytes
+
+# des images de la même taille
+ITEMS = ["resources/items/apple.png", "resources/items/book.png", "resources/items/stone_block.png",
+         "resources/items/wood_block.png"]
+
+
+def test_image_cache_shares_images():
+    benchmark.make_root()
+    cache = ImageCache()
+    apple = cache.get(ITEMS[0])
+    assert cache.get("resources/./items/apple.png") is apple
+    # les autres tailles sont calculées depuis l'image gardée (un hit de plus), sans relire le fichier
+    big = cache.get(ITEMS[0], (64, 64))
+    assert big.get_size() == (64, 64) and cache.get(ITEMS[0], [64, 64]) is big
+    assert pygame.image.tobytes(big, "RGBA") == pygame.image.tobytes(pygame.transform.scale(apple, (64, 64)), "RGBA")
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["disk_loads"], stats["size"]) == (3, 2, 1, 2)
+
+
+def test_image_cache_byte_cap():
+    """
+    La mémoire gardée ne dépasse jamais max_bytes, les images les moins récemment utilisées sont oubliées d'abord et
+    relues depuis le disque au besoin
+    """
+    benchmark.make_root()
+    size = get_surface_bytes(ImageCache().get(ITEMS[0]))
+    assert all(get_surface_bytes(ImageCache().get(item)) == size for item in ITEMS)
+    cache = ImageCache(max_bytes=size * 3)
+    images = [cache.get(item) for item in ITEMS[:3]]
+    cache.get(ITEMS[0])
+    cache.get(ITEMS[3])
+    # ITEMS[1] est la moins récemment utilisée
+    assert cache.bytes == size * 3 and cache.get_stats()["size"] == 3
+    assert cache.get(ITEMS[0]) is images[0] and cache.get(ITEMS[2]) is images[2]
+    loads = cache.disk_loads
+    reloaded = cache.get(ITEMS[1])
+    assert reloaded is not images[1] and cache.disk_loads == loads + 1
+    assert pygame.image.tobytes(reloaded, "RGBA") == pygame.image.tobytes(images[1], "RGBA")
+    assert cache.bytes == sum(map(get_surface_bytes, cache.surfaces.values())) <= cache.max_bytes
+
+    # une image plus grande que tout le cache est renvoyée sans être gardée
+    kept = dict(cache.surfaces)
+    assert cache.get(ITEMS[0], (100, 100)).get_size() == (100, 100)
+    assert cache.surfaces == kept
+
+    cache.clear()
+    assert cache.bytes == 0 and cache.get_stats()["size"] == 0
+
+
+@pytest.mark.parametrize("decode_images", [True, False])
+def test_bundle_matches_files(tmp_path, monkeypatch, decode_images):
+    """
+    Les images lues dans le paquet doivent être identiques pixel pour pixel aux fichiers, et les autres fichiers
+    octet pour octet
+    """
+    root = benchmark.make_root()
+    filename = str(tmp_path / "resources.bundle")
+    build_bundle(root.resources_path, output=filename, decode_images=decode_images)
+    bundle = AssetBundle(filename)
+    manifest = get_image_manifest()
+    assert len(manifest) > 20
+    for path, _ in manifest:
+        expected = pygame.image.load(os.path.join(root.resources_path, path)).convert_alpha()
+        image = bundle.load_image(path)
+        assert image.get_size() == expected.get_size()
+        assert pygame.image.tobytes(image, "RGBA") == pygame.image.tobytes(expected, "RGBA"), path
+    font = "resources/fonts/arcade.ttf"
+    with open(os.path.join(root.resources_path, font), "rb") as f:
+        assert bytes(bundle.get_bytes(font)) == f.read()
+
+    # load_img passe par le paquet quand il existe
+    monkeypatch.setitem(opened_bundles, os.path.join(root.resources_path, BUNDLE_FILE), bundle)
+    assert get_bundle(root.resources_path) is bundle
+    cache = ImageCache()
+    image = cache.get(os.path.join("resources", "items", "apple.png"))
+    expected = pygame.image.load(os.path.join(root.resources_path, ITEMS[0])).convert_alpha()
+    assert pygame.image.tobytes(image, "RGBA") == pygame.image.tobytes(expected, "RGBA")
+    # le manifeste lu dans le paquet contient les mêmes images que le dossier
+    assert sorted(path for path, _ in get_image_manifest()) == sorted(get_bundle_key(path) for path, _ in manifest)
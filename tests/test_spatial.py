@@ -0,0 +1,85 @@
+import random
+
+import pygame
+
+import benchmark
+from GameManager.spatial import SpatialGrid
+from GameManager.util import GameObject
+
+
+def random_rect(rand: random.Random) -> pygame.Rect:
+    # des rects plus petits et bien plus grands qu'une case, y compris aux coordonnées négatives
+    size = rand.choice((1, 5, 32, 33, 150))
+    return pygame.Rect(rand.randint(-300, 300), rand.randint(-300, 300), rand.randint(1, size), rand.randint(1, size))
+
+
+def check_grid(grid: SpatialGrid, rects: dict[int, pygame.Rect], rand: random.Random) -> None:
+    """
+    Les requêtes doivent trouver les mêmes objets que la vérification de tous les rects, et chaque case ne doit
+    contenir que les objets qui la touchent
+    """
+    assert len(grid) == len(rects)
+    for _ in range(100):
+        rect = random_rect(rand)
+        assert grid.query(rect) == sorted(h for h, r in rects.items() if rect.colliderect(r))
+    cells = {}
+    for handle, rect in rects.items():
+        for cell in grid.iter_cells(grid.get_span(rect)):
+            cells.setdefault(cell, set()).add(handle)
+    assert {cell: set(bucket) for cell, bucket in grid.cells.items()} == cells
+
+
+def test_grid_matches_brute_force():
+    rand = random.Random(1)
+    grid = SpatialGrid(32)
+    rects = {}
+    for handle in range(300):
+        rects[handle] = random_rect(rand)
+        grid.insert(handle, rects[handle])
+    check_grid(grid, rects, rand)
+
+    for _ in range(5):
+        for handle in rand.sample(sorted(rects), 100):
+            # petits déplacements (souvent dans les mêmes cases) et téléportations
+            rect = rects[handle].move(rand.randint(-3, 3), rand.randint(-3, 3)) if rand.random() < 0.7 \
+                else random_rect(rand)
+            rects[handle] = rect
+            grid.move(handle, rect)
+        for handle in rand.sample(sorted(rects), 20):
+            assert grid.remove(handle)
+            del rects[handle]
+        check_grid(grid, rects, rand)
+    assert not grid.remove(-1)
+    grid.clear()
+    assert len(grid) == 0 and grid.query(pygame.Rect(-1000, -1000, 2000, 2000)) == []
+
+
+class Box(GameObject):
+    def __init__(self, rect: pygame.Rect, name: str):
+        super().__init__(pygame.Vector2(rect.center), 0, pygame.Surface(rect.size), name)
+
+
+def test_collide_all_matches_brute_force():
+    """
+    collide_all et is_colliding doivent donner le même résultat qu'avant la grille : tous les objets dont la
+    hitbox touche le rect, dans l'ordre d'ajout, après que les objets ont bougé
+    """
+    root = benchmark.make_root()
+    rand = random.Random(2)
+    boxes = [Box(random_rect(rand), f"box{i}") for i in range(200)]
+    for box in boxes:
+        root.add_collidable_object(box)
+
+    def check():
+        for _ in range(100):
+            rect = random_rect(rand)
+            expected = tuple(box.collision_handle for box in boxes if rect.colliderect(box.get_collision_rect()))
+            assert root.collide_all(rect) == expected
+            assert root.is_colliding(rect) == (expected[0] if expected else -1)
+            assert root.collide_all(rect, r"box1\d*$") == tuple(
+                handle for handle in expected if not root.get_collidable(handle).name.startswith("box1"))
+
+    check()
+    for box in rand.sample(boxes, 80):
+        box.translate(pygame.Vector2(rand.randint(-50, 50), rand.randint(-50, 50)))
+    check()
@@ -0,0 +1,56 @@
+import pygame
+
+from GameManager.surface_cache import RotationCache, get_surface_bytes
+
+
+def make_surface(size: int, color: tuple[int, int, int]) -> pygame.Surface:
+    surface = pygame.Surface((size, size), pygame.SRCALPHA)
+    surface.fill(color)
+    surface.set_at((0, 0), (255, 255, 255))
+    return surface
+
+
+def test_rotation_cache_reuses_rotations():
+    cache = RotationCache(step=2)
+    surface = make_surface(10, (200, 0, 0))
+    rotated = cache.rotate(surface, 30)
+    expected = pygame.transform.rotate(surface, 30)
+    assert rotated.get_size() == expected.get_size()
+    assert pygame.image.tobytes(rotated, "RGBA") == pygame.image.tobytes(expected, "RGBA")
+    # même angle au pas près (et à un tour près) : même image
+    assert cache.rotate(surface, 30.9) is rotated
+    assert cache.rotate(surface, 390) is rotated
+    assert cache.rotate(surface, 33) is not rotated
+    assert cache.quantize(-90) == 270 and cache.quantize(359.5) == 0
+    # une autre image source avec le même angle a sa propre rotation
+    assert cache.rotate(make_surface(10, (200, 0, 0)), 30) is not rotated
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 3, 3)
+
+
+def test_rotation_cache_byte_cap():
+    """
+    La mémoire gardée ne dépasse jamais max_bytes, les images les moins récemment utilisées sont oubliées d'abord
+    """
+    surfaces = [make_surface(10, (i * 20, 0, 0)) for i in range(5)]
+    size = get_surface_bytes(pygame.transform.rotate(surfaces[0], 90))
+    cache = RotationCache(max_bytes=size * 3)
+    rotated = [cache.rotate(surface, 90) for surface in surfaces[:3]]
+    assert cache.bytes == size * 3
+    cache.rotate(surfaces[0], 90)
+    cache.rotate(surfaces[3], 90)
+    # surfaces[1] est la moins récemment utilisée
+    assert cache.bytes == size * 3 and cache.get_stats()["size"] == 3
+    assert cache.rotate(surfaces[0], 90) is rotated[0]
+    assert cache.rotate(surfaces[2], 90) is rotated[2]
+    assert cache.rotate(surfaces[1], 90) is not rotated[1]
+    assert cache.bytes == sum(get_surface_bytes(image) for _, image in cache.surfaces.values()) <= cache.max_bytes
+
+    # une image plus grande que tout le cache n'est pas gardée et n'en fait rien sortir
+    big = make_surface(100, (0, 0, 200))
+    kept = dict(cache.surfaces)
+    assert cache.rotate(big, 90).get_size() == (100, 100)
+    assert cache.surfaces == kept
+
+    cache.clear()
+    assert cache.bytes == 0 and cache.get_stats()["size"] == 0